@@ -6,6 +6,8 @@ import logging
 import time
 import traceback
 from .decoder import decode
+from .records import LMS6_403Frame
+from ..utils.errors import error_result, ERR_PROCESSING, ERR_SERIAL_MISMATCH
 
 class LMS6_403(object):
     """
@@ -17,9 +19,13 @@ class LMS6_403(object):
 
     def __init__(
         self,
-        archive_postprocess_callback = None):
+        archive_postprocess_callback = None,
+        metrics = None):
         """
-        
+        Args:
+        archive_postprocess_callback (function): Currently unused.
+        metrics (DecoderMetrics): Optional metrics object (refer utils.metrics), passed on to the decoder, and
+            updated with processing errors and stage timings.
         """
 
         # Serial number store. Once set, all future frames must match this serial number
@@ -33,13 +39,32 @@ class LMS6_403(object):
         self.last_frame_time = time.time()
 
         self.archive_postprocess_callback = archive_postprocess_callback
+        self.metrics = metrics
 
     
-    def add_frame(self, raw):
-        """ Add and process a frame """
+    def add_frame(self, raw, record=False, strict=True):
+        """
+        Add and process a frame
+
+        Args:
+        raw (bytes): Data frame provided as bytes
+        record (bool): If set, return a compact LMS6_403Frame record instead of a dictionary.
+        strict (bool): If set (default), log any errors, and return None if the frame could not be processed.
+            Otherwise, don't log anything, and always return a dictionary with 'ok', 'errors' and 'block_status' fields
+            (refer decode() and utils.errors). Can not be used with record.
+        """
+
+        if record and not strict:
+            raise ValueError("Records can not be returned when strict=False.")
+
+        if self.metrics is not None:
+            _start = time.perf_counter()
 
         try:
-            _frame = decode(raw, cal_data = self.cal_data)
+            _frame = decode(raw, cal_data = self.cal_data, metrics = self.metrics, strict = strict)
+
+            if (not strict) and (not _frame['ok']):
+                return _frame
 
             self.last_frame_time = time.time()
 
@@ -47,6 +72,9 @@ class LMS6_403(object):
                 self.serial = _frame['serial']
             else:
                 if _frame['serial'] != self.serial:
+                    if not strict:
+                        return self._frame_error(_frame, ERR_SERIAL_MISMATCH)
+
                     # Serial mismatch!
                     raise ValueError(f"Telemetry is from a different radiosonde! ({_frame['serial']}, should be {self.serial}.")
 
@@ -66,15 +94,39 @@ class LMS6_403(object):
 
             _frame['cal_data'] = self.cal_data
 
+            if record:
+                _frame = LMS6_403Frame.from_dict(_frame)
+
             if not (None in self.cal_data):
                 # TODO - Reprocess anything in self.raw_frames and send to a callback.
                 pass
 
+            if self.metrics is not None:
+                self.metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='LMS6_403', stage='add_frame')
+
             return _frame
             
 
 
         except Exception as e:
+            if self.metrics is not None:
+                self.metrics.inc('add_frame_errors_total', sonde_type='LMS6_403', error=type(e).__name__)
+
+            if not strict:
+                return error_result(ERR_PROCESSING, type(e).__name__)
+
             logging.exception(f"Error processing frame",exc_info=e)
             return
 
+
+    def _frame_error(self, frame, code):
+        """ Mark a (strict=False) decoded frame as failed, with the supplied error code """
+
+        frame['ok'] = False
+        frame['errors'].append((code, None))
+
+        if self.metrics is not None:
+            self.metrics.inc('add_frame_errors_total', sonde_type='LMS6_403', error=code)
+
+        return frame
+
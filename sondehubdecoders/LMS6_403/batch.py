@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+#
+#   LMS6_403 Batch Frame Decoder
+#
+#   Decodes a whole flight of LMS6_403 frames at once into columns of NumPy arrays, rather than one dictionary
+#   per frame. As with the RS41 batch decoder, this is intended for re-processing archived flights.
+#
+#   LMS6_403 frames are a single fixed-length, big-endian structure, so all of the frames are viewed as one
+#   NumPy structured array (built from the same decoder table as the single-frame decoder), and each field
+#   is converted for every frame at once.
+#
+#   Calibration data is sent 4 values at a time, in a 7 frame cycle (refer postprocess.py). As the whole flight
+#   is available, the calibration data is reassembled from the entire batch first, and temperatures are then
+#   calculated for every frame - including those received before the calibration data was complete.
+#
+import numpy as np
+from ..utils.checksums import check_packet_crc, crc16_ccitt_many
+from ..utils.data_types import int24_be_array, lms6_24bit_array
+from . import LMS6_403
+from .decoder import LMS6_403_COMPILED_DECODER, LMS6_403_FRAME_HEADER, LMS6_403_FRAME_HEADER_LEN, LMS6_403_FRAME_LEN
+from .postprocess import lms6_403_calculate_temperature_array
+
+
+# Vectorized equivalents of the field_decoders within LMS6_403_DECODERS.
+LMS6_403_BATCH_FIELD_DECODERS = {
+    "altitude": lambda alt: alt/1000,
+    "up_down_vel_mms": lambda val: int24_be_array(val)/1000,
+    "east_west_vel_mms": lambda val: int24_be_array(val)/1000,
+    "north_south_vel_mms": lambda val: int24_be_array(val)/1000,
+    "latitude": lambda val: (val/(2**32-1))*360.0,
+    "longitude": lambda val: (val/(2**32-1))*360.0,
+    "sensor_chan1": lms6_24bit_array,
+    "sensor_chan2": lms6_24bit_array,
+    "sensor_chan3": lms6_24bit_array,
+    "sensor_chan4": lms6_24bit_array,
+    "sensor_chan5": lms6_24bit_array,
+    "sensor_chan6": lms6_24bit_array,
+    "sensor_chan7": lms6_24bit_array,
+    "sensor_chan8": lms6_24bit_array,
+    "sensor_chan9": lms6_24bit_array,
+    "sensor_chan10": lms6_24bit_array,
+    "sensor_chan11": lms6_24bit_array,
+    "sensor_chan12": lms6_24bit_array,
+    "sensor_chan13": lms6_24bit_array,
+}
+
+# Calibration value fields within each frame, in order.
+LMS6_403_BATCH_CAL_FIELDS = ["cal1", "cal2", "cal3", "cal4"]
+
+
+def frames_to_array(frames):
+    """
+    Convert a list of frames (as bytes) into a 2-D uint8 NumPy array with one LMS6_403_FRAME_LEN byte frame per row,
+    clipping longer frames (as per decode()) and zero-padding shorter frames. A 2-D array is clipped or padded likewise.
+
+    Returns a tuple of (frame array, frame lengths)
+    """
+
+    if isinstance(frames, np.ndarray):
+        if frames.ndim != 2:
+            raise ValueError("Frame array must be 2-dimensional.")
+
+        _lengths = np.full(frames.shape[0], frames.shape[1], dtype=np.int64)
+        _frames = np.zeros((frames.shape[0], LMS6_403_FRAME_LEN), dtype=np.uint8)
+        _width = min(frames.shape[1], LMS6_403_FRAME_LEN)
+        _frames[:, :_width] = frames[:, :_width]
+        return (_frames, _lengths)
+
+    _lengths = np.array([len(_frame) for _frame in frames], dtype=np.int64)
+
+    _buffer = b"".join([bytes(_frame[:LMS6_403_FRAME_LEN]).ljust(LMS6_403_FRAME_LEN, b"\x00") for _frame in frames])
+    _frames = np.frombuffer(_buffer, dtype=np.uint8).reshape(len(frames), LMS6_403_FRAME_LEN)
+
+    return (_frames, _lengths)
+
+
+def _new_column(dtype, num_frames):
+    """ Create an output column, filled with a 'missing' value appropriate to its type. """
+
+    if dtype.kind == 'f':
+        return np.full(num_frames, np.nan, dtype=dtype)
+    else:
+        return np.zeros(num_frames, dtype=dtype)
+
+
+def lms6_403_cal_data_many(columns, cal_data=None):
+    """
+    Reassemble the calibration data from a batch of decoded frames (as produced by decode_many), using the
+    frame count of each frame to number its calibration values. Where a value was received more than once,
+    the most recent is used, as per the stateful decoder.
+
+    Args:
+    columns (dict): Decoded columns, containing 'ok', 'frame_count' and the cal1 - cal4 fields.
+    cal_data (list): Optional calibration data to start from (e.g. from a stateful decoder), with None for missing values.
+
+    Returns a list of the calibration values, with None for any which were not received.
+    """
+
+    _total = LMS6_403.LMS6_403_TOTAL_CAL
+    _per_frame = LMS6_403.LMS6_403_CAL_PER_FRAME
+
+    output = list(cal_data) if cal_data is not None else [None]*_total
+
+    if 'frame_count' not in columns:
+        return output
+
+    _slots = columns['frame_count'] % (_total // _per_frame)
+
+    for _slot in range(_total // _per_frame):
+        _rows = np.nonzero(columns['ok'] & (_slots == _slot))[0]
+        if len(_rows) == 0:
+            continue
+
+        for (_i, _field) in enumerate(LMS6_403_BATCH_CAL_FIELDS):
+            output[_slot*_per_frame + _i] = int(columns[_field][_rows[-1]])
+
+    return output
+
+
+def decode_many(frames, ignore_crc=False, cal_data=None):
+    """
+    Decode many LMS6_403 frames (e.g. a whole flight) at once, provided either as a list of bytes,
+    or a 2-D uint8 NumPy array (one frame per row).
+
+    Args:
+    frames (list, np.ndarray): Data frames to decode.
+    ignore_crc (bool): If set, extract fields even if the CRC check fails.
+    cal_data (list): Optional calibration data to start from (refer lms6_403_cal_data_many).
+
+    Returns a dictionary of NumPy arrays (columns), with one row per frame. Columns include:
+    frame_ok: Frame has a valid header, and is long enough.
+    crc_ok: Frame passed its CRC check.
+    ok: Fields were extracted from the frame.
+    Then, one column per field within the frame (as per decode()), and 'temperature', which is calculated for
+    every frame using the calibration data reassembled from the whole batch.
+
+    Where fields could not be extracted, integer fields are set to 0, and float fields to NaN. Temperatures are NaN
+    if the batch does not contain a complete set of calibration data.
+    """
+
+    (_frames, _lengths) = frames_to_array(frames)
+    _num_frames = _frames.shape[0]
+
+    output = {}
+
+    # Header and length check.
+    _header = np.frombuffer(LMS6_403_FRAME_HEADER, dtype=np.uint8)
+    output['frame_ok'] = np.all(_frames[:, :LMS6_403_FRAME_HEADER_LEN] == _header, axis=1) & (_lengths >= LMS6_403_FRAME_LEN)
+
+    # CRC16-CCITT, with an initial value of 0, over the whole frame, with a big-endian checksum in the last 2 bytes.
+    _checksum = (_frames[:, -2].astype(np.uint16) << 8) | _frames[:, -1]
+    output['crc_ok'] = crc16_ccitt_many(_frames[:, :-2], init=0x0000) == _checksum
+
+    # Frames longer than expected have their checksum at the end of the whole frame, so are checked individually.
+    for _i in np.nonzero(_lengths > LMS6_403_FRAME_LEN)[0]:
+        output['crc_ok'][_i] = check_packet_crc(bytes(frames[_i]), checksum="LMS6_403", big_endian=True, quiet=True)
+
+    output['ok'] = output['frame_ok'] & (output['crc_ok'] | ignore_crc)
+    output['frame_len'] = _lengths
+
+    _rows = np.nonzero(output['ok'])[0]
+    _fields = _frames.view(LMS6_403_COMPILED_DECODER.dtype).reshape(-1)[_rows]
+
+    for _field in LMS6_403_COMPILED_DECODER.dtype.names:
+        _values = _fields[_field]
+
+        if _field in LMS6_403_BATCH_FIELD_DECODERS:
+            _values = LMS6_403_BATCH_FIELD_DECODERS[_field](np.ascontiguousarray(_values))
+
+        output[_field] = _new_column(_values.dtype, _num_frames)
+        output[_field][_rows] = _values
+
+    # Reassemble the calibration data, then calculate temperatures for every frame in one pass.
+    _cal_data = lms6_403_cal_data_many(output, cal_data)
+
+    if None in _cal_data:
+        output['temperature'] = np.full(_num_frames, np.nan)
+    else:
+        output['temperature'] = lms6_403_calculate_temperature_array(output['sensor_chan3'], _cal_data)
+        output['temperature'][~output['ok']] = np.nan
+
+    return output
+
+
+if __name__ == "__main__":
+    import logging
+    import math
+    from ..utils.benchmark import make_lms6_403_corpus
+
+    # Decode errors in the corrupted corpus are expected, so don't log them.
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for _kind in ['clean', 'corrupted']:
+        _frames = make_lms6_403_corpus(200, _kind)
+        _columns = decode_many(_frames)
+
+        # Decode the same frames one at a time with the stateful decoder, which accumulates calibration data.
+        _decoder = LMS6_403()
+        _fields = 0
+
+        for (_i, _frame) in enumerate(_frames):
+            _single = _decoder.add_frame(_frame, strict=False)
+
+            assert _columns['ok'][_i] == _single['ok'], (_kind, _i)
+            if not _single['ok']:
+                assert math.isnan(_columns['temperature'][_i]), (_kind, _i)
+                continue
+
+            for (_field, _value) in _single.items():
+                if _field not in _columns or _field in ['ok', 'temperature']:
+                    continue
+
+                if isinstance(_value, bytes):
+                    assert _columns[_field][_i] == _value.rstrip(b'\x00'), (_kind, _i, _field)
+                else:
+                    assert _columns[_field][_i] == _value, (_kind, _i, _field)
+                _fields += 1
+
+            # The stateful decoder can only calculate temperatures once it has a complete set of calibration data,
+            # whereas the batch decoder uses the calibration data from the whole batch.
+            if 'temperature' in _single:
+                assert math.isclose(_columns['temperature'][_i], _single['temperature'], rel_tol=1e-9), (_kind, _i)
+
+        assert lms6_403_cal_data_many(_columns) == (_decoder.cal_data or [None]*LMS6_403.LMS6_403_TOTAL_CAL)
+
+        print(f"{_kind}: {len(_frames)} frames, {int(_columns['ok'].sum())} decoded, {_fields} fields match")
+
+    print("All tests passed!")
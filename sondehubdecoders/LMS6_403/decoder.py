@@ -7,8 +7,12 @@
 #
 import logging
 import struct
+import time
+from ..utils.autorx_log import format_log_line
 from ..utils.checksums import check_packet_crc
 from ..utils.data_types import *
+from ..utils.errors import *
+from ..utils.schema import CompiledBlockDecoder
 from .postprocess import *
 
 # 24 54 00 00 00 7c 4a 9e 0b 19 1c 54 46 02 ff e6 e1 e2 1d bb b4 b3 c0 1f ec 8f 00 b2 51 b4 00 9e 26 00 25 30 00 14 18 00 38 0d 29 1f 84 2c a8 ac 1c f9 6f 99 0f 28 1f 7a ef 59 ea 1c f5 33 d1 12 2a 1f 7b ca 3c dc 1c f0 ae 04 1d 29 1f 8b 96 0f 81 1c fe 13 91 17 2b 1f 82 75 27 61 1c ee fa 7c 18 20 1f 91 fc 8f 68 1c e9 bf 50 05 25 1f 8c e3 f2 5f 1c fb 58 2b 0a 28 1f 92 9a 06 63 1c ec 93 7a 1b 24 1f 96 70 ff fa 1c eb a3 00 10 00 84 00 00 00 00 00 00 00 00 8a 2a 80 00 00 00 00 00 00 00 00 06 00 80 00 00 00 00 00 00 00 00 03 c1 72 00 00 00 03 3e 1b 09 dd 7f 00 00 00 00 00 00 1b e4 73 0f c1 a0 03 c1 95 03 c1 8a 03 c1 96 03 c1 94 00 00 00 00 1b 00 00 00 00 6f 9a 07 e4 3e  [OK]
@@ -91,10 +95,11 @@ LMS6_403_DECODERS = {
 LMS6_403_FRAME_LEN = struct.calcsize(LMS6_403_DECODERS['struct'])
 LMS6_403_DECODERS['expected_len'] = LMS6_403_FRAME_LEN
 
-print(f"Current Frame Length: {LMS6_403_FRAME_LEN}")
+# Pre-compiled frame decoder, generated from the above.
+LMS6_403_COMPILED_DECODER = CompiledBlockDecoder(LMS6_403_DECODERS)
 
 
-def decode(frame, ignore_crc=False, cal_data=None):
+def decode(frame, ignore_crc=False, cal_data=None, metrics=None, strict=True):
     """
     Attempt to decode a LMS6_403 frame, provided as bytes, after de-scrambling has been performed.
 
@@ -102,9 +107,69 @@ def decode(frame, ignore_crc=False, cal_data=None):
     frame (bytes): Data frame provided as bytes
     ignore_crc (bool): If set, ignore any CRC failures
     subframe (dict): Optional subframe Object, for use in processing measurement data.
+    metrics (DecoderMetrics): Optional metrics object, which is updated with frame counts, CRC failures and timings.
+    strict (bool): If set (default), raise a ValueError if the frame cannot be decoded, and log any errors.
+        Otherwise, never raise or log, and report any problems in the 'ok', 'errors' and 'block_status' fields
+        of the output (refer utils.errors). The whole frame is treated as a single block ('Overall'), so 'ok'
+        is only set if the frame passed its CRC check and was decoded.
 
     """
 
+    if not strict:
+        return _decode_result(frame, cal_data, metrics)
+
+    if metrics is None:
+        return _decode(frame, ignore_crc, cal_data)
+
+    _start = time.perf_counter()
+
+    try:
+        output = _decode(frame, ignore_crc, cal_data, metrics)
+    except ValueError:
+        metrics.inc('frames_total', sonde_type='LMS6_403', result='invalid')
+        raise
+
+    metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='LMS6_403', stage='decode')
+    # Frames which fail their CRC check are returned with only the 'common' fields.
+    metrics.inc('frames_total', sonde_type='LMS6_403', result='ok' if (output is not None) and ('frame_count' in output) else 'error')
+
+    return output
+
+
+def _decode_result(frame, cal_data=None, metrics=None):
+    """ Decode a LMS6_403 frame, reporting errors as data. Refer decode(strict=False) """
+
+    if metrics is not None:
+        _start = time.perf_counter()
+
+    if len(frame) < LMS6_403_FRAME_LEN:
+        _error = ERR_FRAME_TOO_SHORT
+    elif frame[:LMS6_403_FRAME_HEADER_LEN] != LMS6_403_FRAME_HEADER:
+        _error = ERR_HEADER_MISMATCH
+    else:
+        _error = None
+
+    if _error is not None:
+        if metrics is not None:
+            metrics.inc('frames_total', sonde_type='LMS6_403', result='invalid')
+        return error_result(_error)
+
+    _block_status = {}
+    output = _decode(frame, False, cal_data, metrics, _block_status)
+    output['ok'] = _block_status['Overall'] == DECODE_OK
+    output['errors'] = block_errors(_block_status)
+    output['block_status'] = _block_status
+
+    if metrics is not None:
+        metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='LMS6_403', stage='decode')
+        metrics.inc('frames_total', sonde_type='LMS6_403', result='ok' if output['ok'] else 'error')
+
+    return output
+
+
+def _decode(frame, ignore_crc=False, cal_data=None, metrics=None, block_status=None):
+    """ Decode a LMS6_403 frame. Refer decode(). If block_status is provided, errors are recorded there rather than logged. """
+
     # Basic length check.
     if len(frame) < LMS6_403_FRAME_LEN:
         raise ValueError(f"Supplied LMS6_403 frame too small.")
@@ -117,44 +182,19 @@ def decode(frame, ignore_crc=False, cal_data=None):
     output = {}
 
     # CRC Check - CRC16-CCITT, but with an initial value of 0.
-    _crc_ok = check_packet_crc(frame, checksum="LMS6_403", big_endian=True)
+    _crc_ok = check_packet_crc(frame, checksum="LMS6_403", big_endian=True, quiet=block_status is not None)
 
     if _crc_ok:
 
         try:
             if len(frame) > LMS6_403_DECODERS["expected_len"]:
                 # Clip frame
-                logging.info(f"Discarded {len(frame)-LMS6_403_DECODERS['expected_len']} bytes: {frame[LMS6_403_DECODERS['expected_len']:]}")
+                if block_status is None:
+                    logging.info(f"Discarded {len(frame)-LMS6_403_DECODERS['expected_len']} bytes: {frame[LMS6_403_DECODERS['expected_len']:]}")
                 frame = frame[:LMS6_403_DECODERS["expected_len"]]
 
-            # Decode fields
-            _block_field_data = struct.unpack(
-                LMS6_403_DECODERS["struct"], frame
-            )
-            _block_dict = dict(
-                zip(
-                    LMS6_403_DECODERS["fields"],
-                    _block_field_data,
-                )
-            )
-
-            # Post-process any individual fields that require it
-            # These are usually simple unit or type conversions.
-            for _field in _block_dict:
-                if (
-                    _field
-                    in LMS6_403_DECODERS["field_decoders"]
-                ):
-                    _temp = LMS6_403_DECODERS[
-                        "field_decoders"
-                    ][_field](_block_dict[_field])
-
-                    if type(_temp) == dict:
-                        # If the field processor returned a dictionary, add those keys into our block dict.
-                        _block_dict.update(_temp)
-                    else:
-                        # Otherwise, we got a single value.
-                        _block_dict[_field] = _temp
+            # Decode fields, and post-process any individual fields that require it
+            _block_dict = LMS6_403_COMPILED_DECODER.decode(frame)
 
             # Apply any further post-processing to the block before storing it into the output dictionary
             # This may include converting coordinates to a more user-friendly format, or calculating
@@ -165,12 +205,24 @@ def decode(frame, ignore_crc=False, cal_data=None):
 
             output = _block_dict
 
+            if block_status is not None:
+                block_status['Overall'] = DECODE_OK
+
         except Exception as e:
-            logging.error(f"Error extracting frame data: {str(e)}")
-            return None
+            if block_status is None:
+                logging.error(f"Error extracting frame data: {str(e)}")
+                return None
+
+            block_status['Overall'] = ERR_BLOCK_DECODE
 
     else:
-        logging.error("Block CRC failure")
+        if block_status is None:
+            logging.error("Block CRC failure")
+        else:
+            block_status['Overall'] = ERR_CRC
+
+        if metrics is not None:
+            metrics.inc('block_crc_failures_total', sonde_type='LMS6_403', block='Overall')
 
 
 
@@ -184,15 +236,44 @@ def decode(frame, ignore_crc=False, cal_data=None):
 
 
 
+def decode_many(frames, ignore_crc=False, cal_data=None):
+    """
+    Decode many LMS6_403 frames (e.g. a whole flight) at once, into columns of NumPy arrays (one row per frame),
+    with temperatures calculated for every frame. Refer sondehubdecoders.LMS6_403.batch.decode_many for details. Requires NumPy.
+
+    Args:
+    frames (list, np.ndarray): List of data frames provided as bytes, or a 2-D uint8 array with one frame per row.
+    ignore_crc (bool): If set, extract fields even if the CRC check fails.
+    cal_data (list): Optional calibration data to start from.
+
+    """
+    # NumPy is only required for batch decoding, so only import the batch decoder when it is used.
+    from .batch import decode_many as batch_decode_many
+
+    return batch_decode_many(frames, ignore_crc=ignore_crc, cal_data=cal_data)
+
+
+def peek_serial(frame):
+    """
+    Extract just the serial number from a LMS6_403 frame (after de-scrambling), without decoding the rest of the frame.
+
+    Returns the serial number (as an int, as per decode()), or None if the frame is too short, or fails its CRC check.
+    """
+
+    if (len(frame) < LMS6_403_FRAME_LEN) or (frame[:LMS6_403_FRAME_HEADER_LEN] != LMS6_403_FRAME_HEADER):
+        return None
+
+    if not check_packet_crc(frame[:LMS6_403_FRAME_LEN], checksum="LMS6_403", big_endian=True):
+        return None
+
+    # Serial number is a big-endian uint32 immediately following the header.
+    return int.from_bytes(frame[LMS6_403_FRAME_HEADER_LEN:LMS6_403_FRAME_HEADER_LEN+4], 'big')
+
+
 def to_autorx_log(_frame):
-    # {'frame':[], 'time':[], 'altitude':[], 'chan1': [], 'chan2':[], 'chan3':[], 'chan4':[], 'chan13':[]}
-    _line =  f"{_frame['frame_count']},{_frame['iTOW']},{_frame['altitude']},{_frame['sensor_chan1']},{_frame['sensor_chan2']},{_frame['sensor_chan3']},{_frame['sensor_chan4']},{_frame['sensor_chan13']},"
-    if 'temperature' in _frame:
-        _line += f"{_frame['temperature']:.1f},"
-    else:
-        _line += "-273.0"
-    
-    return _line
+    """ Convert a frame dictionary into a CSV line. Refer utils.autorx_log for the column definitions """
+    # frame,iTOW,alt,chan1,chan2,chan3,chan4,chan13,temp
+    return format_log_line(_frame, 'LMS6_403')
 
 
 if __name__ == "__main__":
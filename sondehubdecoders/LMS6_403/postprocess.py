@@ -64,9 +64,34 @@ def lms6_403_calculate_temperature(frame, cal_data):
     return temp
 
 
+def lms6_403_calculate_temperature_array(temp_raw, cal_data):
+    """
+    Calculate temperatures for many frames at once, as per lms6_403_calculate_temperature.
+    temp_raw is a NumPy array of sensor_chan3 values. Returns an array of temperatures, with NaN where a
+    temperature could not be calculated (e.g. a sensor value of zero). Requires NumPy.
+    """
+    import numpy as np
+
+    R0 = cal_data[LMS6_TEMP_R0_CAL_IDX]
+    T0 = 273.15
+    B = cal_data[LMS6_TEMP_B_CAL_IDX]
+    C = 0
+
+    _ratio = np.asarray(temp_raw, dtype=np.float64) / R0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        temp = -273.15 + 1 / (1.0/T0 + 1.0/B * np.log(np.where(_ratio > 0, _ratio, np.nan))) + C
+
+    return temp
+
+
 def lms6_403_process_measurements(frame, cal_data = None):
+    """
+    Calculate sensor values for a LMS6_403 frame, if calibration data is available.
+    The frame dictionary is updated in-place, and returned.
+    """
 
-    output = frame.copy()
+    output = frame
 
 
     # No cal data available, bomb out now.
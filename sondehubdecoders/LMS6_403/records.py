@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#
+#   LMS6_403 Decoder Library - Compact Frame Record
+#
+#   Slotted equivalent of the dictionary produced by decode(), for use when many decoded
+#   frames need to be kept in memory. Use decode_record() to produce these, and to_dict() to
+#   convert them back into the regular dictionary format.
+#
+from ..utils.records import Record
+from .decoder import LMS6_403_FRAME_HEADER, decode
+
+
+class LMS6_403Frame(Record):
+    """
+    A decoded LMS6_403 frame.
+    The frame header is constant, so is not stored, and the SondeHub 'common' fields are generated on request.
+    """
+    __slots__ = (
+        "serial",
+        "frame_count",
+        "iTOW",
+        "unknown1",
+        "latitude",
+        "longitude",
+        "altitude",
+        "east_west_vel_mms",
+        "north_south_vel_mms",
+        "up_down_vel_mms",
+        "unknown2",
+        "gps_status",
+        "sensor_chan1",
+        "sensor_chan2",
+        "sensor_chan3",
+        "sensor_chan4",
+        "sensor_chan5",
+        "sensor_chan6",
+        "sensor_chan7",
+        "sensor_chan8",
+        "sensor_chan9",
+        "sensor_chan10",
+        "sensor_chan11",
+        "sensor_chan12",
+        "sensor_chan13",
+        "cal1",
+        "cal2",
+        "cal3",
+        "cal4",
+        "unknown3",
+        "checksum",
+        "temperature",
+        "cal_data",
+    )
+    _properties = (
+        "header",
+        "common",
+    )
+
+    @property
+    def header(self):
+        return LMS6_403_FRAME_HEADER
+
+    @property
+    def common(self):
+        return {'type': 'LMS6-403'}
+
+
+def decode_record(frame, cal_data=None):
+    """
+    Decode a LMS6_403 frame, provided as bytes, into a LMS6_403Frame record.
+
+    Args:
+    frame (bytes): Data frame provided as bytes
+    cal_data (list): Optional calibration data, for use in processing measurement data.
+    """
+
+    _frame = decode(frame, cal_data=cal_data)
+
+    if 'serial' not in _frame:
+        # Frame could not be decoded (e.g. CRC failure)
+        return None
+
+    return LMS6_403Frame.from_dict(_frame)
@@ -5,40 +5,94 @@
 import logging
 import time
 import traceback
+from collections import deque
 from .decoder import decode
+from .ecc import correct_frame
+from .postprocess import rs41_temp_calc_many
+from .records import decode_record
 from .subframe import *
+from ..utils.errors import error_result, ERR_MISSING_STATUS, ERR_PROCESSING, ERR_SERIAL_MISMATCH
 
 class RS41(object):
     """
     Stateful RS41 Decoder Class
     """
 
+    # Maximum number of frames to hold for re-processing, while waiting for calibration data.
+    RS41_PENDING_MEASUREMENTS_LEN = 600
+
     def __init__(
         self,
-        archive_postprocess_callback = None):
+        archive_postprocess_callback = None,
+        max_pending_measurements = RS41_PENDING_MEASUREMENTS_LEN,
+        metrics = None):
         """
-        
+        Args:
+        archive_postprocess_callback (function): Optional callback, called with (serial, list of results) when
+            frames received before the calibration data was available are re-processed.
+            Each result is a dictionary containing 'frame_count' and any calculated sensor values (e.g. 'temperature').
+        max_pending_measurements (int): Maximum number of frames to hold for re-processing. Oldest frames are discarded first.
+        metrics (DecoderMetrics): Optional metrics object (refer utils.metrics), passed on to the decoder, and
+            updated with processing errors, stage timings, and the time taken to receive the complete subframe.
         """
 
         # Serial number store. Once set, all future frames must match this serial number
         self.serial = None
-        # Store of raw frames which we will post-process once a full sub-frame is available.
-        self.raw_frames = []
+        # Measurement data (frame_count, temp_meas_main, temp_meas_ref1, temp_meas_ref2) from frames received
+        # before calibration data was available, which we will re-process once the calibration data arrives.
+        self.pending_measurements = deque(maxlen=max_pending_measurements)
         # Subframe data store, as a dictionary with each sub-frame entry.
         self.subframe = None
         self.max_subframe = None
+        # Time the subframe object was created, used to report how long it takes to receive the full subframe.
+        self.subframe_start_time = None
 
         # Last frame arrival time, which allows us to close out this object after some timeout.
         self.last_frame_time = time.time()
 
         self.archive_postprocess_callback = archive_postprocess_callback
+        self.metrics = metrics
 
     
-    def add_frame(self, raw):
-        """ Add and process a frame """
+    def add_frame(self, raw, blocks=None, lazy=False, record=False, strict=True, ecc=False):
+        """
+        Add and process a frame
+
+        Args:
+        raw (bytes): Data frame provided as bytes
+        blocks (list): Optional list of block names to decode. The Status block is always decoded.
+        lazy (bool): If set, only decode each block when it is first accessed. Refer decode()
+        record (bool): If set, return a compact RS41Frame record instead of a dictionary. Refer records.decode_record()
+        strict (bool): If set (default), log any errors, and return None if the frame could not be processed.
+            Otherwise, don't log anything, and always return a dictionary with 'ok', 'errors' and 'block_status' fields
+            (refer decode() and utils.errors). Can not be used with record.
+        ecc (bool): If set, correct any errors in the frame using its Reed-Solomon parity data before decoding it. Refer decode()
+        """
+
+        if record and not strict:
+            raise ValueError("Records can not be returned when strict=False.")
+
+        if blocks is not None:
+            # We always need the status block to track the sonde serial number and subframe data.
+            blocks = set(blocks) | {'Status'}
+
+        if self.metrics is not None:
+            _start = time.perf_counter()
 
         try:
-            _frame = decode(raw, subframe=self.subframe)
+            if record:
+                if ecc:
+                    (raw, _) = correct_frame(raw)
+                _frame = decode_record(raw, subframe=self.subframe, blocks=blocks, metrics=self.metrics)
+            else:
+                _frame = decode(raw, subframe=self.subframe, blocks=blocks, lazy=lazy, metrics=self.metrics, strict=strict, ecc=ecc)
+
+            if not strict:
+                if not _frame['ok']:
+                    return _frame
+
+                if 'Status' not in _frame['blocks']:
+                    return self._frame_error(_frame, ERR_MISSING_STATUS)
 
             self.last_frame_time = time.time()
 
@@ -46,30 +100,121 @@ class RS41(object):
                 self.serial = _frame['blocks']['Status']['serial']
             else:
                 if _frame['blocks']['Status']['serial'] != self.serial:
+                    if not strict:
+                        return self._frame_error(_frame, ERR_SERIAL_MISMATCH)
+
                     # Serial mismatch!
                     raise ValueError(f"Telemetry is from a different radiosonde! ({_frame['blocks']['Status']['serial']}, should be {self.serial}.")
 
-            # If measurements could not be calculated, add the frame to self.raw_frames for later re-processing
+            # If measurements could not be calculated due to missing calibration data, store the raw
+            # measurement data for later re-processing
+            if ('Measurements' in _frame['blocks']) and not (self.subframe and self.subframe.temperature_cal_available()):
+                _meas = _frame['blocks']['Measurements']
+
+                if 'temperature' not in _meas:
+                    self.pending_measurements.append(
+                        (_frame['blocks']['Status']['frame_count'], _meas['temp_meas_main'], _meas['temp_meas_ref1'], _meas['temp_meas_ref2'])
+                    )
 
             # Create a new subframe object if none exists yet
             if self.subframe is None:
                 self.subframe = RS41Subframe(max_subframe=_frame['blocks']['Status']['max_subframe'])
+                self.subframe_start_time = time.time()
 
             # Add the current subframe data
-            self.subframe.add_segment(_frame['blocks']['Status']['subframe_count'], _frame['blocks']['Status']['subframe_data'])
+            if self.metrics is None:
+                self.subframe.add_segment(_frame['blocks']['Status']['subframe_count'], _frame['blocks']['Status']['subframe_data'])
+            else:
+                self._add_segment_with_metrics(_frame['blocks']['Status'])
 
-            _frame['subframe'] = self.subframe.subframe_fields
+            if self.pending_measurements and self.subframe.temperature_cal_available():
+                self.reprocess_pending()
 
-            if self.subframe.subframe_complete():
-                # TODO - Reprocess anything in self.raw_frames and send to a callback.
-                pass
+            if record:
+                _frame.subframe = self.subframe
+            else:
+                _frame['subframe'] = self.subframe.subframe_fields
+
+            if self.metrics is not None:
+                self.metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='RS41', stage='add_frame')
 
             return _frame
             
 
 
         except Exception as e:
+            if self.metrics is not None:
+                self.metrics.inc('add_frame_errors_total', sonde_type='RS41', error=type(e).__name__)
+
+            if not strict:
+                return error_result(ERR_PROCESSING, type(e).__name__)
+
             logging.exception(f"Error processing frame",exc_info=e)
             return
 
 
+    def _frame_error(self, frame, code):
+        """ Mark a (strict=False) decoded frame as failed, with the supplied error code """
+
+        frame['ok'] = False
+        frame['errors'].append((code, None))
+
+        if self.metrics is not None:
+            self.metrics.inc('add_frame_errors_total', sonde_type='RS41', error=code)
+
+        return frame
+
+
+    def _add_segment_with_metrics(self, status):
+        """ Add a subframe segment, recording the time taken, and the time at which the subframe became complete """
+
+        _was_complete = self.subframe.subframe_complete()
+        _start = time.perf_counter()
+
+        self.subframe.add_segment(status['subframe_count'], status['subframe_data'])
+
+        self.metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='RS41', stage='subframe')
+
+        if (not _was_complete) and (self.subframe_start_time is not None) and self.subframe.subframe_complete():
+            self.metrics.observe('subframe_complete_seconds', time.time() - self.subframe_start_time, sonde_type='RS41')
+
+
+    def reprocess_pending(self):
+        """
+        Calculate sensor values for any frames received before the calibration data was available,
+        and pass them to the archive_postprocess_callback (if set).
+
+        Returns a list of results (dictionaries containing 'frame_count' and 'temperature').
+        """
+
+        if not self.pending_measurements:
+            return []
+
+        (_frame_counts, _f, _f1, _f2) = zip(*self.pending_measurements)
+        self.pending_measurements.clear()
+
+        # Calculate all the temperatures in one go.
+        _temps = rs41_temp_calc_many(
+            self.subframe.subframe_fields['rf1'],
+            self.subframe.subframe_fields['rf2'],
+            _f, _f1, _f2,
+            self.subframe.subframe_fields['tempmeas_co1'],
+            self.subframe.subframe_fields['tempmeas_calT1'],
+        )
+
+        output = []
+        for (_frame_count, _temp) in zip(_frame_counts, _temps):
+            _result = {'frame_count': _frame_count}
+            if _temp is not None:
+                _result['temperature'] = _temp
+            output.append(_result)
+
+        logging.debug(f"Re-processed {len(output)} frames from {self.serial}")
+
+        if self.archive_postprocess_callback:
+            try:
+                self.archive_postprocess_callback(self.serial, output)
+            except Exception as e:
+                logging.exception(f"Error in archive post-process callback", exc_info=e)
+
+        return output
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+#
+#   RS41 Batch Frame Decoder
+#
+#   Decodes many RS41 frames at once into columns of NumPy arrays, rather than one dictionary per frame.
+#   This is intended for re-processing archived flights, where we have all the frames available up-front.
+#
+#   Rather than walking through each frame in turn, each step (header check, block walk, CRC check,
+#   field extraction) is performed across all frames at once. Blocks are extracted using the same
+#   block decoder tables as the single-frame decoder, converted into NumPy structured dtypes.
+#
+import numpy as np
+from ..utils.checksums import crc16_ccitt_many
+from ..utils.data_types import uint24_le_array
+from ..utils.gnss_time import gps_to_utc_array
+from .decoder import (
+    RS41_FRAME_HEADER,
+    RS41_FRAME_HEADER_LEN,
+    RS41_FRAME_TYPE_POS,
+    RS41_FRAME_TYPE_REGULAR,
+    RS41_FRAME_TYPE_EXTENDED,
+    RS41_BLOCK_START_POS,
+    RS41_BLOCK_STATUS,
+    RS41_BLOCK_MEAS,
+    RS41_BLOCK_SGM_xTU,
+    RS41_BLOCK_GPSINFO,
+    RS41_BLOCK_GPSPOS,
+    RS41_COMPILED_BLOCK_DECODERS,
+    RS41_XOR_MASK,
+    RS41_XOR_SCRAMBLE,
+)
+from .postprocess import rs41_process_gps_position_array
+
+
+# Blocks that are extracted by the batch decoder, and the name of the 'block OK' column for each.
+# Both the RS41-SG/SGP and RS41-SGM measurement blocks are extracted into the same columns.
+RS41_BATCH_BLOCKS = {
+    RS41_BLOCK_STATUS: "status_ok",
+    RS41_BLOCK_MEAS: "measurements_ok",
+    RS41_BLOCK_SGM_xTU: "measurements_ok",
+    RS41_BLOCK_GPSINFO: "gps_info_ok",
+    RS41_BLOCK_GPSPOS: "gps_position_ok",
+}
+
+# Vectorized equivalents of the field_decoders within RS41_BLOCK_DECODERS.
+RS41_BATCH_FIELD_DECODERS = {
+    # Decoded leniently, so that a corrupted serial number (e.g. with ignore_crc set) doesn't fail the whole batch.
+    "serial": lambda s: np.char.decode(s, 'utf-8', 'replace'),
+    "battery": lambda v_in: v_in / 10.0,
+    "subframe_data": lambda d: d.view('u1').reshape(-1, 16),
+    "temp_meas_main": uint24_le_array,
+    "temp_meas_ref1": uint24_le_array,
+    "temp_meas_ref2": uint24_le_array,
+    "humidity_main": uint24_le_array,
+    "humidity_ref1": uint24_le_array,
+    "humidity_ref2": uint24_le_array,
+    "humidity_temp_main": uint24_le_array,
+    "humidity_temp_ref1": uint24_le_array,
+    "humidity_temp_ref2": uint24_le_array,
+    "pressure_main": uint24_le_array,
+    "pressure_ref1": uint24_le_array,
+    "pressure_ref2": uint24_le_array,
+    "pressure_temp": lambda t_in: t_in / 100.0,
+    "sAcc": lambda sAcc: sAcc*10.0,
+    "pDOP": lambda pDOP: pDOP/10.0,
+    "iTOW": lambda iTOW: iTOW/1000.0,
+    "sv_quality": lambda d: d.view('u1').reshape(-1, 24),
+}
+
+# Fields added by GPS Position post-processing.
+RS41_BATCH_GPS_POSITION_FIELDS = [
+    "latitude",
+    "longitude",
+    "altitude",
+    "ground_speed",
+    "ascent_rate",
+    "wind_u",
+    "wind_v",
+    "heading",
+]
+
+# The maximum number of blocks we expect to find within a frame.
+RS41_BATCH_MAX_BLOCKS = 16
+
+
+def frames_to_array(frames):
+    """
+    Convert a list of frames (as bytes) into a 2-D uint8 NumPy array, zero-padding shorter frames.
+    If a 2-D array is provided, it is returned as-is.
+
+    Returns a tuple of (frame array, frame lengths)
+    """
+
+    if isinstance(frames, np.ndarray):
+        if frames.ndim != 2:
+            raise ValueError("Frame array must be 2-dimensional.")
+
+        _frames = np.ascontiguousarray(frames, dtype=np.uint8)
+        return (_frames, np.full(_frames.shape[0], _frames.shape[1], dtype=np.int64))
+
+    _lengths = np.array([len(_frame) for _frame in frames], dtype=np.int64)
+    _width = int(_lengths.max()) if len(frames) else RS41_BLOCK_START_POS
+
+    _buffer = b"".join([bytes(_frame).ljust(_width, b"\x00") for _frame in frames])
+    _frames = np.frombuffer(_buffer, dtype=np.uint8).reshape(len(frames), _width)
+
+    return (_frames, _lengths)
+
+
+def descramble_many(frames):
+    """
+    De-Scramble many RS41 frames at once, by XORing every row of the frame array with the scramble mask.
+
+    Args:
+    frames (list, np.ndarray): Data frames (each starting at the frame header), provided either as a list of bytes,
+        or a 2-D uint8 NumPy array (one frame per row).
+
+    Returns a 2-D uint8 array of de-scrambled frames. If a list of frames is provided, shorter frames are zero-padded
+    (after de-scrambling).
+    """
+
+    (_frames, _lengths) = frames_to_array(frames)
+    _width = _frames.shape[1]
+
+    if _width <= len(RS41_XOR_MASK):
+        _mask = np.frombuffer(RS41_XOR_MASK, dtype=np.uint8)[:_width]
+    else:
+        _mask = np.resize(np.frombuffer(RS41_XOR_SCRAMBLE, dtype=np.uint8), _width)
+
+    output = _frames ^ _mask
+
+    if isinstance(frames, np.ndarray):
+        return output
+
+    # Restore the zero padding of the shorter frames.
+    output[np.arange(_width) >= _lengths[:, None]] = 0
+
+    return output
+
+
+def _new_column(dtype, num_frames, shape=()):
+    """ Create an output column, filled with a 'missing' value appropriate to its type. """
+
+    if dtype.kind == 'f':
+        return np.full((num_frames,) + shape, np.nan, dtype=dtype)
+    else:
+        return np.zeros((num_frames,) + shape, dtype=dtype)
+
+
+def decode_many(frames, ignore_crc=False):
+    """
+    Decode many RS41 frames at once, provided either as a list of bytes, or a 2-D uint8 NumPy array
+    (one frame per row), after de-scrambling has been performed.
+
+    Args:
+    frames (list, np.ndarray): Data frames to decode.
+    ignore_crc (bool): If set, extract blocks even if their CRC check fails.
+
+    Returns a dictionary of NumPy arrays (columns), with one row per frame. Columns include:
+    frame_ok: Frame has a valid header and frame type.
+    frame_type: Raw frame type field.
+    status_ok, measurements_ok, gps_info_ok, gps_position_ok: Block was found and passed its CRC check.
+    Then, one column per field within the Status, Measurements, GPS Fix Information and GPS Position blocks,
+    plus the post-processed GPS Position fields (latitude, longitude, altitude, ground_speed, etc),
+    and the GPS Fix Information timestamp (as a UTC datetime64[us] column 'timestamp').
+
+    Where a block is missing or failed its CRC check, integer fields are set to 0, and float fields to NaN.
+    Where a block is repeated within a frame, the last valid copy is used, as per decode().
+    """
+
+    (_frames, _lengths) = frames_to_array(frames)
+    _num_frames = _frames.shape[0]
+    _width = _frames.shape[1]
+    _rows = np.arange(_num_frames)
+
+    output = {}
+
+    # Header and frame type check.
+    if _width < RS41_BLOCK_START_POS:
+        _frame_ok = np.zeros(_num_frames, dtype=bool)
+        _frame_type = np.zeros(_num_frames, dtype=np.uint8)
+    else:
+        _header = np.frombuffer(RS41_FRAME_HEADER, dtype=np.uint8)
+        _frame_type = _frames[:, RS41_FRAME_TYPE_POS].copy()
+        _frame_ok = np.all(_frames[:, :RS41_FRAME_HEADER_LEN] == _header, axis=1)
+        _frame_ok &= (_frame_type == RS41_FRAME_TYPE_REGULAR) | (_frame_type == RS41_FRAME_TYPE_EXTENDED)
+        _frame_ok &= (_lengths >= RS41_BLOCK_START_POS)
+
+    output['frame_ok'] = _frame_ok
+    output['frame_type'] = _frame_type
+    output['frame_len'] = _lengths
+
+    # Walk through the blocks in all frames at once, recording the position of each block type
+    # we are interested in. A position of -1 means the block was not found. As per index_blocks, where a
+    # block type is repeated within a frame, the last occurrence which passes its CRC check is used.
+    _block_pos = {_type: np.full(_num_frames, -1, dtype=np.int64) for _type in RS41_BATCH_BLOCKS}
+
+    _pos = np.full(_num_frames, RS41_BLOCK_START_POS, dtype=np.int64)
+    _active = _frame_ok.copy()
+
+    for _i in range(RS41_BATCH_MAX_BLOCKS):
+        _active &= (_pos + 2 <= _lengths)
+        if not _active.any():
+            break
+
+        _safe_pos = np.where(_active, _pos, 0)
+        _types = _frames[_rows, _safe_pos]
+        _lens = _frames[_rows, np.minimum(_safe_pos + 1, _width - 1)].astype(np.int64)
+
+        for _type in RS41_BATCH_BLOCKS:
+            _expected_len = RS41_COMPILED_BLOCK_DECODERS[_type].expected_len
+            _found = _active & (_types == _type) & (_lens == _expected_len) & (_pos + 2 + _lens + 2 <= _lengths)
+
+            # Check the CRCs of the blocks found, grouped by position so each group is a contiguous slice.
+            if not ignore_crc:
+                for _block_start in np.unique(_pos[_found]):
+                    _group = np.nonzero(_found & (_pos == _block_start))[0]
+                    _block = _frames[_group, _block_start + 2:_block_start + 2 + _expected_len + 2]
+                    _crc = _block[:, -2].astype(np.uint16) | (_block[:, -1].astype(np.uint16) << 8)
+                    _found[_group[crc16_ccitt_many(_block[:, :-2]) != _crc]] = False
+
+            _block_pos[_type][_found] = _pos[_found]
+
+        _pos += 2 + _lens + 2
+
+    # Blocks of different types which are decoded into the same columns (i.e. the RS41-SG and RS41-SGM measurement
+    # blocks) share a name in the single-frame decoder, so again only the last of them is used.
+    for _type in RS41_BATCH_BLOCKS:
+        for _other_type in RS41_BATCH_BLOCKS:
+            if _other_type != _type and RS41_BATCH_BLOCKS[_other_type] == RS41_BATCH_BLOCKS[_type]:
+                _block_pos[_type][_block_pos[_type] < _block_pos[_other_type]] = -1
+
+    # Now extract each block. Blocks are grouped by position, so that each group can be extracted
+    # as a contiguous slice of the frame array, and viewed as a structured array.
+    for _type in RS41_BATCH_BLOCKS:
+        _decoder = RS41_COMPILED_BLOCK_DECODERS[_type]
+        _ok_column = RS41_BATCH_BLOCKS[_type]
+
+        if _ok_column not in output:
+            output[_ok_column] = np.zeros(_num_frames, dtype=bool)
+
+        for _block_start in np.unique(_block_pos[_type]):
+            if _block_start == -1:
+                continue
+
+            _group = np.nonzero(_block_pos[_type] == _block_start)[0]
+            _data_start = _block_start + 2
+            _data_end = _data_start + _decoder.expected_len
+            _block_data = np.ascontiguousarray(_frames[_group, _data_start:_data_end])
+
+            output[_ok_column][_group] = True
+
+            _block_fields = _block_data.view(_decoder.dtype).reshape(-1)
+
+            for _field in _decoder.dtype.names:
+                _values = _block_fields[_field]
+
+                if _field in RS41_BATCH_FIELD_DECODERS:
+                    _values = RS41_BATCH_FIELD_DECODERS[_field](np.ascontiguousarray(_values))
+
+                if _field not in output:
+                    output[_field] = _new_column(_values.dtype, _num_frames, _values.shape[1:])
+
+                output[_field][_group] = _values
+
+    # Convert GPS positions and velocities to lat/lon/alt, ground speed, ascent rate, etc.
+    if 'ecef_pos_x_cm' in output:
+        output = rs41_process_gps_position_array(output)
+
+        for _field in RS41_BATCH_GPS_POSITION_FIELDS:
+            output[_field][~output['gps_position_ok']] = np.nan
+
+    # Convert GPS week / time-of-week to UTC timestamps.
+    if 'week' in output:
+        output['timestamp'] = gps_to_utc_array(output['week'], output['iTOW'])
+        output['timestamp'][~output['gps_info_ok']] = np.datetime64('NaT')
+
+    return output
+
+
+if __name__ == "__main__":
+    import logging
+    import math
+    import struct
+    from ..utils.benchmark import make_rs41_corpus
+    from ..utils.checksums import get_crc_func
+    from .decoder import decode, index_blocks, RS41_BLOCK_EMPTY
+
+    # Decode errors in the corrupted corpus are expected, so don't log them.
+    logging.basicConfig(level=logging.CRITICAL)
+
+    # Block name (as used by the single-frame decoder) -> 'block OK' column.
+    _block_columns = {RS41_COMPILED_BLOCK_DECODERS[_type].block_name: _column for (_type, _column) in RS41_BATCH_BLOCKS.items()}
+
+    _corpora = {'clean': make_rs41_corpus(200, 'clean'), 'corrupted': make_rs41_corpus(200, 'corrupted')}
+
+    # Frames with a repeated Status block (from a later frame), in place of the GPS Raw block, followed by an Empty
+    # block as padding. The last copy should be used, unless (in every second frame) it fails its CRC check.
+    _corpora['repeated'] = []
+    for _i in range(20):
+        _frame = bytearray(_corpora['clean'][_i])
+        (_, _raw_start, _raw_len) = index_blocks(_frame)['GPS Raw']
+        _status = _corpora['clean'][_i + 100][RS41_BLOCK_START_POS:RS41_BLOCK_START_POS + 2 + 40 + 2]
+        _padding = _raw_len - len(_status)
+        _empty = bytes([RS41_BLOCK_EMPTY, _padding]) + bytes(_padding) + struct.pack('<H', get_crc_func('CRC16_CCITT')(bytes(_padding)))
+
+        _frame[_raw_start - 2:_raw_start + _raw_len + 2] = _status + _empty
+        if _i % 2:
+            _frame[_raw_start - 2 + 2 + 8] ^= 0xFF
+        _corpora['repeated'].append(bytes(_frame))
+
+    for (_kind, _frames) in _corpora.items():
+        _columns = decode_many(_frames)
+        _fields = 0
+
+        # Each column should agree with the fields produced by the single-frame decoder.
+        for (_i, _frame) in enumerate(_frames):
+            _blocks = decode(_frame, strict=False).get('blocks', {})
+
+            for (_block_name, _ok_column) in _block_columns.items():
+                assert _columns[_ok_column][_i] == (_block_name in _blocks), (_kind, _i, _block_name)
+
+                for (_field, _value) in _blocks.get(_block_name, {}).items():
+                    if _field == 'timestamp_dt':
+                        assert _columns['timestamp'][_i] == np.datetime64(_value.replace(tzinfo=None)), (_kind, _i)
+                    elif _field not in _columns or isinstance(_value, dict):
+                        continue
+                    elif isinstance(_value, bytes):
+                        assert bytes(_columns[_field][_i]) == _value, (_kind, _i, _field)
+                    elif isinstance(_value, float):
+                        assert math.isclose(_columns[_field][_i], _value, rel_tol=1e-9, abs_tol=1e-9), (_kind, _i, _field)
+                    else:
+                        assert _columns[_field][_i] == _value, (_kind, _i, _field)
+                    _fields += 1
+
+        print(f"{_kind}: {len(_frames)} frames, {int(_columns['status_ok'].sum())} with a Status block, {_fields} fields match")
+
+    _frame_counts = decode_many(_corpora['repeated'])['frame_count']
+    assert list(_frame_counts[0::2]) == list(range(1100, 1120, 2))
+    assert list(_frame_counts[1::2]) == list(range(1001, 1020, 2))
+
+    # With CRC checks disabled, corrupted blocks are decoded too, including serial numbers which are not valid UTF-8.
+    _columns = decode_many(_corpora['corrupted'], ignore_crc=True)
+    _checked = decode_many(_corpora['corrupted'])
+    for _ok_column in set(RS41_BATCH_BLOCKS.values()):
+        assert np.all(_columns[_ok_column] >= _checked[_ok_column])
+    assert np.all(_columns['serial'][_checked['status_ok']] == _checked['serial'][_checked['status_ok']])
+    print(f"corrupted (ignore_crc): {int(_columns['status_ok'].sum())} with a Status block, "
+        f"{int(np.char.count(_columns['serial'], chr(0xFFFD)).astype(bool).sum())} serial numbers with invalid characters")
+
+    print("All tests passed!")
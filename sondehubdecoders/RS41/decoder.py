@@ -7,17 +7,33 @@
 #   - https://github.com/rs1729/RS/
 #
 import logging
-import struct
-from ..utils.checksums import check_packet_crc
+import time
+from collections.abc import Mapping
+from ..utils.autorx_log import format_log_line
+from ..utils.checksums import check_span_crcs
 from ..utils.data_types import *
+from ..utils.errors import *
+from ..utils.schema import compile_block_decoders
+from .ecc import correct_frame
 from .postprocess import *
 
 # Frame Header - common to all frames.
 RS41_FRAME_HEADER = b"\x86\x35\xf4\x40\x93\xdf\x1a\x60"
 
-# RS41 XOR Scrambling Sequence. Not currently using this
+# RS41 XOR Scrambling Sequence. This repeats every 64 bytes, starting from the first byte of the frame header.
 RS41_XOR_SCRAMBLE = b'\x96\x83>Q\xb1I\x08\x982\x05Y\x0e\xf9D\xc6&!`\xc2\xeay]m\xa1TiG\x0c\xdc\xe8\\\xf1\xf7v\x82\x7f\x07\x99\xa2,\x93|0c\xf5\x10.a\xd0\xbc\xb4\xb6\x06\xaa\xf4#xn;\xae\xbf{L\xc1'
 
+# Maximum (extended) frame length.
+RS41_FRAME_LEN_EXTENDED = 518
+
+# The scramble sequence, repeated out to the length of an extended frame, as a (big-endian) integer,
+# so a whole frame can be de-scrambled with a single XOR.
+RS41_XOR_MASK = (RS41_XOR_SCRAMBLE * (RS41_FRAME_LEN_EXTENDED // len(RS41_XOR_SCRAMBLE) + 1))[:RS41_FRAME_LEN_EXTENDED]
+RS41_XOR_MASK_INT = int.from_bytes(RS41_XOR_MASK, 'big')
+
+# Frame header, as transmitted (before de-scrambling).
+RS41_FRAME_HEADER_SCRAMBLED = bytes(_a ^ _b for (_a, _b) in zip(RS41_FRAME_HEADER, RS41_XOR_SCRAMBLE))
+
 # Frame Types
 RS41_FRAME_TYPE_REGULAR = 0x0F
 RS41_FRAME_TYPE_EXTENDED = 0xF0
@@ -265,8 +281,236 @@ RS41_BLOCK_DECODERS = {
     },
 }
 
+# Pre-compiled block decoders, generated from the above.
+RS41_COMPILED_BLOCK_DECODERS = compile_block_decoders(RS41_BLOCK_DECODERS)
+
+
+def index_blocks(frame, blocks=None, metrics=None, block_status=None):
+    """
+    Find the position of each valid sub-block within a RS41 frame, without decoding them.
+    Blocks which fail their CRC check, are of an unknown type, or have an unexpected length are skipped.
+
+    Args:
+    frame (bytes): Data frame provided as bytes
+    blocks (list): Optional list of block names (e.g. ['Status', 'GPS Position']). If provided, only these blocks are indexed.
+    metrics (DecoderMetrics): Optional metrics object, used to count skipped blocks, and time the CRC checks.
+    block_status (dict): Optional dictionary, which is updated with block name (or type, for unknown blocks) -> status
+        code (refer utils.errors) for each block found. If provided, skipped blocks are not logged.
+
+    Returns a dictionary of block name -> (CompiledBlockDecoder, block data start, block data length)
+    """
+
+    # Walk through the frame to find the position of each sub-block.
+    # Each block is made up of a block type, block length, the block data, then a CRC16.
+    _blocks = []
+    _idx = RS41_BLOCK_START_POS
+
+    while _idx + 2 <= len(frame):
+        _blocks.append((frame[_idx], _idx, frame[_idx + 1]))
+        # Increment our pointer to the start of the next block.
+        _idx += 2 + frame[_idx + 1] + 2
+
+    if blocks is not None:
+        # Only keep the blocks we have been asked for.
+        _blocks = [
+            _block for _block in _blocks
+            if (_block[0] in RS41_COMPILED_BLOCK_DECODERS) and (RS41_COMPILED_BLOCK_DECODERS[_block[0]].block_name in blocks)
+        ]
+
+    # Check the CRCs of all the blocks in one go.
+    if metrics is not None:
+        _start = time.perf_counter()
+
+    _block_crcs = check_span_crcs(frame, [(_pos + 2, _len) for (_type, _pos, _len) in _blocks])
+
+    if metrics is not None:
+        metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='RS41', stage='crc')
+
+    output = {}
+
+    for ((_block_type, _idx, _block_len), _crc_ok) in zip(_blocks, _block_crcs):
+        if _crc_ok:
+            _decoder = RS41_COMPILED_BLOCK_DECODERS.get(_block_type)
+
+            if _decoder is None:
+                if block_status is None:
+                    logging.error(f"Unknown Block Type: {hex(_block_type)}, Length: {_block_len}")
+                else:
+                    block_status[_block_type] = ERR_UNKNOWN_BLOCK
+
+                if metrics is not None:
+                    metrics.inc('unknown_blocks_total', sonde_type='RS41', block_type=hex(_block_type))
 
-def decode(frame, ignore_crc=False, subframe=None):
+            elif (_decoder.expected_len == -1) or (_block_len == _decoder.expected_len):
+                # Variable length block (passed through as raw data), or a fixed length block of the right size.
+                output[_decoder.block_name] = (_decoder, _idx + 2, _block_len)
+
+                if block_status is not None:
+                    block_status[_decoder.block_name] = DECODE_OK
+
+            else:
+                if block_status is None:
+                    logging.error(
+                        f"Block Type {hex(_block_type)} has unexpected length {_block_len} (expected {_decoder.expected_len})"
+                    )
+                else:
+                    block_status[_decoder.block_name] = ERR_BLOCK_LENGTH
+
+                if metrics is not None:
+                    metrics.inc('block_length_errors_total', sonde_type='RS41', block=_decoder.block_name)
+
+        else:
+            if block_status is None:
+                logging.error("Block CRC failure")
+            else:
+                _decoder = RS41_COMPILED_BLOCK_DECODERS.get(_block_type)
+                block_status[_decoder.block_name if _decoder else _block_type] = ERR_CRC
+
+            if metrics is not None:
+                # The block type byte is outside the CRC, so may itself be corrupted.
+                _decoder = RS41_COMPILED_BLOCK_DECODERS.get(_block_type)
+                metrics.inc('block_crc_failures_total', sonde_type='RS41', block=_decoder.block_name if _decoder else 'unknown')
+
+    return output
+
+
+class RS41LazyBlocks(Mapping):
+    """
+    Read-only mapping of block name -> decoded block, as returned by decode(lazy=True).
+    Block positions are indexed up-front, but each block is only unpacked and post-processed
+    when it is first accessed.
+    """
+
+    def __init__(self, frame, block_index, subframe=None):
+        self._frame = frame
+        # Block name -> (CompiledBlockDecoder, block data start, block data length), as produced by index_blocks()
+        self.block_index = block_index
+        self._subframe = subframe
+        self._decoded = {}
+
+
+    def __getitem__(self, block_name):
+        if block_name in self._decoded:
+            return self._decoded[block_name]
+
+        (_decoder, _start, _len) = self.block_index[block_name]
+        _block = _decoder.decode(self._frame[_start : _start + _len], subframe=self._subframe)
+        self._decoded[block_name] = _block
+
+        return _block
+
+
+    def __contains__(self, block_name):
+        # Don't decode the block just to check if it is present.
+        return block_name in self.block_index
+
+
+    def __iter__(self):
+        return iter(self.block_index)
+
+
+    def __len__(self):
+        return len(self.block_index)
+
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+# SondeHub 'common' telemetry fields, and the block name and block field they are extracted from.
+RS41_COMMON_BLOCK_FIELDS = {
+    'serial':   ('Status', 'serial'),
+    'frame':    ('Status', 'frame_count'),
+    'batt':     ('Status', 'battery'),
+    'datetime': ('GPS Fix Information', 'timestamp_str'),
+    'sats':     ('GPS Position', 'numSV'),
+    'lat':      ('GPS Position', 'latitude'),
+    'lon':      ('GPS Position', 'longitude'),
+    'alt':      ('GPS Position', 'altitude'),
+    'vel_v':    ('GPS Position', 'ascent_rate'),
+    'vel_h':    ('GPS Position', 'ground_speed'),
+    'heading':  ('GPS Position', 'heading'),
+}
+
+
+def rs41_subframe_common_fields(subframe=None):
+    """
+    Extract the SondeHub 'common' fields which don't come from a block (sonde type, and fields from the subframe data).
+    """
+
+    output = {'type': 'RS41'}
+
+    if subframe:
+        if 'subtype' in subframe.subframe_fields:
+            output['subtype'] = subframe.subframe_fields['subtype']
+
+        if 'burstkill_timer' in subframe.subframe_fields:
+            output['burst_timer'] = subframe.subframe_fields['burstkill_timer']
+
+        if 'tx_frequency' in subframe.subframe_fields:
+            output['tx_frequency'] = subframe.subframe_fields['tx_frequency']/1000.0
+
+    return output
+
+
+class RS41LazyCommon(Mapping):
+    """
+    Read-only mapping of the SondeHub 'common' telemetry fields for a frame.
+    Fields are only extracted from their source block when accessed, so when used with
+    RS41LazyBlocks, only the blocks containing the requested fields get decoded.
+    """
+
+    def __init__(self, blocks, subframe=None, values=None):
+        """
+        Args:
+        blocks (Mapping): Decoded blocks (block name -> block)
+        subframe (RS41Subframe): Optional subframe Object, from which additional fields are extracted.
+        values (dict): Optional pre-extracted non-block fields (as produced by rs41_subframe_common_fields),
+            used in place of extracting them from the subframe object.
+        """
+        self._blocks = blocks
+
+        # Work out which fields are available, based on the blocks present in the frame.
+        self._block_fields = {
+            _field: _source for (_field, _source) in RS41_COMMON_BLOCK_FIELDS.items() if _source[0] in blocks
+        }
+
+        # The sonde type, and any fields from the subframe data are cheap to extract, so we do those now.
+        if values is None:
+            values = rs41_subframe_common_fields(subframe)
+
+        self._values = values
+
+
+    def __getitem__(self, field):
+        if field in self._values:
+            return self._values[field]
+
+        (_block_name, _block_field) = self._block_fields[field]
+        return self._blocks[_block_name][_block_field]
+
+
+    def __contains__(self, field):
+        return (field in self._values) or (field in self._block_fields)
+
+
+    def __iter__(self):
+        yield 'type'
+        yield from self._block_fields
+        for _field in self._values:
+            if _field != 'type':
+                yield _field
+
+
+    def __len__(self):
+        return len(self._values) + len(self._block_fields)
+
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def decode(frame, ignore_crc=False, subframe=None, blocks=None, lazy=False, metrics=None, strict=True, ecc=False):
     """
     Attempt to decode a RS41 frame, provided as bytes, after de-scrambling has been performed.
 
@@ -274,9 +518,109 @@ def decode(frame, ignore_crc=False, subframe=None):
     frame (bytes): Data frame provided as bytes
     ignore_crc (bool): If set, ignore any CRC failures
     subframe (dict): Optional subframe Object, for use in processing measurement data.
+    blocks (list): Optional list of block names to decode (e.g. ['Status', 'GPS Position']). Other blocks are skipped.
+    lazy (bool): If set, the 'blocks' and 'common' entries of the output are RS41LazyBlocks and RS41LazyCommon
+        mappings, which only decode each block when it (or a common field from it) is first accessed.
+    metrics (DecoderMetrics): Optional metrics object, which is updated with frame and block counts, and stage timings.
+    strict (bool): If set (default), raise a ValueError if the frame cannot be decoded, and log any blocks which fail.
+        Otherwise, never raise or log, and report any problems in the 'ok', 'errors' and 'block_status' fields
+        of the output (refer utils.errors). If the frame cannot be decoded, only these fields are returned.
+        Errors in blocks decoded lazily (on access) are raised as normal.
+    ecc (bool): If set, correct any errors in the frame using its Reed-Solomon parity data (refer ecc.correct_frame)
+        before decoding it. The number of bytes corrected (or -1 if the errors could not be corrected) is added to the
+        output as 'ecc_errors'.
 
     """
 
+    if ecc:
+        return _decode_ecc(frame, ignore_crc, subframe, blocks, lazy, metrics, strict)
+
+    if not strict:
+        return _decode_result(frame, subframe, blocks, lazy, metrics)
+
+    if metrics is None:
+        return _decode(frame, ignore_crc, subframe, blocks, lazy)
+
+    _start = time.perf_counter()
+
+    try:
+        output = _decode(frame, ignore_crc, subframe, blocks, lazy, metrics)
+    except ValueError:
+        metrics.inc('frames_total', sonde_type='RS41', result='invalid')
+        raise
+
+    metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='RS41', stage='decode')
+    metrics.inc('frames_total', sonde_type='RS41', result=_frame_result(output))
+
+    return output
+
+
+def _frame_result(output):
+    """ Result of decoding a frame, for metrics - 'error' if the Status block was not decoded (e.g. every block failed its CRC check) """
+
+    return 'ok' if RS41_COMPILED_BLOCK_DECODERS[RS41_BLOCK_STATUS].block_name in output['blocks'] else 'error'
+
+
+def _decode_ecc(frame, ignore_crc=False, subframe=None, blocks=None, lazy=False, metrics=None, strict=True):
+    """ Correct a RS41 frame using its Reed-Solomon parity data, then decode it. Refer decode(ecc=True) """
+
+    if metrics is not None:
+        _start = time.perf_counter()
+
+    (frame, _ecc_errors) = correct_frame(frame)
+
+    if metrics is not None:
+        metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='RS41', stage='ecc')
+        metrics.inc('ecc_frames_total', sonde_type='RS41',
+            result='clean' if _ecc_errors == 0 else ('uncorrectable' if _ecc_errors < 0 else 'corrected'))
+
+    output = decode(frame, ignore_crc, subframe, blocks, lazy, metrics, strict)
+
+    if not strict and _ecc_errors < 0:
+        # The frame may still be usable, as each block has its own CRC.
+        output['errors'].append((ERR_ECC_UNCORRECTABLE, None))
+
+    output['ecc_errors'] = _ecc_errors
+
+    return output
+
+
+def _decode_result(frame, subframe=None, blocks=None, lazy=False, metrics=None):
+    """ Decode a RS41 frame, reporting errors as data. Refer decode(strict=False) """
+
+    if metrics is not None:
+        _start = time.perf_counter()
+
+    if len(frame) < (RS41_FRAME_HEADER_LEN + RS41_ECC_LEN + RS41_FRAME_TYPE_LEN):
+        _error = ERR_FRAME_TOO_SHORT
+    elif frame[:RS41_FRAME_HEADER_LEN] != RS41_FRAME_HEADER:
+        _error = ERR_HEADER_MISMATCH
+    elif frame[RS41_FRAME_TYPE_POS] not in (RS41_FRAME_TYPE_REGULAR, RS41_FRAME_TYPE_EXTENDED):
+        _error = ERR_UNKNOWN_FRAME_TYPE
+    else:
+        _error = None
+
+    if _error is not None:
+        if metrics is not None:
+            metrics.inc('frames_total', sonde_type='RS41', result='invalid')
+        return error_result(_error)
+
+    _block_status = {}
+    output = _decode(frame, False, subframe, blocks, lazy, metrics, _block_status)
+    output['ok'] = True
+    output['errors'] = block_errors(_block_status)
+    output['block_status'] = _block_status
+
+    if metrics is not None:
+        metrics.observe('stage_seconds', time.perf_counter() - _start, sonde_type='RS41', stage='decode')
+        metrics.inc('frames_total', sonde_type='RS41', result=_frame_result(output))
+
+    return output
+
+
+def _decode(frame, ignore_crc=False, subframe=None, blocks=None, lazy=False, metrics=None, block_status=None):
+    """ Decode a RS41 frame. Refer decode(). If block_status is provided, block errors are recorded there rather than logged. """
+
     # Basic length check.
     if len(frame) < (RS41_FRAME_HEADER_LEN + RS41_ECC_LEN + RS41_FRAME_TYPE_LEN):
         raise ValueError(f"Supplied RS41 frame too small.")
@@ -288,7 +632,7 @@ def decode(frame, ignore_crc=False, subframe=None):
     # Now we can start breaking apart the frame.
     output = {"blocks": {}}
 
-    # ECC data is always present. For now we don't make use of this (maybe we should?)
+    # ECC data is always present. Refer decode(ecc=True) to make use of it.
     output["ecc_data"] = frame[RS41_ECC_POS : RS41_ECC_POS + RS41_ECC_LEN]
 
     # Decode the frame type field
@@ -299,188 +643,135 @@ def decode(frame, ignore_crc=False, subframe=None):
     else:
         raise ValueError(f"Unknown Frame Type {hex(frame[RS41_FRAME_TYPE_POS])}")
 
-    # Now we start decoding the different sub-blocks in the frame
-    _idx = RS41_BLOCK_START_POS
+    # Find all the sub-blocks in the frame.
+    if metrics is not None:
+        _stage_start = time.perf_counter()
 
-    while _idx < len(frame):
-        try:
-            _block_type = frame[_idx]
-            _block_len = frame[_idx + 1]
-            _block_data = frame[_idx + 2 : _idx + 2 + _block_len]
-
-            _crc_ok = check_packet_crc(frame[_idx + 2 : _idx + 2 + _block_len + 2])
-
-            if _crc_ok:
-                if _block_type in RS41_BLOCK_DECODERS:
-                    if RS41_BLOCK_DECODERS[_block_type]["expected_len"] == -1:
-                        # Variable Length block!
-                        _block_dict = {'raw': _block_data}
-
-                        if RS41_BLOCK_DECODERS[_block_type]["block_post_process"]:
-                            output["blocks"][
-                                RS41_BLOCK_DECODERS[_block_type]["block_name"]
-                            ] = RS41_BLOCK_DECODERS[_block_type]["block_post_process"](
-                                _block_dict, subframe=subframe
-                            )
-                        else:
-                            # Add the resultant block data to our output dictionary as-is
-                            output["blocks"][
-                                RS41_BLOCK_DECODERS[_block_type]["block_name"]
-                            ] = _block_dict
-
-                    elif _block_len == RS41_BLOCK_DECODERS[_block_type]["expected_len"]:
-                        # Fixed length block.
-
-                        # Decode fields
-                        _block_field_data = struct.unpack(
-                            RS41_BLOCK_DECODERS[_block_type]["struct"], _block_data
-                        )
-                        _block_dict = dict(
-                            zip(
-                                RS41_BLOCK_DECODERS[_block_type]["fields"],
-                                _block_field_data,
-                            )
-                        )
-
-                        # Post-process any individual fields that require it
-                        # These are usually simple unit or type conversions.
-                        for _field in _block_dict:
-                            if (
-                                _field
-                                in RS41_BLOCK_DECODERS[_block_type]["field_decoders"]
-                            ):
-                                _temp = RS41_BLOCK_DECODERS[_block_type][
-                                    "field_decoders"
-                                ][_field](_block_dict[_field])
-
-                                if type(_temp) == dict:
-                                    # If the field processor returned a dictionary, add those keys into our block dict.
-                                    _block_dict.update(_temp)
-                                else:
-                                    # Otherwise, we got a single value.
-                                    _block_dict[_field] = _temp
-
-                        # Apply any further post-processing to the block before storing it into the output dictionary
-                        # This may include converting coordinates to a more user-friendly format, or calculating
-                        # sensor values.
-                        if RS41_BLOCK_DECODERS[_block_type]["block_post_process"]:
-                            output["blocks"][
-                                RS41_BLOCK_DECODERS[_block_type]["block_name"]
-                            ] = RS41_BLOCK_DECODERS[_block_type]["block_post_process"](
-                                _block_dict, subframe=subframe
-                            )
-                        else:
-                            # Add the resultant block data to our output dictionary as-is
-                            output["blocks"][
-                                RS41_BLOCK_DECODERS[_block_type]["block_name"]
-                            ] = _block_dict
-
-                    else:
-                        logging.error(
-                            f"Block Type {hex(_block_type)} has unexpected length {_block_len} (expected {RS41_BLOCK_DECODERS[_block_type]['expected_len']})"
-                        )
-                else:
-                    logging.error(f"Unknown Block Type: {hex(_block_type)}, Length: {_block_len}")
+    _block_index = index_blocks(frame, blocks, metrics, block_status)
 
-            else:
-                logging.error("Block CRC failure")
+    if metrics is not None:
+        metrics.observe('stage_seconds', time.perf_counter() - _stage_start, sonde_type='RS41', stage='index_blocks')
 
-            # Increment our pointer to the start of the next block.
-            _idx += 2 + _block_len + 2
+    if lazy:
+        # Leave decoding of each block until it is accessed.
+        output["blocks"] = RS41LazyBlocks(frame, _block_index, subframe)
 
-        except Exception as e:
-            logging.error(f"Error extracting block. (Index: {_idx}): {str(e)}")
-            break
+    else:
+        if metrics is not None:
+            _stage_start = time.perf_counter()
 
-    # Pull out the commonly required telemetry fields, for use in SondeHub
-    output['common'] = {
-        'type': 'RS41'
-    }
-    if 'Status' in output['blocks']:
-        output['common']['serial']  = output['blocks']['Status']['serial']
-        output['common']['frame']   = output['blocks']['Status']['frame_count']
-        output['common']['batt']   = output['blocks']['Status']['battery']
-
-    if "GPS Fix Information" in output['blocks']:
-        output['common']['datetime'] = output['blocks']["GPS Fix Information"]['timestamp_str']
-
-    if "GPS Position" in output['blocks']:
-        output['common']['sats'] = output['blocks']["GPS Position"]['numSV']
-        output['common']['lat'] = output['blocks']["GPS Position"]['latitude']
-        output['common']['lon'] = output['blocks']["GPS Position"]['longitude']
-        output['common']['alt'] = output['blocks']["GPS Position"]['altitude']
-        output['common']['vel_v'] = output['blocks']["GPS Position"]['ascent_rate']
-        output['common']['vel_h'] = output['blocks']["GPS Position"]['ground_speed']
-        output['common']['heading'] = output['blocks']["GPS Position"]['heading']
+        # Now we start decoding the different sub-blocks in the frame
+        for (_block_name, (_decoder, _start, _len)) in _block_index.items():
+            try:
+                # Decode and post-process the block, and add the resultant block data to our output dictionary.
+                output["blocks"][_block_name] = _decoder.decode(frame[_start : _start + _len], subframe=subframe)
 
-    if subframe:
-        if 'subtype' in subframe.subframe_fields:
-            output['common']['subtype'] = subframe.subframe_fields['subtype']
-        
-        if 'burstkill_timer' in subframe.subframe_fields:
-            output['common']['burst_timer'] = subframe.subframe_fields['burstkill_timer']
+            except Exception as e:
+                if metrics is not None:
+                    metrics.inc('block_decode_errors_total', sonde_type='RS41', block=_block_name)
 
-        if 'tx_frequency' in subframe.subframe_fields:
-            output['common']['tx_frequency'] = subframe.subframe_fields['tx_frequency']/1000.0
+                if block_status is None:
+                    logging.error(f"Error extracting block. (Index: {_start - 2}): {str(e)}")
+                    break
+
+                # Each block has passed its own CRC check, so carry on with the remaining blocks.
+                block_status[_block_name] = ERR_BLOCK_DECODE
+
+        if metrics is not None:
+            metrics.observe('stage_seconds', time.perf_counter() - _stage_start, sonde_type='RS41', stage='decode_blocks')
+
+    # Pull out the commonly required telemetry fields, for use in SondeHub
+    if lazy:
+        output['common'] = RS41LazyCommon(output['blocks'], subframe)
+    else:
+        output['common'] = dict(RS41LazyCommon(output['blocks'], subframe))
 
     return output
 
 
-def descramble(frame):
+def decode_many(frames, ignore_crc=False):
     """
-    De-Scramble a RS41 data frame by bitwise-XORing it with the known XOR scramble mask
+    Decode many RS41 frames at once, into columns of NumPy arrays (one row per frame).
+    Refer sondehubdecoders.RS41.batch.decode_many for details. Requires NumPy.
+
+    Args:
+    frames (list, np.ndarray): List of data frames provided as bytes, or a 2-D uint8 array with one frame per row.
+    ignore_crc (bool): If set, extract blocks even if their CRC check fails.
+
     """
-    # TODO
-    return frame
+    # NumPy is only required for batch decoding, so only import the batch decoder when it is used.
+    from .batch import decode_many as batch_decode_many
 
+    return batch_decode_many(frames, ignore_crc=ignore_crc)
 
-def to_autorx_log(frame):
+
+def peek_serial(frame):
     """
-    Convert a frame dictionary into a line matching the auto_rx log format.
+    Extract just the serial number from a RS41 frame (after de-scrambling), without decoding the rest of the frame.
+    This assumes the Status block is the first block in the frame, as it is on all known RS41 variants.
+
+    Returns the serial number as a string, or None if the Status block could not be found or failed its CRC check.
     """
-    # timestamp,serial,frame,lat,lon,alt,vel_v,vel_h,heading,temp,humidity,pressure,type,freq_mhz,snr,f_error_hz,sats,batt_v,burst_timer,aux_data
-    # 2021-11-12T22:53:38.000Z,S4610487,313,-34.95245,138.52045,10.5,-0.3,0.3,180.9,-273.0,-1.0,-1.0,RS41,401.500,13.5,937,6,2.9,-1,-1
-    _line = ""
 
-    # Timestamp
-    _line += f"{frame['blocks']['GPS Fix Information']['timestamp_str']},"
+    _start = RS41_BLOCK_START_POS
+    _status = RS41_COMPILED_BLOCK_DECODERS[RS41_BLOCK_STATUS]
 
-    # Serial
-    _line += frame['blocks']['Status']['serial'] + ","
+    if len(frame) < _start + 2 + _status.expected_len + 2:
+        return None
 
-    # Frame Number
-    _line += f"{frame['blocks']['Status']['frame_count']},"
+    if (frame[_start] != RS41_BLOCK_STATUS) or (frame[_start+1] != _status.expected_len):
+        return None
 
-    # Latitude
-    _line += f"{frame['blocks']['GPS Position']['latitude']:0.5f},"
+    if not check_span_crcs(frame, [(_start + 2, _status.expected_len)])[0]:
+        return None
 
-    # Longitude
-    _line += f"{frame['blocks']['GPS Position']['longitude']:0.5f},"
+    # Serial number follows the 2-byte frame counter.
+    try:
+        return bytes(frame[_start+4 : _start+12]).decode()
+    except UnicodeDecodeError:
+        return None
 
-    # Altitude
-    _line += f"{frame['blocks']['GPS Position']['altitude']:0.1f},"
 
-    # Ascent Rate
-    _line += f"{frame['blocks']['GPS Position']['ascent_rate']:0.1f},"
+def descramble(frame):
+    """
+    De-Scramble a RS41 data frame by bitwise-XORing it with the known XOR scramble mask.
+    The frame must start at the frame header. As the scrambling is an XOR, this also re-scrambles a de-scrambled frame.
 
-    # Ground Speed
-    _line += f"{frame['blocks']['GPS Position']['ground_speed']:0.1f},"
+    Returns the de-scrambled frame as bytes.
+    """
 
-    # Heading
-    _line += f"{frame['blocks']['GPS Position']['heading']:0.1f},"
+    _len = len(frame)
 
-    # Temp, Humidity, Pressure
-    if 'temperature' in frame['blocks']['Measurements']:
-        _line += f"{frame['blocks']['Measurements']['temperature']:.1f},"
+    if _len <= RS41_FRAME_LEN_EXTENDED:
+        # Use the leading _len bytes of the precomputed mask.
+        _mask = RS41_XOR_MASK_INT >> (8 * (RS41_FRAME_LEN_EXTENDED - _len))
     else:
-        _line += "-273.0,"
-    
-    _line += "humidity,pressure,"
+        _mask = int.from_bytes((RS41_XOR_SCRAMBLE * (_len // len(RS41_XOR_SCRAMBLE) + 1))[:_len], 'big')
+
+    return (int.from_bytes(frame, 'big') ^ _mask).to_bytes(_len, 'big')
+
+
+def descramble_many(frames):
+    """
+    De-Scramble many RS41 frames at once. Refer sondehubdecoders.RS41.batch.descramble_many for details. Requires NumPy.
+
+    Args:
+    frames (list, np.ndarray): List of data frames provided as bytes, or a 2-D uint8 array with one frame per row.
+
+    """
+    from .batch import descramble_many as batch_descramble_many
 
-    # The rest TODO...
+    return batch_descramble_many(frames)
 
 
-    return _line
+def to_autorx_log(frame):
+    """
+    Convert a frame dictionary (or record) into a line matching the auto_rx log format.
+    Refer utils.autorx_log for the column definitions, and for writing whole logs.
+    """
+    # timestamp,serial,frame,lat,lon,alt,vel_v,vel_h,heading,temp,humidity,pressure,type,freq_mhz,snr,f_error_hz,sats,batt_v,burst_timer,aux_data
+    # 2021-11-12T22:53:38.000Z,S4610487,313,-34.95245,138.52045,10.5,-0.3,0.3,180.9,-273.0,-1.0,-1.0,RS41,401.500,13.5,937,6,2.9,-1,-1
+    return format_log_line(frame, 'RS41')
 
 
 
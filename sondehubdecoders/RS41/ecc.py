@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+#
+#   RS41 Reed-Solomon Error Correction
+#
+#   Each RS41 frame carries two interleaved RS(255,231) codewords (GF(2^8) polynomial 0x11D, first
+#   consecutive root alpha^0), which together protect everything from the frame type byte onwards:
+#   - Codeword 1: parity from frame[8:32], message from frame[56], frame[58], frame[60] ...
+#   - Codeword 2: parity from frame[32:56], message from frame[57], frame[59], frame[61] ...
+#   Regular (320 byte) frames use a shortened code, with the remainder of each message taken as zero.
+#   Each codeword can correct up to 12 byte errors.
+#
+#   Refer https://github.com/rs1729/RS/ (rs41mod.c)
+#
+from ..utils.reedsolomon import ReedSolomonCode
+
+# Number of parity bytes per codeword
+RS41_RS_NSYM = 24
+# Maximum number of message bytes per codeword
+RS41_RS_MSG_LEN = 231
+# Position of the parity data (the ECC field of the frame) and the start of the interleaved message data.
+RS41_RS_PARITY_POS = 8
+RS41_RS_MSG_POS = RS41_RS_PARITY_POS + 2 * RS41_RS_NSYM
+# Length of an extended frame, where the full codeword length is used.
+RS41_RS_FRAME_LEN = RS41_RS_MSG_POS + 2 * RS41_RS_MSG_LEN
+
+RS41_RS_CODE = ReedSolomonCode(RS41_RS_NSYM, fcr=0)
+
+
+def rs41_codewords(frame):
+    """ Extract the two (possibly shortened) Reed-Solomon codewords from a RS41 frame, as bytearrays """
+
+    return [
+        bytearray(frame[_parity : _parity + RS41_RS_NSYM]) + bytearray(frame[_msg : RS41_RS_FRAME_LEN : 2])
+        for (_parity, _msg) in (
+            (RS41_RS_PARITY_POS, RS41_RS_MSG_POS),
+            (RS41_RS_PARITY_POS + RS41_RS_NSYM, RS41_RS_MSG_POS + 1),
+        )
+    ]
+
+
+def check_ecc(frame):
+    """
+    Check a RS41 frame (after de-scrambling) against its Reed-Solomon parity data.
+
+    Returns True if no errors were detected, False otherwise (including if the frame is too short to contain any message data).
+    """
+
+    if len(frame) <= RS41_RS_MSG_POS:
+        return False
+
+    # Syndromes can be calculated directly on slices of the frame, without building the codewords.
+    return (
+        RS41_RS_CODE.packed_syndromes(frame[RS41_RS_PARITY_POS : RS41_RS_PARITY_POS + RS41_RS_NSYM] + frame[RS41_RS_MSG_POS : RS41_RS_FRAME_LEN : 2]) == 0
+        and RS41_RS_CODE.packed_syndromes(frame[RS41_RS_PARITY_POS + RS41_RS_NSYM : RS41_RS_MSG_POS] + frame[RS41_RS_MSG_POS + 1 : RS41_RS_FRAME_LEN : 2]) == 0
+    )
+
+
+def correct_frame(frame):
+    """
+    Correct any errors in a RS41 frame (after de-scrambling) using its Reed-Solomon parity data.
+    Frames with no errors are returned as-is, after only a syndrome check.
+
+    Args:
+    frame (bytes): Data frame provided as bytes
+
+    Returns a tuple of (frame, number of bytes corrected). If either codeword could not be corrected, the number
+    of bytes corrected is -1, and only the other codeword (if correctable) is corrected in the returned frame.
+    """
+
+    if len(frame) <= RS41_RS_MSG_POS:
+        return (frame, -1)
+
+    if check_ecc(frame):
+        return (frame, 0)
+
+    _output = bytearray(frame)
+    _corrected = 0
+
+    for (_i, _codeword) in enumerate(rs41_codewords(frame)):
+        _result = RS41_RS_CODE.correct(_codeword)
+
+        if _result < 0:
+            _corrected = -1
+            continue
+
+        if _result > 0:
+            _parity = RS41_RS_PARITY_POS + _i * RS41_RS_NSYM
+            _output[_parity : _parity + RS41_RS_NSYM] = _codeword[:RS41_RS_NSYM]
+            _output[RS41_RS_MSG_POS + _i : RS41_RS_FRAME_LEN : 2] = _codeword[RS41_RS_NSYM:]
+
+        if _corrected >= 0:
+            _corrected += _result
+
+    return (bytes(_output), _corrected)
+
+
+def _codeword_arrays(frames):
+    """ Build 2-D arrays of each of the two codewords, from a list or 2-D array of frames """
+    import numpy as np
+    from .batch import frames_to_array
+
+    (_frames, _lengths) = frames_to_array(frames)
+
+    # Shorter frames have already been zero-padded, as per the shortened code. Make sure there is at least
+    # one byte of message data in each codeword, and clip to the length of an extended frame.
+    if _frames.shape[1] < RS41_RS_MSG_POS + 2:
+        _frames = np.pad(_frames, ((0, 0), (0, RS41_RS_MSG_POS + 2 - _frames.shape[1])))
+    else:
+        _frames = _frames[:, :RS41_RS_FRAME_LEN]
+
+    _codewords = [
+        np.concatenate(
+            (_frames[:, RS41_RS_PARITY_POS + _i * RS41_RS_NSYM : RS41_RS_PARITY_POS + (_i + 1) * RS41_RS_NSYM],
+            _frames[:, RS41_RS_MSG_POS + _i : RS41_RS_FRAME_LEN : 2]),
+            axis=1,
+        )
+        for _i in range(2)
+    ]
+
+    return (_codewords, _lengths)
+
+
+def check_ecc_many(frames):
+    """
+    Check many RS41 frames against their Reed-Solomon parity data at once. Requires NumPy.
+
+    Args:
+    frames (list, np.ndarray): List of data frames provided as bytes, or a 2-D uint8 array with one frame per row.
+
+    Returns a boolean array, True for each frame where no errors were detected.
+    """
+
+    (_codewords, _lengths) = _codeword_arrays(frames)
+
+    return RS41_RS_CODE.check_many(_codewords[0]) & RS41_RS_CODE.check_many(_codewords[1]) & (_lengths > RS41_RS_MSG_POS)
+
+
+def correct_frames(frames):
+    """
+    Correct many RS41 frames using their Reed-Solomon parity data. All frames are checked at once (refer check_ecc_many),
+    and only those with errors are corrected individually. Requires NumPy.
+
+    Args:
+    frames (list): List of data frames provided as bytes.
+
+    Returns a tuple of (list of frames, list of the number of bytes corrected in each frame (-1 if uncorrectable)).
+    """
+
+    _clean = check_ecc_many(frames)
+
+    _output = list(frames)
+    _corrected = [0] * len(_output)
+
+    for _i in (~_clean).nonzero()[0]:
+        (_output[_i], _corrected[_i]) = correct_frame(_output[_i])
+
+    return (_output, _corrected)
+
+
+if __name__ == "__main__":
+    import random
+    from ..utils.benchmark import BENCHMARK_TEMPLATES
+
+    # RS41-SG test frame, from the README
+    _frame = BENCHMARK_TEMPLATES['RS41-SG']
+
+    _random = random.Random(1)
+    _frames = []
+    for _errors in range(0, 26):
+        _corrupted = bytearray(_frame)
+        # Place errors in the message data of the first codeword
+        for _pos in _random.sample(range(RS41_RS_MSG_POS, len(_frame), 2), _errors):
+            _corrupted[_pos] ^= _random.randrange(1, 256)
+        _frames.append(bytes(_corrupted))
+
+    print(f"Test frame valid: {check_ecc(_frame)}")
+    assert(check_ecc(_frame))
+
+    for (_errors, _corrupted) in enumerate(_frames):
+        (_output, _corrected) = correct_frame(_corrupted)
+        print(f"{_errors} errors: corrected {_corrected}, frame restored: {_output == _frame}")
+
+        if _errors <= 12:
+            assert(_corrected == _errors)
+            assert(_output == _frame)
+        else:
+            assert(_corrected == -1)
+
+    # Batch processing should agree with the single-frame functions.
+    (_outputs, _corrected) = correct_frames(_frames)
+    assert(list(check_ecc_many(_frames)) == [check_ecc(_corrupted) for _corrupted in _frames])
+    assert(_corrected == [correct_frame(_corrupted)[1] for _corrupted in _frames])
+    assert(_outputs[:13] == [_frame] * 13)
+
+    print("All tests passed!")
@@ -11,15 +11,17 @@ import logging
 import struct
 from ..utils.checksums import check_packet_crc
 from ..utils.data_types import *
-from ..utils.gnss_helpers import ecef_to_wgs84, ecef_velocity, gps_weeksecondstoutc
+from ..utils.gnss_helpers import ecef_to_wgs84, ecef_velocity, ecef_to_wgs84_velocity_array
+from ..utils.gnss_time import gps_to_utc
 
 
 def rs41_process_gps_position(block, **args):
     """ 
-    Post-Process the GPS Position block from a RS41 Frame
+    Post-Process the GPS Position block from a RS41 Frame.
+    The block dictionary is updated in-place, and returned.
     """
 
-    output = block.copy()
+    output = block
 
     # Convert ECEF coordinates (in cm) to lat/lon/alt
     (lat, lon, alt) = ecef_to_wgs84(
@@ -48,29 +50,54 @@ def rs41_process_gps_position(block, **args):
 
     return output
 
+def rs41_process_gps_position_array(columns):
+    """
+    Post-Process GPS Position data from many RS41 frames at once.
+    Accepts a dictionary of ECEF position/velocity columns (NumPy arrays, as produced by decode_many), and
+    adds latitude, longitude, altitude, ground_speed, ascent_rate, wind_u, wind_v and heading columns.
+    """
+
+    output = columns
+
+    (lat, lon, alt, ground_speed, ascent_rate, wind_u, wind_v, heading) = ecef_to_wgs84_velocity_array(
+        output['ecef_pos_x_cm']/100.0,
+        output['ecef_pos_y_cm']/100.0,
+        output['ecef_pos_z_cm']/100.0,
+        output['ecef_vel_x_cms']/100.0,
+        output['ecef_vel_y_cms']/100.0,
+        output['ecef_vel_z_cms']/100.0
+        )
+
+    # Add to the output dictionary
+    output['latitude'] = lat
+    output['longitude'] = lon
+    output['altitude'] = alt
+    output['ground_speed'] = ground_speed
+    output['ascent_rate'] = ascent_rate
+    output['wind_u'] = wind_u
+    output['wind_v'] = wind_v
+    output['heading'] = heading
+
+    return output
+
 def rs41_process_gps_info(block, **args):
     """ 
-    Post-Process the GPS Information block from a RS41 Frame
+    Post-Process the GPS Information block from a RS41 Frame.
+    The block dictionary is updated in-place, and returned.
     """
 
-    output = block.copy()
+    output = block
 
     # Extract the timestamp information
     # The uBlox chipset on the RS41 provides an 'unwrapped' GPS week number.
-    _timestamp = gps_weeksecondstoutc(output['week'], output['iTOW'])
+    # GPS time is converted to UTC using the leap second table.
+    _timestamp = gps_to_utc(output['week'], output['iTOW'])
 
     output['timestamp_dt'] = _timestamp
     output['timestamp_str'] = _timestamp.isoformat()
 
-    # Extract GPS SV Quality Information
-    _sv_quality = {}
-    for _idx in range(len(output['sv_quality'])//2):
-        _sv = output['sv_quality'][_idx*2]
-        _qual = output['sv_quality'][_idx*2+1]
-
-        _sv_quality[_sv] = _qual
-
-    output['sv_quality'] = _sv_quality
+    # Extract GPS SV Quality Information, which is sent as pairs of (SV number, quality)
+    output['sv_quality'] = dict(zip(output['sv_quality'][0::2], output['sv_quality'][1::2]))
 
     return output
 
@@ -100,9 +127,31 @@ def rs41_temp_calc(rf1, rf2, f, f1, f2, co, calT):
 
     return T
 
+def rs41_temp_calc_many(rf1, rf2, f, f1, f2, co, calT):
+    """
+    Calculate temperatures for many measurements at once, with the same calibration data.
+    f, f1 and f2 are sequences of measurement values.
+
+    Returns a list of temperatures, with None where a temperature could not be calculated.
+    """
+
+    output = []
+    for (_f, _f1, _f2) in zip(f, f1, f2):
+        try:
+            output.append(rs41_temp_calc(rf1, rf2, _f, _f1, _f2, co, calT))
+        except ZeroDivisionError:
+            output.append(None)
+
+    return output
+
+
 def rs41_process_measurements(block, subframe = None):
+    """
+    Post-Process the Measurements block from a RS41 Frame, calculating sensor values if calibration data is available.
+    The block dictionary is updated in-place, and returned.
+    """
 
-    output = block.copy()
+    output = block
 
     # No subframe data available, bomb out now.
     if subframe is None:
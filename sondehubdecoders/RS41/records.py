@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+#
+#   RS41 Decoder Library - Compact Frame and Block Records
+#
+#   Slotted equivalents of the dictionaries produced by decode(), for use when many decoded
+#   frames need to be kept in memory. Use decode_record() to produce these, and to_dict() to
+#   convert them back into the regular dictionary format.
+#
+import logging
+from functools import lru_cache
+from ..utils.records import Record
+from .decoder import (
+    RS41_ECC_POS,
+    RS41_ECC_LEN,
+    RS41_FRAME_TYPE_POS,
+    RS41_FRAME_TYPE_REGULAR,
+    RS41LazyCommon,
+    decode,
+    rs41_subframe_common_fields,
+)
+
+
+class StatusBlock(Record):
+    """ RS41 Status Block """
+    __slots__ = (
+        "frame_count",
+        "serial",
+        "battery",
+        "unknown1",
+        "bitfield1",
+        "unknown2",
+        "ref_area_temp",
+        "bitfield2",
+        "humidity_sensor_heating_pwm",
+        "tx_power",
+        "max_subframe",
+        "subframe_count",
+        "subframe_data",
+    )
+
+
+class MeasurementsBlock(Record):
+    """ RS41 Measurements Block (Regular and RS41-SGM), plus calculated sensor values """
+    __slots__ = (
+        "temp_meas_main",
+        "temp_meas_ref1",
+        "temp_meas_ref2",
+        "humidity_main",
+        "humidity_ref1",
+        "humidity_ref2",
+        "humidity_temp_main",
+        "humidity_temp_ref1",
+        "humidity_temp_ref2",
+        "pressure_main",
+        "pressure_ref1",
+        "pressure_ref2",
+        "unknown",
+        "pressure_temp",
+        "unknown2",
+        "temperature",
+    )
+
+
+class GpsPosition(Record):
+    """ RS41 GPS Position Block, plus calculated position and velocity """
+    __slots__ = (
+        "ecef_pos_x_cm",
+        "ecef_pos_y_cm",
+        "ecef_pos_z_cm",
+        "ecef_vel_x_cms",
+        "ecef_vel_y_cms",
+        "ecef_vel_z_cms",
+        "numSV",
+        "sAcc",
+        "pDOP",
+        "latitude",
+        "longitude",
+        "altitude",
+        "ground_speed",
+        "ascent_rate",
+        "wind_u",
+        "wind_v",
+        "heading",
+    )
+
+
+class PositionDateTime(Record):
+    """ RS41 Position Date and Time Block, plus calculated position and velocity """
+    __slots__ = (
+        "ecef_pos_x_cm",
+        "ecef_pos_y_cm",
+        "ecef_pos_z_cm",
+        "ecef_vel_x_cms",
+        "ecef_vel_y_cms",
+        "ecef_vel_z_cms",
+        "year",
+        "month",
+        "day",
+        "hour",
+        "minute",
+        "second",
+        "therest",
+        "latitude",
+        "longitude",
+        "altitude",
+        "ground_speed",
+        "ascent_rate",
+        "wind_u",
+        "wind_v",
+        "heading",
+    )
+
+
+class GpsInfo(Record):
+    """
+    RS41 GPS Fix Information Block.
+    The SV quality information is stored as raw (SV, quality) byte pairs, and the ISO-8601 timestamp string
+    is generated from the timestamp on request.
+    """
+    __slots__ = (
+        "week",
+        "iTOW",
+        "timestamp_dt",
+        "_sv_quality",
+    )
+    _properties = (
+        "sv_quality",
+        "timestamp_str",
+    )
+
+    @classmethod
+    def from_dict(cls, data):
+        _record = super().from_dict(data)
+        _record._sv_quality = bytes([_val for _pair in data['sv_quality'].items() for _val in _pair])
+        return _record
+
+    @property
+    def sv_quality(self):
+        return dict(zip(self._sv_quality[0::2], self._sv_quality[1::2]))
+
+    @property
+    def timestamp_str(self):
+        return self.timestamp_dt.isoformat()
+
+
+class RawBlock(Record):
+    """
+    A block which is not decoded (e.g. GPS Raw, Empty Block).
+    Rather than copying the block data, a reference to the frame is kept, and the block data sliced out on request.
+    """
+    __slots__ = (
+        "_frame",
+        "_start",
+        "_len",
+    )
+    _properties = (
+        "raw",
+    )
+
+    def __init__(self, frame=None, start=0, length=0):
+        self._frame = frame
+        self._start = start
+        self._len = length
+
+    @property
+    def raw(self):
+        return self._frame[self._start : self._start + self._len]
+
+
+# Record types for each decoded block name. Blocks not listed here are stored as RawBlocks.
+RS41_BLOCK_RECORDS = {
+    "Status": StatusBlock,
+    "Measurements": MeasurementsBlock,
+    "GPS Position": GpsPosition,
+    "GPS Fix Information": GpsInfo,
+    "Position Date and Time": PositionDateTime,
+}
+
+
+@lru_cache(maxsize=256)
+def _shared_common_values(items):
+    """
+    The non-block 'common' fields (sonde type, subtype, burst timer) are the same for long runs of frames,
+    so we share a single (read-only) dictionary between all frames with the same values.
+    """
+    return dict(items)
+
+
+class RS41Frame(Record):
+    """
+    A decoded RS41 frame.
+    A reference to the raw frame is kept, from which the ECC data and any raw blocks are sliced on request.
+    The SondeHub 'common' fields are generated from the blocks on request.
+    """
+    __slots__ = (
+        "raw",
+        "blocks",
+        "subframe",
+        "_common_values",
+    )
+
+    def __init__(self, raw=None, blocks=None, subframe=None):
+        self.raw = raw
+        self.blocks = blocks if blocks is not None else {}
+        self.subframe = subframe
+        self._common_values = _shared_common_values(tuple(rs41_subframe_common_fields(subframe).items()))
+
+    @property
+    def ecc_data(self):
+        return self.raw[RS41_ECC_POS : RS41_ECC_POS + RS41_ECC_LEN]
+
+    @property
+    def frame_type(self):
+        if self.raw[RS41_FRAME_TYPE_POS] == RS41_FRAME_TYPE_REGULAR:
+            return "Regular"
+        else:
+            return "Extended"
+
+    @property
+    def common(self):
+        return RS41LazyCommon(self.blocks, values=self._common_values)
+
+    def to_dict(self):
+        """
+        Convert into the same dictionary format as produced by decode(), or by RS41.add_frame if a subframe object is attached.
+        """
+        output = {
+            "blocks": {_name: _block.to_dict() for (_name, _block) in self.blocks.items()},
+            "ecc_data": self.ecc_data,
+            "frame_type": self.frame_type,
+            "common": dict(self.common),
+        }
+
+        if self.subframe is not None:
+            output["subframe"] = self.subframe.subframe_fields
+
+        return output
+
+
+def decode_record(frame, subframe=None, blocks=None, metrics=None):
+    """
+    Decode a RS41 frame, provided as bytes, into a RS41Frame record.
+
+    Args:
+    frame (bytes): Data frame provided as bytes
+    subframe (RS41Subframe): Optional subframe Object, for use in processing measurement data.
+    blocks (list): Optional list of block names to decode (e.g. ['Status', 'GPS Position']). Other blocks are skipped.
+    metrics (DecoderMetrics): Optional metrics object. Refer decode()
+    """
+    # Use the lazy decoder for the frame-level checks, and to decode each block.
+    _frame = decode(frame, subframe=subframe, blocks=blocks, lazy=True, metrics=metrics)
+    _blocks = {}
+
+    for (_block_name, (_decoder, _start, _len)) in _frame['blocks'].block_index.items():
+        try:
+            if _block_name in RS41_BLOCK_RECORDS:
+                _blocks[_block_name] = RS41_BLOCK_RECORDS[_block_name].from_dict(_frame['blocks'][_block_name])
+            else:
+                _blocks[_block_name] = RawBlock(frame, _start, _len)
+
+        except Exception as e:
+            # As per decode(), keep the blocks decoded so far.
+            if metrics is not None:
+                metrics.inc('block_decode_errors_total', sonde_type='RS41', block=_block_name)
+
+            logging.error(f"Error extracting block. (Index: {_start - 2}): {str(e)}")
+            break
+
+    return RS41Frame(frame, _blocks, subframe)
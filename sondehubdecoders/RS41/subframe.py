@@ -2,9 +2,42 @@
 #
 #   RS41 Decoder Library - RS41 SubFrame Data Handling
 #
+#   The RS41 sends its calibration/configuration data ('subframe') in 16-byte segments, one per frame.
+#   Segments are stored into a single bytearray as they arrive, with a bitmap of which segments have
+#   been received. Each field only depends on one or two segments, so when a segment arrives (or changes)
+#   only the fields that overlap it are re-extracted.
+#
 import logging
 import struct
 
+
+# Subframe segment length, in bytes.
+RS41_SUBFRAME_SEGMENT_LEN = 16
+
+# Fields which are collated into a list once all of their components are available.
+RS41_SUBFRAME_COLLATED_FIELDS = {
+    'tempmeas_co1': ['tempmeas_co1_0', 'tempmeas_co1_1', 'tempmeas_co1_2'],
+    'tempmeas_calT1': ['tempmeas_calT1_0', 'tempmeas_calT1_1', 'tempmeas_calT1_2'],
+    'humimeas_co2': ['humimeas_co2_0', 'humimeas_co2_1', 'humimeas_co2_2'],
+    'humimeas_calT1': ['humimeas_calT1_0', 'humimeas_calT1_1', 'humimeas_calT1_2'],
+}
+
+
+def build_segment_index(field_table):
+    """
+    Build an index of segment number -> list of field names which (at least partially) lie within that segment,
+    from a table of field name -> [index into subframe, data length, data type]
+    """
+
+    _index = {}
+
+    for (_field_name, (_start, _length, _type)) in field_table.items():
+        for _segment in range(_start//RS41_SUBFRAME_SEGMENT_LEN, (_start + _length - 1)//RS41_SUBFRAME_SEGMENT_LEN + 1):
+            _index.setdefault(_segment, []).append(_field_name)
+
+    return {_segment: tuple(_fields) for (_segment, _fields) in _index.items()}
+
+
 class RS41Subframe(object):
 
     SUBFRAME_IDXS = {
@@ -35,26 +68,57 @@ class RS41Subframe(object):
         'burstkill_timer':  [0x316, 2, 'H']
     }
 
-    def __init__(self, max_subframe=50):
+    # Segment number -> fields which depend on that segment.
+    SEGMENT_FIELDS = build_segment_index(SUBFRAME_IDXS)
+
+    # Pre-built structs for the multi-byte field types.
+    FIELD_STRUCTS = {
+        'H': struct.Struct('<H'),
+        'f': struct.Struct('<f'),
+    }
+
+    def __init__(self, max_subframe=50, on_fields_changed=None):
         """
         RS41 Subframe Storage and data extraction
+
+        Args:
+        max_subframe (int): Highest subframe segment number, as reported in the Status block.
+        on_fields_changed (function): Optional callback, called with the set of field names which changed
+            whenever a new segment updates one or more fields.
         """
 
-        self.subframe_raw_dict = {}
         self.subframe_length = max_subframe+1
-        self.subframe_list = [0]*(self.subframe_length*16)
+        self.subframe_data = bytearray(self.subframe_length*RS41_SUBFRAME_SEGMENT_LEN)
+        # Bitmap of received segments (bit N set = segment N received)
+        self.segments_received = 0
         self.subframe_fields = {}
+        self.on_fields_changed = on_fields_changed
+
+
+    @property
+    def subframe_raw_dict(self):
+        """ Received segments, as a dictionary of segment number -> segment data """
+        return {
+            _segment: bytes(self.subframe_data[_segment*RS41_SUBFRAME_SEGMENT_LEN : (_segment+1)*RS41_SUBFRAME_SEGMENT_LEN])
+            for _segment in range(self.subframe_length) if (self.segments_received >> _segment) & 1
+        }
+
+
+    @property
+    def subframe_list(self):
+        """ Subframe data as a list of ints (unreceived segments are zero) """
+        return list(self.subframe_data)
+
+
+    def segment_count(self):
+        """ Number of segments received so far """
+        return bin(self.segments_received).count('1')
 
 
     def index_available(self, index):
         """ Determine if a given index is available in the current set of subframe data """
 
-        _block = index//16
-
-        if _block in self.subframe_raw_dict:
-            return True
-        else:
-            return False
+        return bool((self.segments_received >> (index//RS41_SUBFRAME_SEGMENT_LEN)) & 1)
 
 
     def extract_single_field(self, index, length, field_type):
@@ -62,92 +126,93 @@ class RS41Subframe(object):
         if self.index_available(index) and self.index_available(index+length-1):
             if field_type == 'B':
                 # Don't use struct, just extract individual int.
-                return self.subframe_list[index]
-            elif field_type == 'H':
-                #logging.debug(f"{index}: {str(bytes( self.subframe_list[index:index+2] ))}")
-                _data = struct.unpack('<H', bytes( self.subframe_list[index:index+2] ) )[0]
-                return _data
-            elif field_type == 'f':
-                _data = struct.unpack('<f', bytes( self.subframe_list[index:index+4] ) )[0]
-                return _data
+                return self.subframe_data[index]
             elif field_type == 's':
-                _str = struct.unpack(f'<{length}s', bytes(self.subframe_list[index:index+length]))[0]
-                #logging.debug(f'Str: {str(_str)}')
-                return _str.decode('ascii').rstrip('\x00')
+                return bytes(self.subframe_data[index:index+length]).decode('ascii').rstrip('\x00')
+            else:
+                return self.FIELD_STRUCTS[field_type].unpack_from(self.subframe_data, index)[0]
         else:
             return None
 
 
+    def _extract_fields(self, field_names):
+        """ Extract a set of fields from the available data, returning the set of fields which changed """
 
-    def update_fields(self):
-        """ Work through all the known subframe fields and try and extract them from the available data """
-        for _field_name in self.SUBFRAME_IDXS:
+        _changed = set()
+
+        for _field_name in field_names:
             _field_params = self.SUBFRAME_IDXS[_field_name]
             _field_data = self.extract_single_field(_field_params[0], _field_params[1], _field_params[2])
 
-            if _field_data:
+            if _field_data and (self.subframe_fields.get(_field_name) != _field_data):
                 self.subframe_fields[_field_name] = _field_data
+                _changed.add(_field_name)
+
+        if not _changed:
+            return _changed
 
-        # Post-Process a few fields.
-        if ('freq_lower' in self.subframe_fields) and ('freq_upper' in self.subframe_fields):
+        # Post-Process a few fields, if any of their inputs changed.
+        if (('freq_lower' in _changed) or ('freq_upper' in _changed)) and \
+            ('freq_lower' in self.subframe_fields) and ('freq_upper' in self.subframe_fields):
             # from rs41mod.c
             _f0 = ( (self.subframe_fields['freq_lower'] & 0xC0)*10) / 64
             _f1 = 40*self.subframe_fields['freq_upper']
             _freq = int(400000 + _f1+_f0)
             self.subframe_fields['tx_frequency_khz'] = _freq
+            _changed.add('tx_frequency_khz')
+
+        # Collate calibration coefficients, if all components are available.
+        for (_collated_name, _components) in RS41_SUBFRAME_COLLATED_FIELDS.items():
+            if _changed.isdisjoint(_components):
+                continue
+
+            if all(_component in self.subframe_fields for _component in _components):
+                self.subframe_fields[_collated_name] = [self.subframe_fields[_component] for _component in _components]
+                _changed.add(_collated_name)
+
+        return _changed
 
-        # Collate tempmeas_co1 if available
-        if ('tempmeas_co1_0' in self.subframe_fields) and ('tempmeas_co1_1' in self.subframe_fields) and ('tempmeas_co1_2' in self.subframe_fields):
-            self.subframe_fields['tempmeas_co1'] = [
-                self.subframe_fields['tempmeas_co1_0'],
-                self.subframe_fields['tempmeas_co1_1'],
-                self.subframe_fields['tempmeas_co1_2'],
-                ]
-        # Collate tempmeas_calT1 if available
-        if ('tempmeas_calT1_0' in self.subframe_fields) and ('tempmeas_calT1_1' in self.subframe_fields) and ('tempmeas_calT1_2' in self.subframe_fields):
-            self.subframe_fields['tempmeas_calT1'] = [
-                self.subframe_fields['tempmeas_calT1_0'],
-                self.subframe_fields['tempmeas_calT1_1'],
-                self.subframe_fields['tempmeas_calT1_2'],
-                ]
-
-        # Collate humimeas_co2 if available
-        if ('humimeas_co2_0' in self.subframe_fields) and ('humimeas_co2_1' in self.subframe_fields) and ('humimeas_co2_2' in self.subframe_fields):
-            self.subframe_fields['humimeas_co2'] = [
-                self.subframe_fields['humimeas_co2_0'],
-                self.subframe_fields['humimeas_co2_1'],
-                self.subframe_fields['humimeas_co2_2'],
-                ]
-        # Collate tempmeas_calT1 if available
-        if ('humimeas_calT1_0' in self.subframe_fields) and ('humimeas_calT1_1' in self.subframe_fields) and ('humimeas_calT1_2' in self.subframe_fields):
-            self.subframe_fields['humimeas_calT1'] = [
-                self.subframe_fields['humimeas_calT1_0'],
-                self.subframe_fields['humimeas_calT1_1'],
-                self.subframe_fields['humimeas_calT1_2'],
-                ]
+
+    def update_fields(self):
+        """ Work through all the known subframe fields and try and extract them from the available data """
+
+        self._extract_fields(self.SUBFRAME_IDXS)
 
         return self.subframe_fields
 
     
     def add_segment(self, segment_num, segment_data):
-        """ Add/update a subframe segment. """
+        """
+        Add/update a subframe segment.
 
-        if (segment_num < self.subframe_length) and len(segment_data) == 16:
-            # Add/update the raw dictionary
-            self.subframe_raw_dict[segment_num] = segment_data
-            logging.debug(f"Received subframe segment {segment_num}, ({len(list(self.subframe_raw_dict.keys()))}/{self.subframe_length})")
+        Returns the set of field names which were changed by this segment (empty if none).
+        """
+
+        if (segment_num < self.subframe_length) and len(segment_data) == RS41_SUBFRAME_SEGMENT_LEN:
+            _start = segment_num*RS41_SUBFRAME_SEGMENT_LEN
+            _end = _start + RS41_SUBFRAME_SEGMENT_LEN
+            _segment_bit = 1 << segment_num
+
+            if (self.segments_received & _segment_bit) and (self.subframe_data[_start:_end] == segment_data):
+                # We already have this segment, nothing to do.
+                return set()
 
-            # Update the bytes (actually a list of ints)
-            self.subframe_list[16*segment_num : 16*(segment_num+1)] = list(segment_data)
+            self.subframe_data[_start:_end] = segment_data
+            self.segments_received |= _segment_bit
+            logging.debug(f"Received subframe segment {segment_num}, ({self.segment_count()}/{self.subframe_length})")
 
-            #logging.debug(str(bytes(self.subframe_list)))
+            # Re-extract only the fields that depend on this segment.
+            _changed = self._extract_fields(self.SEGMENT_FIELDS.get(segment_num, ()))
 
-            # Re-parse the subframe for available fields.
-            self.update_fields()
+            if _changed:
+                logging.debug(f"Subframe Fields Changed: {sorted(_changed)}")
 
+                if self.on_fields_changed:
+                    self.on_fields_changed(_changed)
 
+            return _changed
 
-            logging.debug(f"Subframe Fields: {str(self.subframe_fields)}")
+        return set()
 
 
 
@@ -168,7 +233,4 @@ class RS41Subframe(object):
         Indicate whether we have a complete set of subframe data.
         This is used to trigger re-processing of old telemetry data.
         """
-        if len(list(self.subframe_raw_dict.keys())) == self.subframe_length:
-            return True
-        else:
-            return False
\ No newline at end of file
+        return self.segments_received == (1 << self.subframe_length) - 1
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+#
+#   SondeHub Radiosonde Telemetry Decoders
+#
+#   The names below are imported from their modules on first use, so importing the package (or one of the
+#   per-type decoders, e.g. sondehubdecoders.LMS6_403.decoder) does not load every decoder and its dependencies.
+#   This keeps startup quick for short-lived processes, such as the command line tools and decoder workers.
+#
+
+# Lazily imported names, as name -> module (relative to this package)
+LAZY_ATTRIBUTES = {
+    'SONDE_TYPES': '.sonde_types',
+    'detect_type': '.sonde_types',
+    'decode_any': '.sonde_types',
+    'new_decoder': '.sonde_types',
+    'SondeRegistry': '.registry',
+    'FrameSynchroniser': '.framer',
+    'iter_frames': '.framer',
+    'DecoderMetrics': '.utils.metrics',
+}
+
+__all__ = list(LAZY_ATTRIBUTES.keys())
+
+
+def __getattr__(name):
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import import_module
+
+    _value = getattr(import_module(LAZY_ATTRIBUTES[name], __name__), name)
+
+    # Cache the value, so this is only called once per name.
+    globals()[name] = _value
+    return _value
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(__all__))
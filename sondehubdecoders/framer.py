@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+#
+#   Streaming Frame Synchroniser
+#
+#   Extracts aligned frames from a raw byte stream (e.g. the output of a demodulator, read from a socket
+#   or file in arbitrary chunks), ready to be passed to the decode() functions.
+#
+#   Frame headers are found using bytes.find, rather than by scanning the stream in Python. To tolerate
+#   up to k bit errors in a header, the header is split into k+1 parts - any header with at most k bit
+#   errors must contain at least one of these parts unchanged (the pigeonhole principle). Each occurrence
+#   of a part gives a candidate header position, which is accepted if the whole header is within k bits.
+#
+#   Only the unprocessed tail of the stream (at most one frame) is carried over between chunks.
+#
+import logging
+from .RS41.decoder import (
+    descramble as rs41_descramble,
+    RS41_FRAME_HEADER,
+    RS41_FRAME_HEADER_SCRAMBLED,
+    RS41_FRAME_LEN_EXTENDED,
+    RS41_FRAME_TYPE_POS,
+    RS41_FRAME_TYPE_REGULAR,
+    RS41_XOR_MASK,
+)
+from .LMS6_403.decoder import LMS6_403_FRAME_HEADER, LMS6_403_FRAME_LEN
+
+
+# Length of a regular (non-extended) RS41 frame
+RS41_FRAME_LEN_REGULAR = 320
+
+
+def rs41_frame_len(frame_type):
+    """
+    Get the length of a RS41 frame from its frame type byte (after de-scrambling).
+    The two frame types differ in every bit, so the closest one is used, which tolerates bit errors.
+    """
+
+    if bin(frame_type ^ RS41_FRAME_TYPE_REGULAR).count('1') <= 4:
+        return RS41_FRAME_LEN_REGULAR
+    else:
+        return RS41_FRAME_LEN_EXTENDED
+
+
+# Frame formats for each sonde type:
+# - header: Frame header (after de-scrambling), which is written over the header of each output frame.
+# - header_scrambled: Frame header as transmitted, if the frames are scrambled, otherwise None.
+# - descramble: Function to de-scramble a frame.
+# - frame_len: Fixed frame length, or None if the length is determined from a byte of the frame.
+# - length_pos, length_func: Position of the byte which determines the frame length, and a function to convert it to a length.
+# - max_bit_errors: Default number of bit errors to tolerate in the header.
+FRAMER_TYPES = {
+    'RS41': {
+        'header': RS41_FRAME_HEADER,
+        'header_scrambled': RS41_FRAME_HEADER_SCRAMBLED,
+        'descramble': rs41_descramble,
+        'frame_len': None,
+        'length_pos': RS41_FRAME_TYPE_POS,
+        'length_func': rs41_frame_len,
+        'max_bit_errors': 3,
+    },
+    'LMS6_403': {
+        'header': LMS6_403_FRAME_HEADER,
+        'header_scrambled': None,
+        'descramble': None,
+        'frame_len': LMS6_403_FRAME_LEN,
+        'length_pos': None,
+        'length_func': None,
+        'max_bit_errors': 0,
+    },
+}
+
+# Default read size when reading from a file or socket.
+FRAMER_CHUNK_SIZE = 65536
+
+
+def header_parts(header, max_bit_errors):
+    """
+    Split a header into max_bit_errors + 1 (nearly) equal parts, returned as a list of (part, offset within the header).
+    """
+
+    _num_parts = max_bit_errors + 1
+
+    if _num_parts > len(header):
+        raise ValueError(f"Can not tolerate {max_bit_errors} bit errors in a {len(header)} byte header.")
+
+    output = []
+    _offset = 0
+    for _i in range(_num_parts):
+        _len = (len(header) - _offset) // (_num_parts - _i)
+        output.append((bytes(header[_offset : _offset + _len]), _offset))
+        _offset += _len
+
+    return output
+
+
+class FrameSynchroniser(object):
+    """
+    Streaming frame synchroniser, which accepts chunks of a raw byte stream, and returns complete, aligned frames.
+    """
+
+    def __init__(self, sonde_type='RS41', max_bit_errors=None, scrambled=False):
+        """
+        Args:
+        sonde_type (str): Radiosonde type (RS41, LMS6_403)
+        max_bit_errors (int): Number of bit errors to tolerate in each frame header. Defaults to the value in FRAMER_TYPES.
+        scrambled (bool): If set, the stream contains scrambled frames (as transmitted), which are de-scrambled
+            before being returned.
+        """
+
+        if sonde_type not in FRAMER_TYPES:
+            raise ValueError(f"Unsupported sonde type: {sonde_type}")
+
+        self.sonde_type = sonde_type
+        self.format = FRAMER_TYPES[sonde_type]
+        self.max_bit_errors = self.format['max_bit_errors'] if max_bit_errors is None else max_bit_errors
+        self.scrambled = scrambled
+
+        if scrambled and self.format['header_scrambled'] is None:
+            raise ValueError(f"{sonde_type} frames are not scrambled.")
+
+        self.header = self.format['header']
+        # The header we search the stream for.
+        self.sync_header = self.format['header_scrambled'] if scrambled else self.header
+        self.sync_header_int = int.from_bytes(self.sync_header, 'big')
+        self.parts = header_parts(self.sync_header, self.max_bit_errors)
+
+        # Unprocessed data carried over from previous chunks.
+        self.buffer = bytearray()
+
+        # Running statistics
+        self.stats = {
+            'bytes': 0,
+            'frames': 0,
+            'header_bit_errors': 0,
+            'bytes_skipped': 0,
+        }
+
+
+    def find_header(self, start=0):
+        """
+        Find the next frame header in the buffer, at or after start.
+
+        Returns a tuple of (header position, number of bit errors), or (-1, None) if no header was found.
+        """
+
+        _buffer = self.buffer
+        _header_len = len(self.sync_header)
+        # Last possible header position
+        _last = len(_buffer) - _header_len
+
+        _pos = start
+        while _pos <= _last:
+            # Find the earliest candidate header position from any of the header parts.
+            _candidate = -1
+            for (_part, _offset) in self.parts:
+                _found = _buffer.find(_part, _pos + _offset, _last + _offset + len(_part))
+                if _found >= 0 and (_candidate < 0 or _found - _offset < _candidate):
+                    _candidate = _found - _offset
+
+            if _candidate < 0:
+                break
+
+            _errors = bin(int.from_bytes(_buffer[_candidate : _candidate + _header_len], 'big') ^ self.sync_header_int).count('1')
+
+            if _errors <= self.max_bit_errors:
+                return (_candidate, _errors)
+
+            _pos = _candidate + 1
+
+        return (-1, None)
+
+
+    def frame_length(self, start):
+        """ Determine the length of the frame at start, or return None if not enough of it has been received """
+
+        if self.format['frame_len'] is not None:
+            return self.format['frame_len']
+
+        _length_pos = start + self.format['length_pos']
+        if _length_pos >= len(self.buffer):
+            return None
+
+        _byte = self.buffer[_length_pos]
+        if self.scrambled:
+            _byte ^= RS41_XOR_MASK[self.format['length_pos']]
+
+        return self.format['length_func'](_byte)
+
+
+    def feed(self, data):
+        """
+        Add a chunk of the byte stream, and return a list of any frames (as bytes) completed by it.
+        """
+
+        self.stats['bytes'] += len(data)
+        self.buffer += data
+
+        output = []
+        _pos = 0
+        _header_len = len(self.sync_header)
+
+        while True:
+            (_start, _errors) = self.find_header(_pos)
+
+            if _start < 0:
+                # Keep enough data to find a header which is split across chunks.
+                _pos = max(_pos, len(self.buffer) - _header_len + 1)
+                break
+
+            self.stats['bytes_skipped'] += _start - _pos
+            _pos = _start
+
+            _len = self.frame_length(_start)
+            if (_len is None) or (_start + _len > len(self.buffer)):
+                # Wait for the rest of the frame.
+                break
+
+            # The header is only used for synchronisation, so replace it, in case it contained bit errors.
+            _frame = self.sync_header + bytes(self.buffer[_start + _header_len : _start + _len])
+            if self.scrambled:
+                _frame = self.format['descramble'](_frame)
+
+            output.append(_frame)
+            self.stats['frames'] += 1
+            self.stats['header_bit_errors'] += _errors
+            _pos = _start + _len
+
+        # Drop the processed data.
+        del self.buffer[:_pos]
+
+        return output
+
+
+    def reset(self):
+        """ Discard any buffered data (e.g. after a break in the stream) """
+        self.buffer = bytearray()
+
+
+def iter_frames(stream, sonde_type='RS41', chunk_size=FRAMER_CHUNK_SIZE, **kwargs):
+    """
+    Read a raw byte stream from a binary file object (or anything with a read() method, such as socket.makefile('rb')),
+    yielding aligned frames. Additional keyword arguments are passed to FrameSynchroniser.
+    """
+
+    _framer = FrameSynchroniser(sonde_type, **kwargs)
+
+    while True:
+        _data = stream.read(chunk_size)
+        if not _data:
+            break
+
+        for _frame in _framer.feed(_data):
+            yield _frame
+
+    if _framer.buffer:
+        logging.debug(f"Framer - Discarded {len(_framer.buffer)} bytes at the end of the stream.")
+
+
+if __name__ == "__main__":
+    import random
+    from .utils.benchmark import BENCHMARK_TEMPLATES
+
+    # RS41-SG test frame, from the README
+    _frame = BENCHMARK_TEMPLATES['RS41-SG']
+
+    _random = random.Random(1)
+
+    for _scrambled in [False, True]:
+        # Build a stream of frames, separated by random junk, with random bit errors in the headers.
+        _stream = bytearray()
+        _num_frames = 50
+        for _i in range(_num_frames):
+            _stream += bytes(_random.randrange(256) for _j in range(_random.randrange(0, 100)))
+            _raw = bytearray(rs41_descramble(_frame) if _scrambled else _frame)
+            for _bit in _random.sample(range(64), _i % 4):
+                _raw[_bit // 8] ^= 1 << (_bit % 8)
+            _stream += _raw
+
+        _framer = FrameSynchroniser('RS41', scrambled=_scrambled)
+        _frames = []
+        _idx = 0
+        # Feed the stream in random sized chunks.
+        while _idx < len(_stream):
+            _len = _random.randrange(1, 1000)
+            _frames += _framer.feed(_stream[_idx : _idx + _len])
+            _idx += _len
+
+        print(f"Scrambled: {_scrambled}, Frames: {len(_frames)}, Stats: {_framer.stats}")
+        assert(_frames == [_frame] * _num_frames)
+        assert(_framer.stats['header_bit_errors'] == sum(_i % 4 for _i in range(_num_frames)))
+
+    print("All tests passed!")
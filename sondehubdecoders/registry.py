@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+#
+#   Radiosonde Session Registry
+#
+#   Routes incoming frames from many radiosondes to a stateful decoder object (e.g. RS41) per
+#   radiosonde, keyed by sonde type and serial number. Sessions are closed out (evicted) once they
+#   have not been heard from for a timeout period (TTL), or when the number of sessions exceeds a
+#   limit (least recently heard sessions first), with an optional callback to allow any final
+#   processing of the session data.
+#
+import logging
+import time
+from collections import OrderedDict
+from .RS41 import RS41
+from .RS41.decoder import peek_serial as rs41_peek_serial
+from .RS41.ecc import correct_frame as rs41_correct_frame
+from .LMS6_403 import LMS6_403
+from .LMS6_403.decoder import peek_serial as lms6_403_peek_serial
+from .snapshot import snapshot_sessions, restore_sessions
+from .sonde_types import detect_type, sonde_type_args
+from .utils.errors import error_result, ERR_NO_SERIAL, ERR_UNKNOWN_SONDE_TYPE
+
+
+# Supported sonde types, with the stateful decoder class, a function to extract the serial number
+# from a frame without fully decoding it, and a function to apply error correction to a frame (if supported).
+SONDE_REGISTRY_TYPES = {
+    'RS41': {
+        'decoder': RS41,
+        'peek_serial': rs41_peek_serial,
+        'correct_frame': rs41_correct_frame,
+    },
+    'LMS6_403': {
+        'decoder': LMS6_403,
+        'peek_serial': lms6_403_peek_serial,
+        'correct_frame': None,
+    },
+}
+
+# Eviction reasons, as passed to the on_evict callback.
+EVICT_TTL = 'ttl'
+EVICT_LRU = 'lru'
+EVICT_CLOSE = 'close'
+
+
+class SondeRegistry(object):
+    """
+    Registry of stateful decoder sessions, one per radiosonde.
+    """
+
+    def __init__(
+        self,
+        ttl = 3600,
+        max_sessions = 10000,
+        on_evict = None,
+        archive_postprocess_callback = None,
+        expire_interval = 10,
+        snapshot_store = None,
+        snapshot_interval = 60,
+        metrics = None):
+        """
+        Args:
+        ttl (float): Close out sessions which have not received a frame within this many seconds.
+        max_sessions (int): Maximum number of sessions to hold (at least 1). If exceeded, the least recently heard session is
+            closed out. This bounds the memory used by the registry during busy periods.
+        on_evict (function): Optional callback, called as on_evict(sonde_type, serial, session, reason) when a session is
+            closed out, where reason is one of 'ttl', 'lru' or 'close'.
+        archive_postprocess_callback (function): Passed through to each new stateful decoder object.
+        expire_interval (float): Minimum time between checks for expired sessions, in seconds.
+        snapshot_store (FileSnapshotStore, SQLiteSnapshotStore): Optional store for session snapshots (refer snapshot.py).
+            If provided, sessions are restored from the store on startup, and snapshotted every snapshot_interval seconds.
+        snapshot_interval (float): Time between session snapshots, in seconds.
+        metrics (DecoderMetrics): Optional metrics object (refer utils.metrics), passed through to each stateful decoder object.
+        """
+
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be at least 1.")
+
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self.archive_postprocess_callback = archive_postprocess_callback
+        self.expire_interval = expire_interval
+        self.snapshot_store = snapshot_store
+        self.snapshot_interval = snapshot_interval
+        self.metrics = metrics
+
+        # (sonde type, serial) -> stateful decoder object, in order of the last frame received (oldest first).
+        self.sessions = OrderedDict()
+
+        # Live session count per sonde type.
+        self.type_counts = {_sonde_type: 0 for _sonde_type in SONDE_REGISTRY_TYPES}
+
+        self.last_expire_time = 0
+
+        # Running statistics
+        self.stats = {
+            'frames': 0,
+            'frames_rejected': 0,
+            'sessions_created': 0,
+            'sessions_evicted_ttl': 0,
+            'sessions_evicted_lru': 0,
+            'sessions_closed': 0,
+            'sessions_restored': 0,
+        }
+
+        self.last_snapshot_time = time.time()
+
+        if self.snapshot_store is not None:
+            self.restore()
+
+
+    def peek_serial(self, sonde_type, frame):
+        """ Extract the serial number from a frame, returning None if it could not be extracted """
+
+        if sonde_type not in SONDE_REGISTRY_TYPES:
+            raise ValueError(f"Unsupported sonde type: {sonde_type}")
+
+        return SONDE_REGISTRY_TYPES[sonde_type]['peek_serial'](frame)
+
+
+    def get_session(self, sonde_type, serial, create=False):
+        """ Get the session for a sonde, optionally creating it if it does not exist """
+
+        _key = (sonde_type, serial)
+
+        if _key in self.sessions:
+            return self.sessions[_key]
+
+        if not create:
+            return None
+
+        _session = SONDE_REGISTRY_TYPES[sonde_type]['decoder'](
+            archive_postprocess_callback=self.archive_postprocess_callback,
+            metrics=self.metrics
+        )
+        self.sessions[_key] = _session
+        self.type_counts[sonde_type] += 1
+        self.stats['sessions_created'] += 1
+        logging.debug(f"Registry - New session for {sonde_type} {serial} ({len(self.sessions)} sessions)")
+
+        self._enforce_session_limit()
+
+        return _session
+
+
+    def _enforce_session_limit(self):
+        """ Close out the least recently heard sessions, until there are no more than max_sessions """
+
+        while len(self.sessions) > self.max_sessions:
+            self.evict(*next(iter(self.sessions)), reason=EVICT_LRU)
+
+
+    def add_frame(self, sonde_type, frame, now=None, **kwargs):
+        """
+        Route a frame to the session for its radiosonde (creating it if required), and process it.
+        Any additional keyword arguments are passed on to the session's add_frame method, if it accepts them (refer
+        sonde_types.sonde_type_args). If ecc is set (and supported by the sonde type), frames where the serial number
+        could not be extracted are corrected before trying again.
+
+        Returns the decoded frame, or None if the serial number could not be extracted, or decoding failed.
+        If strict=False is passed, a dictionary is always returned (refer utils.errors), with a 'no_serial' error
+        if the serial number could not be extracted.
+        """
+
+        if now is None:
+            now = time.time()
+
+        self.stats['frames'] += 1
+
+        if now - self.last_expire_time >= self.expire_interval:
+            self.expire(now=now)
+
+        if (self.snapshot_store is not None) and (now - self.last_snapshot_time >= self.snapshot_interval):
+            self.snapshot(now=now)
+
+        _serial = self.peek_serial(sonde_type, frame)
+
+        if (_serial is None) and kwargs.get('ecc') and SONDE_REGISTRY_TYPES[sonde_type]['correct_frame']:
+            # The serial number may be recoverable using the frame's error correction data.
+            (frame, _) = SONDE_REGISTRY_TYPES[sonde_type]['correct_frame'](frame)
+            _serial = self.peek_serial(sonde_type, frame)
+
+        if _serial is None:
+            self.stats['frames_rejected'] += 1
+
+            if not kwargs.get('strict', True):
+                return error_result(ERR_NO_SERIAL)
+
+            logging.debug(f"Registry - Could not extract serial from {sonde_type} frame.")
+            return None
+
+        _session = self.get_session(sonde_type, _serial, create=True)
+
+        # Mark this session as the most recently heard.
+        self.sessions.move_to_end((sonde_type, _serial))
+
+        _frame = _session.add_frame(frame, **sonde_type_args(sonde_type, kwargs, 'add_frame_args'))
+        _session.last_frame_time = now
+
+        return _frame
+
+
+    def add_any_frame(self, frame, now=None, **kwargs):
+        """
+        Route a frame of any supported radiosonde type, identifying the sonde type from the frame (refer sonde_types.detect_type).
+
+        Returns the decoded frame, or None if the sonde type or serial number could not be identified, or decoding failed.
+        If strict=False is passed, a dictionary is always returned, as per add_frame.
+        """
+
+        _sonde_type = detect_type(frame)
+
+        if _sonde_type is None:
+            self.stats['frames'] += 1
+            self.stats['frames_rejected'] += 1
+
+            if not kwargs.get('strict', True):
+                return error_result(ERR_UNKNOWN_SONDE_TYPE)
+
+            return None
+
+        return self.add_frame(_sonde_type, frame, now=now, **kwargs)
+
+
+    def evict(self, sonde_type, serial, reason=EVICT_CLOSE):
+        """ Close out a session, calling the on_evict callback. Returns the session object, or None if it did not exist. """
+
+        _session = self.sessions.pop((sonde_type, serial), None)
+
+        if _session is None:
+            return None
+
+        self.type_counts[sonde_type] -= 1
+
+        if reason == EVICT_TTL:
+            self.stats['sessions_evicted_ttl'] += 1
+        elif reason == EVICT_LRU:
+            self.stats['sessions_evicted_lru'] += 1
+        else:
+            self.stats['sessions_closed'] += 1
+
+        logging.debug(f"Registry - Closed session for {sonde_type} {serial} ({reason})")
+
+        if self.on_evict:
+            try:
+                self.on_evict(sonde_type, serial, _session, reason)
+            except Exception as e:
+                logging.exception(f"Error in session eviction callback", exc_info=e)
+
+        return _session
+
+
+    def expire(self, now=None):
+        """
+        Close out any sessions which have not received a frame within the TTL.
+        Returns a list of (sonde type, serial) of the closed sessions.
+        """
+
+        if now is None:
+            now = time.time()
+
+        self.last_expire_time = now
+        _expired = []
+
+        # Sessions are held in order of last frame received, so we only need to check
+        # the oldest sessions, and can stop at the first one that has not expired.
+        while self.sessions:
+            _key = next(iter(self.sessions))
+
+            if now - self.sessions[_key].last_frame_time < self.ttl:
+                break
+
+            self.evict(*_key, reason=EVICT_TTL)
+            _expired.append(_key)
+
+        return _expired
+
+
+    def snapshot(self, now=None):
+        """ Save a snapshot of all sessions to the snapshot store """
+
+        self.last_snapshot_time = now if now is not None else time.time()
+
+        try:
+            self.snapshot_store.save(snapshot_sessions(self.sessions))
+        except Exception as e:
+            logging.exception("Registry - Error saving session snapshot", exc_info=e)
+
+
+    def restore(self):
+        """ Restore sessions from the snapshot store. Returns the number of sessions restored. """
+
+        try:
+            _sessions = restore_sessions(self.snapshot_store.load())
+        except Exception as e:
+            logging.exception("Registry - Error loading session snapshot", exc_info=e)
+            return 0
+
+        self.add_sessions(_sessions)
+        logging.info(f"Registry - Restored {len(_sessions)} sessions from snapshot.")
+
+        return len(_sessions)
+
+
+    def add_sessions(self, sessions):
+        """
+        Add restored sessions to the registry, replacing any existing sessions for the same radiosondes.
+        This allows sessions to be restored from a snapshot shared by several registries (e.g. in the ingestion server).
+
+        Args:
+        sessions (list): List of (sonde type, serial, session), as produced by snapshot.restore_sessions.
+        """
+
+        # Add the sessions oldest first, to preserve the last-heard ordering.
+        for (_sonde_type, _serial, _session) in sorted(sessions, key=lambda _s: _s[2].last_frame_time):
+            _session.archive_postprocess_callback = self.archive_postprocess_callback
+            _session.metrics = self.metrics
+
+            if (_sonde_type, _serial) not in self.sessions:
+                self.type_counts[_sonde_type] += 1
+
+            self.sessions[(_sonde_type, _serial)] = _session
+            self.sessions.move_to_end((_sonde_type, _serial))
+
+        self.stats['sessions_restored'] += len(sessions)
+
+        # The snapshot may have been taken with a higher session limit.
+        self._enforce_session_limit()
+
+
+    def close(self):
+        """ Close out all sessions (e.g. on shutdown), saving a final snapshot if a snapshot store is in use """
+
+        if self.snapshot_store is not None:
+            self.snapshot()
+
+        for _key in list(self.sessions.keys()):
+            self.evict(*_key, reason=EVICT_CLOSE)
+
+
+    def counts(self):
+        """ Report the number of live sessions (in total, and per sonde type), and running statistics """
+
+        output = {'sessions': len(self.sessions)}
+        output.update(self.type_counts)
+        output.update(self.stats)
+
+        return output
+
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+    def __contains__(self, key):
+        return key in self.sessions
@@ -0,0 +1,727 @@
+#!/usr/bin/env python
+#
+#   Radiosonde Frame Ingestion Server
+#
+#   An asyncio-based service which accepts raw radiosonde frames over UDP, TCP and HTTP POST,
+#   and decodes them using the stateful decoders (via a SondeRegistry) or the plain decode() functions.
+#
+#   Submissions are JSON objects:
+#   {
+#       "type": "RS41",                 # Radiosonde type. If omitted, this is detected from the frame.
+#       "frame": "8635f440...",         # Frame data, as hex (default), or base64 if "encoding" is "base64"
+#       "encoding": "hex",              # Optional - hex or base64
+#       "scrambled": false,             # Optional - set if the frame has not been de-scrambled (RS41 only)
+#       "receiver": {...}               # Optional - receiver metadata, passed through to the output.
+#   }
+#   - UDP: One submission per datagram.
+#   - TCP: One submission per line.
+#   - HTTP: POST a submission (or a list of submissions) as JSON, or POST the binary frame with
+#     Content-Type: application/octet-stream, and the sonde type (optional) in the query string (e.g. /?type=RS41, or /?type=RS41&scrambled=1).
+#     The decoded SondeHub fields are returned in the response. If metrics are enabled, they are available from GET /metrics.
+#
+#   Decoding is spread across a number of workers, each with its own bounded queue and a dedicated thread,
+#   with frames sharded by serial number so each radiosonde's stateful decoder lives in one worker.
+#   Frames where the serial number can only be recovered using error correction are corrected by whichever worker
+#   is next in turn (keeping the slow correction off the event loop), then passed on to the worker for their serial number.
+#   When a worker's queue is full, TCP and HTTP clients are made to wait (or are rejected, for HTTP), and
+#   UDP submissions are dropped.
+#
+#   If a snapshot store is provided, the sessions of all workers are saved to it periodically (and on shutdown) as a
+#   single snapshot, and restored into the worker which handles each radiosonde on startup (refer snapshot.py).
+#
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from .registry import SondeRegistry, SONDE_REGISTRY_TYPES
+from .snapshot import snapshot_sessions, restore_sessions
+from .sonde_types import detect_type
+from .RS41.decoder import decode as rs41_decode
+from .RS41.decoder import descramble as rs41_descramble
+from .LMS6_403.decoder import decode as lms6_403_decode
+from .utils.metrics import DecoderMetrics, METRIC_PREFIX
+from .utils.parallel import frame_to_json
+
+
+# Stateless decode functions for each sonde type.
+SERVER_DECODE_FUNCTIONS = {
+    'RS41': rs41_decode,
+    'LMS6_403': lms6_403_decode,
+}
+
+# De-scrambling functions, for sonde types which accept scrambled frames.
+SERVER_DESCRAMBLE_FUNCTIONS = {
+    'RS41': rs41_descramble,
+}
+
+# Additional arguments passed to the decoder (or stateful decoder's add_frame) for each sonde type.
+# RS41 frames are corrected using their Reed-Solomon parity data, to recover frames from marginal receivers.
+SERVER_DECODE_ARGS = {
+    'RS41': {'ecc': True},
+    'LMS6_403': {},
+}
+
+# Returned by a worker's decode when a submission should be passed on to another worker.
+SERVER_FORWARD = object()
+
+# Maximum size of a TCP line or HTTP request body.
+SERVER_MAX_MESSAGE_LEN = 64*1024
+
+# HTTP status lines used by the HTTP handler.
+HTTP_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+def parse_submission(submission):
+    """
+    Parse a submission (as a dictionary, or JSON bytes/string) into a dictionary with
+    'type', 'frame' (bytes) and 'receiver' entries. Raises ValueError if the submission is invalid.
+    """
+
+    if isinstance(submission, (bytes, str)):
+        try:
+            submission = json.loads(submission)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValueError("Submission is not valid JSON.")
+
+    if not isinstance(submission, dict):
+        raise ValueError("Submission must be a JSON object.")
+
+    _type = submission.get('type')
+    if (_type is not None) and (_type not in SERVER_DECODE_FUNCTIONS):
+        raise ValueError(f"Unsupported sonde type: {_type}")
+
+    _frame = submission.get('frame')
+    if isinstance(_frame, str):
+        try:
+            if submission.get('encoding', 'hex') == 'base64':
+                _frame = base64.b64decode(_frame, validate=True)
+            else:
+                _frame = bytes.fromhex(_frame)
+        except (ValueError, binascii.Error):
+            raise ValueError("Could not decode frame data.")
+
+    if not isinstance(_frame, (bytes, bytearray)) or len(_frame) == 0:
+        raise ValueError("Submission does not contain frame data.")
+
+    if submission.get('scrambled'):
+        if _type is None:
+            # Try each de-scrambling function, until one gives a frame of the same sonde type.
+            for (_descramble_type, _descramble) in SERVER_DESCRAMBLE_FUNCTIONS.items():
+                if detect_type(_descramble(_frame)) == _descramble_type:
+                    _type = _descramble_type
+                    break
+            else:
+                raise ValueError("Could not identify the sonde type of the frame.")
+
+        elif _type not in SERVER_DESCRAMBLE_FUNCTIONS:
+            raise ValueError(f"Scrambled frames are not supported for {_type}.")
+
+        _frame = SERVER_DESCRAMBLE_FUNCTIONS[_type](_frame)
+
+    if _type is None:
+        _type = detect_type(_frame)
+
+        if _type not in SERVER_DECODE_FUNCTIONS:
+            raise ValueError("Could not identify the sonde type of the frame.")
+
+    return {
+        'type': _type,
+        'frame': bytes(_frame),
+        'receiver': submission.get('receiver'),
+    }
+
+
+def parse_http_head(head):
+    """
+    Parse the request line and headers of a HTTP request, provided as bytes.
+
+    Returns a tuple of (method, target, headers), with the header names in lower case.
+    Raises ValueError if the request is malformed.
+    """
+
+    _lines = head.decode('latin-1').split("\r\n")
+
+    _request = _lines[0].split(" ")
+    if (len(_request) < 2) or (not _request[0]) or (not _request[1]):
+        raise ValueError("Malformed request line.")
+
+    _headers = {}
+    for _line in _lines[1:]:
+        if ':' in _line:
+            (_name, _value) = _line.split(':', 1)
+            _headers[_name.strip().lower()] = _value.strip()
+
+    _length = _headers.get('content-length', '0')
+    if not (_length.isascii() and _length.isdigit()):
+        raise ValueError("Invalid Content-Length.")
+
+    return (_request[0], _request[1], _headers)
+
+
+class FrameIngestServer(object):
+    """
+    asyncio Frame Ingestion Server
+    """
+
+    def __init__(
+        self,
+        workers = 4,
+        queue_size = 1000,
+        stateful = True,
+        on_decoded = None,
+        registry_args = None,
+        metrics = None,
+        snapshot_store = None,
+        snapshot_interval = 60):
+        """
+        Args:
+        workers (int): Number of decoder workers.
+        queue_size (int): Maximum number of submissions queued for each worker.
+        stateful (bool): If set, decode frames using a stateful decoder per radiosonde (refer SondeRegistry).
+            Otherwise each frame is decoded independently using the decode() functions.
+        on_decoded (function): Optional callback, called (from a worker thread) as on_decoded(submission, decoded_frame)
+            for each successfully decoded frame.
+        registry_args (dict): Optional keyword arguments passed to each worker's SondeRegistry (e.g. ttl, max_sessions).
+        metrics (DecoderMetrics): Optional metrics object (refer utils.metrics), shared by all the decoder workers.
+            If provided, the metrics (and the server statistics) are available in Prometheus text format from HTTP GET /metrics.
+        snapshot_store (FileSnapshotStore, SQLiteSnapshotStore): Optional store for session snapshots (refer snapshot.py), used
+            if stateful. This is shared by all the workers, so should not be passed to the registries through registry_args.
+        snapshot_interval (float): Time between session snapshots, in seconds.
+        """
+
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stateful = stateful
+        self.on_decoded = on_decoded
+        self.registry_args = dict(registry_args) if registry_args else {}
+        self.metrics = metrics
+        self.snapshot_store = snapshot_store
+        self.snapshot_interval = snapshot_interval
+
+        if metrics is not None:
+            self.registry_args.setdefault('metrics', metrics)
+
+        if 'snapshot_store' in self.registry_args:
+            raise ValueError("snapshot_store must be passed to the server, rather than to each registry.")
+
+        self.queues = []
+        self.executors = []
+        self.registries = []
+        self.tasks = []
+        self.servers = []
+        self.transports = []
+        self.udp_tasks = set()
+        self._next_worker = 0
+
+        self.stats = {
+            'received': 0,
+            'invalid': 0,
+            'dropped': 0,
+            'decoded': 0,
+            'failed': 0,
+        }
+
+
+    def _start_workers(self):
+        """ Create the worker queues, threads and tasks """
+
+        for _i in range(self.workers):
+            _queue = asyncio.Queue(maxsize=self.queue_size)
+            self.queues.append(_queue)
+            self.executors.append(ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"decoder{_i}"))
+            self.registries.append(SondeRegistry(**self.registry_args) if self.stateful else None)
+            self.tasks.append(asyncio.create_task(self._worker(_i)))
+
+        if self.stateful and (self.snapshot_store is not None):
+            self.restore()
+            self.tasks.append(asyncio.create_task(self._snapshot_task()))
+
+
+    def _serial_worker(self, sonde_type, serial):
+        """ Select the worker which holds the session for a radiosonde """
+
+        return zlib.crc32(f"{sonde_type}{serial}".encode()) % self.workers
+
+
+    def restore(self):
+        """
+        Restore sessions from the snapshot store, into the registry of the worker which handles each radiosonde.
+        This is called before the listeners are started, so blocks while the snapshot is loaded.
+        """
+
+        try:
+            _sessions = restore_sessions(self.snapshot_store.load())
+        except Exception as e:
+            logging.exception("Server - Error loading session snapshot", exc_info=e)
+            return
+
+        _shards = [[] for _i in range(self.workers)]
+        for _session in _sessions:
+            _shards[self._serial_worker(_session[0], _session[1])].append(_session)
+
+        for (_registry, _shard) in zip(self.registries, _shards):
+            _registry.add_sessions(_shard)
+
+        logging.info(f"Server - Restored {len(_sessions)} sessions from snapshot.")
+
+
+    async def snapshot(self):
+        """ Save a snapshot of the sessions of all workers to the snapshot store """
+
+        _loop = asyncio.get_running_loop()
+
+        try:
+            # Each registry is only accessed from its worker's thread.
+            _shards = await asyncio.gather(*[
+                _loop.run_in_executor(_executor, snapshot_sessions, _registry.sessions)
+                for (_executor, _registry) in zip(self.executors, self.registries)
+            ])
+            await _loop.run_in_executor(None, self.snapshot_store.save, [_session for _shard in _shards for _session in _shard])
+        except Exception as e:
+            logging.exception("Server - Error saving session snapshot", exc_info=e)
+
+
+    async def _snapshot_task(self):
+        """ Task which snapshots the sessions every snapshot_interval seconds """
+
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+
+    def _select_worker(self, submission):
+        """
+        Select a worker for a submission, based on its serial number (if stateful). Returns None if the frame has no valid serial.
+        If the serial number may be recoverable using the frame's error correction data, the next worker in turn is selected,
+        and the submission is marked for correction (refer _correct).
+        """
+
+        if not self.stateful:
+            self._next_worker = (self._next_worker + 1) % self.workers
+            return self._next_worker
+
+        _type = SONDE_REGISTRY_TYPES[submission['type']]
+        _serial = _type['peek_serial'](submission['frame'])
+
+        if _serial is not None:
+            return self._serial_worker(submission['type'], _serial)
+
+        if SERVER_DECODE_ARGS[submission['type']].get('ecc') and _type['correct_frame']:
+            submission['correct'] = True
+            self._next_worker = (self._next_worker + 1) % self.workers
+            return self._next_worker
+
+        return None
+
+
+    def _correct(self, submission):
+        """
+        Correct a submission marked by _select_worker, and find the worker for its serial number. This runs in the worker's thread.
+        Returns the worker, or None if the serial number could not be recovered.
+        """
+
+        _type = SONDE_REGISTRY_TYPES[submission['type']]
+
+        (submission['frame'], _) = _type['correct_frame'](submission['frame'])
+        submission['correct'] = False
+
+        _serial = _type['peek_serial'](submission['frame'])
+        if _serial is None:
+            return None
+
+        return self._serial_worker(submission['type'], _serial)
+
+
+    def _decode(self, worker, submission):
+        """
+        Decode a submission. This runs in the worker's thread.
+        Returns SERVER_FORWARD if the submission should be passed on to another worker (refer submission['worker']).
+        """
+
+        if submission.get('correct'):
+            submission['worker'] = self._correct(submission)
+
+            if submission['worker'] is None:
+                return None
+            elif submission['worker'] != worker:
+                return SERVER_FORWARD
+
+        # Decode with strict=False, so bad frames are reported as data rather than logged.
+        if self.stateful:
+            _frame = self.registries[worker].add_frame(
+                submission['type'], submission['frame'], strict=False, **SERVER_DECODE_ARGS[submission['type']]
+            )
+        else:
+            _frame = SERVER_DECODE_FUNCTIONS[submission['type']](
+                submission['frame'], metrics=self.metrics, strict=False, **SERVER_DECODE_ARGS[submission['type']]
+            )
+
+        if (_frame is not None) and not _frame['ok']:
+            _frame = None
+
+        if (_frame is not None) and self.on_decoded:
+            try:
+                self.on_decoded(submission, _frame)
+            except Exception as e:
+                logging.exception("Error in on_decoded callback", exc_info=e)
+
+        return _frame
+
+
+    async def _worker(self, worker):
+        """ Worker task, which pulls submissions from its queue, and decodes them in its thread """
+
+        _loop = asyncio.get_running_loop()
+        _queue = self.queues[worker]
+
+        while True:
+            (_submission, _future) = await _queue.get()
+
+            try:
+                _frame = await _loop.run_in_executor(self.executors[worker], self._decode, worker, _submission)
+
+                if _frame is SERVER_FORWARD:
+                    try:
+                        self.queues[_submission['worker']].put_nowait((_submission, _future))
+                    except asyncio.QueueFull:
+                        self.stats['dropped'] += 1
+                        if _future is not None and not _future.done():
+                            _future.set_result(None)
+                    continue
+
+                self.stats['decoded' if _frame is not None else 'failed'] += 1
+                if _future is not None and not _future.done():
+                    _future.set_result(_frame)
+            except Exception as e:
+                logging.exception("Error in decoder worker", exc_info=e)
+                if _future is not None and not _future.done():
+                    _future.set_result(None)
+            finally:
+                _queue.task_done()
+
+
+    async def submit(self, submission, wait=True, result=False):
+        """
+        Submit a frame for decoding.
+
+        Args:
+        submission (dict, bytes, str): Submission, either as a dictionary or as JSON. Refer parse_submission.
+        wait (bool): If the worker's queue is full, wait for space. Otherwise raise asyncio.QueueFull.
+        result (bool): If set, wait for the frame to be decoded, and return the decoded frame (or None if decoding failed).
+
+        Raises ValueError if the submission is invalid.
+        """
+
+        self.stats['received'] += 1
+
+        try:
+            _submission = parse_submission(submission)
+            _worker = self._select_worker(_submission)
+
+            if _worker is None:
+                raise ValueError("Could not extract serial number from frame.")
+
+        except ValueError:
+            self.stats['invalid'] += 1
+            raise
+
+        _future = asyncio.get_running_loop().create_future() if result else None
+
+        if wait:
+            await self.queues[_worker].put((_submission, _future))
+        else:
+            try:
+                self.queues[_worker].put_nowait((_submission, _future))
+            except asyncio.QueueFull:
+                self.stats['dropped'] += 1
+                raise
+
+        if _future is not None:
+            return await _future
+
+        return None
+
+
+    def response_for(self, submission, frame):
+        """ Produce a JSON-serializable response for a decoded frame """
+
+        if frame is None:
+            return {'ok': False, 'error': 'Could not decode frame.'}
+
+        return {'ok': True, 'telemetry': frame_to_json(frame), 'receiver': submission.get('receiver') if isinstance(submission, dict) else None}
+
+
+    #
+    #   UDP
+    #
+    class _UDPProtocol(asyncio.DatagramProtocol):
+        def __init__(self, server):
+            self.server = server
+
+        def datagram_received(self, data, addr):
+            # Hold a reference to the task until it is done, so it is not garbage collected.
+            _task = asyncio.ensure_future(self.server._handle_udp(data, addr))
+            self.server.udp_tasks.add(_task)
+            _task.add_done_callback(self.server.udp_tasks.discard)
+
+
+    async def _handle_udp(self, data, addr):
+        try:
+            await self.submit(data, wait=False)
+        except (ValueError, asyncio.QueueFull) as e:
+            logging.debug(f"UDP - Rejected submission from {addr}: {str(e)}")
+
+
+    #
+    #   TCP
+    #
+    async def _handle_tcp(self, reader, writer):
+        _peer = writer.get_extra_info('peername')
+
+        try:
+            while True:
+                try:
+                    _line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    logging.debug(f"TCP - Line too long from {_peer}, closing connection.")
+                    break
+
+                if not _line:
+                    break
+
+                if not _line.strip():
+                    continue
+
+                try:
+                    # Waiting for queue space here stops us reading from the socket, pushing back on the client.
+                    await self.submit(_line, wait=True)
+                except ValueError as e:
+                    logging.debug(f"TCP - Rejected submission from {_peer}: {str(e)}")
+
+        except ConnectionError:
+            pass
+
+        finally:
+            writer.close()
+
+
+    #
+    #   HTTP
+    #
+    def metrics_text(self):
+        """ Export the decoder metrics and server statistics in Prometheus text format """
+
+        _lines = [
+            f"# HELP {METRIC_PREFIX}server_submissions_total Submissions received by the ingestion server, by result",
+            f"# TYPE {METRIC_PREFIX}server_submissions_total counter",
+        ]
+        for (_result, _count) in self.stats.items():
+            _lines.append(f'{METRIC_PREFIX}server_submissions_total{{result="{_result}"}} {_count}')
+
+        _lines.append(f"# HELP {METRIC_PREFIX}server_queue_length Submissions waiting to be decoded, by worker")
+        _lines.append(f"# TYPE {METRIC_PREFIX}server_queue_length gauge")
+        for (_i, _queue) in enumerate(self.queues):
+            _lines.append(f'{METRIC_PREFIX}server_queue_length{{worker="{_i}"}} {_queue.qsize()}')
+
+        return self.metrics.to_prometheus() + "\n".join(_lines) + "\n"
+
+
+    async def _http_respond(self, writer, status, body, content_type='application/json'):
+        _body = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(_body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + _body
+        )
+        await writer.drain()
+
+
+    async def _handle_http(self, reader, writer):
+        try:
+            try:
+                _head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+
+            try:
+                (_method, _target, _headers) = parse_http_head(_head)
+            except ValueError as e:
+                await self._http_respond(writer, 400, {'ok': False, 'error': str(e)})
+                return
+
+            if (_method == 'GET') and (urlsplit(_target).path == '/metrics') and (self.metrics is not None):
+                await self._http_respond(writer, 200, self.metrics_text(), content_type='text/plain; version=0.0.4')
+                return
+
+            if _method != 'POST':
+                await self._http_respond(writer, 405, {'ok': False, 'error': 'Only POST is supported.'})
+                return
+
+            _length = int(_headers.get('content-length', 0))
+            if _length > SERVER_MAX_MESSAGE_LEN:
+                await self._http_respond(writer, 413, {'ok': False, 'error': 'Request too large.'})
+                return
+
+            _body = await reader.readexactly(_length)
+
+            if _headers.get('content-type', '').startswith('application/octet-stream'):
+                # Binary frame, with the sonde type (and optionally receiver) in the query string.
+                _query = parse_qs(urlsplit(_target).query)
+                _submissions = [{
+                    'type': _query.get('type', [None])[0],
+                    'frame': _body,
+                    'receiver': _query.get('receiver', [None])[0],
+                    'scrambled': _query.get('scrambled', ['0'])[0] not in ('', '0', 'false'),
+                }]
+                _single = True
+            else:
+                try:
+                    _submissions = json.loads(_body)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    await self._http_respond(writer, 400, {'ok': False, 'error': 'Request body is not valid JSON.'})
+                    return
+
+                _single = not isinstance(_submissions, list)
+                if _single:
+                    _submissions = [_submissions]
+
+            _responses = []
+            for _submission in _submissions:
+                try:
+                    _frame = await self.submit(_submission, wait=False, result=True)
+                    _responses.append(self.response_for(_submission, _frame))
+                except ValueError as e:
+                    _responses.append({'ok': False, 'error': str(e)})
+                except asyncio.QueueFull:
+                    await self._http_respond(writer, 503, {'ok': False, 'error': 'Server busy, try again later.'})
+                    return
+
+            await self._http_respond(writer, 200, _responses[0] if _single else _responses)
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        except Exception as e:
+            logging.exception("HTTP - Error handling request", exc_info=e)
+
+        finally:
+            writer.close()
+
+
+    async def start(self, host='0.0.0.0', udp_port=None, tcp_port=None, http_port=None):
+        """ Start the decoder workers, and any listeners for which a port is provided """
+
+        self._start_workers()
+        _loop = asyncio.get_running_loop()
+
+        if udp_port is not None:
+            (_transport, _protocol) = await _loop.create_datagram_endpoint(
+                lambda: self._UDPProtocol(self), local_addr=(host, udp_port)
+            )
+            self.transports.append(_transport)
+            logging.info(f"Listening for UDP submissions on {host}:{udp_port}")
+
+        if tcp_port is not None:
+            self.servers.append(await asyncio.start_server(self._handle_tcp, host, tcp_port, limit=SERVER_MAX_MESSAGE_LEN))
+            logging.info(f"Listening for TCP submissions on {host}:{tcp_port}")
+
+        if http_port is not None:
+            self.servers.append(await asyncio.start_server(self._handle_http, host, http_port, limit=SERVER_MAX_MESSAGE_LEN))
+            logging.info(f"Listening for HTTP submissions on {host}:{http_port}")
+
+
+    async def stop(self):
+        """ Stop the listeners, finish decoding any queued submissions, and close out all sessions """
+
+        for _transport in self.transports:
+            _transport.close()
+
+        for _server in self.servers:
+            _server.close()
+            await _server.wait_closed()
+
+        await asyncio.gather(*self.udp_tasks, return_exceptions=True)
+
+        # Join each queue twice, as submissions which needed correction may have been passed on to an earlier worker.
+        for _queue in self.queues + self.queues:
+            await _queue.join()
+
+        for _task in self.tasks:
+            _task.cancel()
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        if self.stateful and (self.snapshot_store is not None):
+            await self.snapshot()
+
+        for _executor in self.executors:
+            _executor.shutdown()
+
+        for _registry in self.registries:
+            if _registry is not None:
+                _registry.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from .snapshot import FileSnapshotStore
+
+    # Command line arguments.
+    parser = argparse.ArgumentParser(description="Radiosonde frame ingestion server.")
+    parser.add_argument("--host", help="Address to listen on.", default="0.0.0.0")
+    parser.add_argument("--udp", help="UDP port to listen on.", type=int, default=None)
+    parser.add_argument("--tcp", help="TCP port to listen on.", type=int, default=None)
+    parser.add_argument("--http", help="HTTP port to listen on.", type=int, default=None)
+    parser.add_argument("-w", "--workers", help="Number of decoder workers.", type=int, default=4)
+    parser.add_argument("--stateless", help="Decode each frame independently.", action="store_true")
+    parser.add_argument("--print", help="Print decoded telemetry as JSON.", action="store_true")
+    parser.add_argument("--metrics", help="Collect decoder metrics, available from HTTP GET /metrics.", action="store_true")
+    parser.add_argument("--snapshot", help="Save session snapshots to this file, and restore them on startup.", default=None)
+    parser.add_argument("--snapshot-interval", help="Time between session snapshots, in seconds.", type=float, default=60)
+    parser.add_argument("-v", "--verbose", help="Enable debug output.", action="store_true")
+    args = parser.parse_args()
+
+    if args.verbose:
+        _log_level = logging.DEBUG
+    else:
+        _log_level = logging.INFO
+
+    # Setup Logging
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s: %(message)s", level=_log_level
+    )
+
+    def print_decoded(submission, frame):
+        print(json.dumps(frame_to_json(frame)), flush=True)
+
+    async def main():
+        _server = FrameIngestServer(
+            workers=args.workers,
+            stateful=not args.stateless,
+            on_decoded=print_decoded if args.print else None,
+            metrics=DecoderMetrics() if args.metrics else None,
+            snapshot_store=FileSnapshotStore(args.snapshot) if args.snapshot else None,
+            snapshot_interval=args.snapshot_interval,
+        )
+        await _server.start(host=args.host, udp_port=args.udp, tcp_port=args.tcp, http_port=args.http)
+
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await _server.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
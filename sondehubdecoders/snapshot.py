@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+#
+#   Decoder Session Snapshots
+#
+#   Compact, versioned serialisation of stateful decoder session state (RS41 subframe data,
+#   LMS6_403 calibration values), so that a restarted ingest node can carry on decoding in-flight
+#   radiosondes without waiting for a full set of calibration data to be re-sent.
+#
+#   Sessions are serialised using struct (no pickle), as:
+#   - Session header: format version (B), sonde type code (B), last frame time (d), serial length (B), serial (utf-8)
+#   - RS41: max subframe number (B), received segment bitmap (ceil(segments/8) bytes, little-endian), subframe data
+#   - LMS6_403: calibration value present bitmap (<I), calibration values (28 x <H, 0 where not present)
+#
+#   Snapshots can be stored in a single file (FileSnapshotStore), or a SQLite database (SQLiteSnapshotStore).
+#
+import logging
+import os
+import struct
+from .RS41 import RS41
+from .RS41.subframe import RS41Subframe, RS41_SUBFRAME_SEGMENT_LEN
+from .LMS6_403 import LMS6_403
+
+
+# Session format version. Increment if the format of any session type changes.
+SNAPSHOT_VERSION = 1
+
+# Sonde type codes, as used in the session header.
+SNAPSHOT_SONDE_TYPES = {
+    'RS41': 1,
+    'LMS6_403': 2,
+}
+
+SNAPSHOT_SESSION_HEADER = struct.Struct("<BBdB")
+SNAPSHOT_RS41_HEADER = struct.Struct("<B")
+SNAPSHOT_LMS6_403_CAL = struct.Struct(f"<I{LMS6_403.LMS6_403_TOTAL_CAL}H")
+
+# File snapshot header: magic, version, number of sessions. Each session follows as a <I length, then the session data.
+SNAPSHOT_FILE_MAGIC = b"SHDS"
+SNAPSHOT_FILE_HEADER = struct.Struct("<4sBI")
+SNAPSHOT_FILE_SESSION_LEN = struct.Struct("<I")
+
+
+def _serialize_rs41(session):
+    """ Serialise the RS41 subframe data. Sessions with no subframe data are stored with no segments """
+
+    if session.subframe is None:
+        return SNAPSHOT_RS41_HEADER.pack(0) + b"\x00"
+
+    _subframe = session.subframe
+    _bitmap_len = (_subframe.subframe_length + 7)//8
+
+    return SNAPSHOT_RS41_HEADER.pack(_subframe.subframe_length - 1) \
+        + _subframe.segments_received.to_bytes(_bitmap_len, 'little') \
+        + bytes(_subframe.subframe_data)
+
+
+def _restore_rs41(serial, data):
+    _session = RS41()
+    _session.serial = serial
+
+    (_max_subframe,) = SNAPSHOT_RS41_HEADER.unpack_from(data, 0)
+    _subframe_length = _max_subframe + 1
+    _bitmap_len = (_subframe_length + 7)//8
+    _bitmap = int.from_bytes(data[1:1+_bitmap_len], 'little')
+
+    if _bitmap:
+        _subframe_data = data[1+_bitmap_len:]
+
+        if len(_subframe_data) != _subframe_length*RS41_SUBFRAME_SEGMENT_LEN:
+            raise ValueError("RS41 snapshot subframe data length mismatch.")
+
+        _session.subframe = RS41Subframe(max_subframe=_max_subframe)
+        _session.subframe.subframe_data[:] = _subframe_data
+        _session.subframe.segments_received = _bitmap
+        _session.subframe.update_fields()
+
+    return _session
+
+
+def _serialize_lms6_403(session):
+    _present = 0
+    _values = []
+
+    for (_i, _value) in enumerate(session.cal_data if session.cal_data is not None else [None]*LMS6_403.LMS6_403_TOTAL_CAL):
+        if _value is None:
+            _values.append(0)
+        else:
+            _present |= (1 << _i)
+            _values.append(_value)
+
+    return SNAPSHOT_LMS6_403_CAL.pack(_present, *_values)
+
+
+def _restore_lms6_403(serial, data):
+    _session = LMS6_403()
+    _session.serial = int(serial)
+
+    (_present, *_values) = SNAPSHOT_LMS6_403_CAL.unpack(data)
+
+    if _present:
+        _session.cal_data = [_value if (_present >> _i) & 1 else None for (_i, _value) in enumerate(_values)]
+
+    return _session
+
+
+# Serialisation functions for each sonde type.
+SNAPSHOT_SERIALIZERS = {
+    'RS41': (_serialize_rs41, _restore_rs41),
+    'LMS6_403': (_serialize_lms6_403, _restore_lms6_403),
+}
+
+
+def serialize_session(sonde_type, serial, session):
+    """ Serialise the state of a stateful decoder object into bytes """
+
+    if sonde_type not in SNAPSHOT_SERIALIZERS:
+        raise ValueError(f"Unsupported sonde type: {sonde_type}")
+
+    _serial = str(serial).encode('utf-8')
+
+    return SNAPSHOT_SESSION_HEADER.pack(SNAPSHOT_VERSION, SNAPSHOT_SONDE_TYPES[sonde_type], session.last_frame_time, len(_serial)) \
+        + _serial \
+        + SNAPSHOT_SERIALIZERS[sonde_type][0](session)
+
+
+def restore_session(data):
+    """
+    Restore a stateful decoder object from bytes produced by serialize_session.
+
+    Returns a tuple of (sonde type, serial, decoder object). Raises ValueError if the data is invalid, or
+    from an unsupported format version.
+    """
+
+    try:
+        (_version, _type_code, _last_frame_time, _serial_len) = SNAPSHOT_SESSION_HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise ValueError("Snapshot session data too short.")
+
+    if _version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {_version}.")
+
+    _sonde_types = {_code: _type for (_type, _code) in SNAPSHOT_SONDE_TYPES.items()}
+    if _type_code not in _sonde_types:
+        raise ValueError(f"Unknown sonde type code {_type_code}.")
+
+    _sonde_type = _sonde_types[_type_code]
+    _offset = SNAPSHOT_SESSION_HEADER.size
+    _serial = bytes(data[_offset:_offset+_serial_len]).decode('utf-8')
+
+    try:
+        _session = SNAPSHOT_SERIALIZERS[_sonde_type][1](_serial, data[_offset+_serial_len:])
+    except struct.error as e:
+        raise ValueError(f"Invalid {_sonde_type} snapshot data: {str(e)}")
+
+    _session.last_frame_time = _last_frame_time
+
+    return (_sonde_type, _session.serial, _session)
+
+
+class FileSnapshotStore(object):
+    """
+    Store snapshots of all sessions in a single file. The file is replaced atomically on each save.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+
+    def save(self, sessions):
+        """ Save a list of serialised sessions """
+
+        _tmp_filename = self.filename + ".tmp"
+
+        with open(_tmp_filename, 'wb') as _f:
+            _f.write(SNAPSHOT_FILE_HEADER.pack(SNAPSHOT_FILE_MAGIC, SNAPSHOT_VERSION, len(sessions)))
+            for _session in sessions:
+                _f.write(SNAPSHOT_FILE_SESSION_LEN.pack(len(_session)))
+                _f.write(_session)
+
+        os.replace(_tmp_filename, self.filename)
+
+
+    def load(self):
+        """ Load a list of serialised sessions. Returns an empty list if the file does not exist. """
+
+        if not os.path.exists(self.filename):
+            return []
+
+        with open(self.filename, 'rb') as _f:
+            _data = _f.read()
+
+        (_magic, _version, _count) = SNAPSHOT_FILE_HEADER.unpack_from(_data, 0)
+
+        if (_magic != SNAPSHOT_FILE_MAGIC) or (_version != SNAPSHOT_VERSION):
+            raise ValueError(f"{self.filename} is not a supported snapshot file.")
+
+        output = []
+        _offset = SNAPSHOT_FILE_HEADER.size
+        for _i in range(_count):
+            (_len,) = SNAPSHOT_FILE_SESSION_LEN.unpack_from(_data, _offset)
+            _offset += SNAPSHOT_FILE_SESSION_LEN.size
+            output.append(_data[_offset:_offset+_len])
+            _offset += _len
+
+        return output
+
+
+class SQLiteSnapshotStore(object):
+    """
+    Store snapshots of all sessions in a SQLite database, replacing the previous snapshot on each save.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        with self._connect() as _db:
+            _db.execute("CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+
+
+    def _connect(self):
+        # sqlite3 is only needed if this store is used, so we only import it here.
+        import sqlite3
+
+        return sqlite3.connect(self.filename)
+
+
+    def save(self, sessions):
+        """ Save a list of serialised sessions """
+
+        _db = self._connect()
+        try:
+            with _db:
+                _db.execute("DELETE FROM sessions")
+                _db.executemany("INSERT INTO sessions (data) VALUES (?)", [(_session,) for _session in sessions])
+        finally:
+            _db.close()
+
+
+    def load(self):
+        """ Load a list of serialised sessions """
+
+        _db = self._connect()
+        try:
+            return [_row[0] for _row in _db.execute("SELECT data FROM sessions ORDER BY id")]
+        finally:
+            _db.close()
+
+
+def snapshot_sessions(sessions):
+    """ Serialise a dictionary of (sonde type, serial) -> session into a list of bytes, skipping any that fail """
+
+    output = []
+
+    for ((_sonde_type, _serial), _session) in sessions.items():
+        try:
+            output.append(serialize_session(_sonde_type, _serial, _session))
+        except Exception as e:
+            logging.error(f"Could not snapshot session {_sonde_type} {_serial}: {str(e)}")
+
+    return output
+
+
+def restore_sessions(data):
+    """ Restore a list of serialised sessions into a list of (sonde type, serial, session), skipping any that are invalid """
+
+    output = []
+
+    for _data in data:
+        try:
+            output.append(restore_session(_data))
+        except ValueError as e:
+            logging.error(f"Could not restore session: {str(e)}")
+
+    return output
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+#
+#   Radiosonde Type Detection and Decode Dispatch
+#
+#   Identifies the radiosonde type of a frame (after de-scrambling) from its header bytes and length,
+#   so mixed streams of frames can be routed to the right decoder without trying each decoder in turn.
+#
+#   All supported frame headers differ within their first SONDE_TYPE_KEY_LEN bytes, so these bytes are
+#   used as the key into a lookup table, built once from SONDE_TYPES. Detection is then a dictionary lookup,
+#   a check of the full header, and a check of the frame length.
+#
+#   Options which only apply to some sonde types (e.g. ecc, for RS41) can be passed when decoding a mixed stream
+#   of frames. Each sonde type lists the keyword arguments its decode function and stateful decoder accept, and
+#   only those are passed on (refer sonde_type_args).
+#
+from .RS41 import RS41
+from .RS41.decoder import decode as rs41_decode
+from .RS41.decoder import RS41_BLOCK_START_POS, RS41_FRAME_HEADER
+from .LMS6_403 import LMS6_403
+from .LMS6_403.decoder import decode as lms6_403_decode
+from .LMS6_403.decoder import LMS6_403_FRAME_HEADER, LMS6_403_FRAME_LEN
+from .utils.errors import error_result, ERR_UNKNOWN_SONDE_TYPE
+
+
+# Supported sonde types, with the frame header, the minimum frame length, the decode function and the stateful decoder class,
+# and the keyword arguments accepted by the decode function and the stateful decoder's add_frame method.
+SONDE_TYPES = {
+    'RS41': {
+        'header': RS41_FRAME_HEADER,
+        'min_len': RS41_BLOCK_START_POS,
+        'decode': rs41_decode,
+        'decoder': RS41,
+        'decode_args': ['ignore_crc', 'subframe', 'blocks', 'lazy', 'metrics', 'strict', 'ecc'],
+        'add_frame_args': ['blocks', 'lazy', 'record', 'strict', 'ecc'],
+    },
+    'LMS6_403': {
+        'header': LMS6_403_FRAME_HEADER,
+        'min_len': LMS6_403_FRAME_LEN,
+        'decode': lms6_403_decode,
+        'decoder': LMS6_403,
+        'decode_args': ['ignore_crc', 'cal_data', 'metrics', 'strict'],
+        'add_frame_args': ['record', 'strict'],
+    },
+}
+
+# Number of header bytes used as the lookup key (the length of the shortest header).
+SONDE_TYPE_KEY_LEN = min(len(_type['header']) for _type in SONDE_TYPES.values())
+
+
+def _build_lookup(sonde_types):
+    """ Build the header lookup table, as key bytes -> list of (sonde type, full header, minimum frame length) """
+
+    output = {}
+    for (_sonde_type, _info) in sonde_types.items():
+        output.setdefault(_info['header'][:SONDE_TYPE_KEY_LEN], []).append((_sonde_type, _info['header'], _info['min_len']))
+
+    return output
+
+
+SONDE_TYPE_LOOKUP = _build_lookup(SONDE_TYPES)
+
+
+def detect_type(frame):
+    """
+    Identify the radiosonde type of a frame (after de-scrambling).
+
+    Returns the sonde type (e.g. 'RS41'), or None if the frame does not match any supported type.
+    """
+
+    _candidates = SONDE_TYPE_LOOKUP.get(bytes(frame[:SONDE_TYPE_KEY_LEN]))
+
+    if _candidates is None:
+        return None
+
+    for (_sonde_type, _header, _min_len) in _candidates:
+        if (len(frame) >= _min_len) and (frame[:len(_header)] == _header):
+            return _sonde_type
+
+    return None
+
+
+def sonde_type_args(sonde_type, kwargs, args='decode_args'):
+    """
+    Select the keyword arguments which apply to a sonde type, from arguments intended for a mixed stream of frames.
+
+    Args:
+    sonde_type (str): Radiosonde type (e.g. 'RS41')
+    kwargs (dict): Keyword arguments.
+    args (str): 'decode_args' to select arguments for the decode function, or 'add_frame_args' for the stateful decoder's add_frame.
+
+    Returns a dictionary of the arguments accepted by the sonde type. Raises a TypeError if an argument is not accepted
+    by any sonde type (e.g. a misspelt argument).
+    """
+
+    for _arg in kwargs:
+        if not any(_arg in _info[args] for _info in SONDE_TYPES.values()):
+            raise TypeError(f"Unexpected keyword argument '{_arg}'")
+
+    return {_arg: _value for (_arg, _value) in kwargs.items() if _arg in SONDE_TYPES[sonde_type][args]}
+
+
+def decode_any(frame, **kwargs):
+    """
+    Decode a frame of any supported radiosonde type, as per the decode() function for that type.
+    The detected sonde type is added to the output as 'sonde_type'.
+
+    Args:
+    frame (bytes): Data frame provided as bytes (after de-scrambling).
+    Any additional keyword arguments (e.g. metrics, strict) are passed on to the decode function, if it accepts them
+    (refer sonde_type_args).
+
+    Raises a ValueError if the sonde type could not be identified (or, if strict=False, returns an
+    'unknown_sonde_type' error result, refer utils.errors).
+    """
+
+    _sonde_type = detect_type(frame)
+
+    if _sonde_type is None:
+        if not kwargs.get('strict', True):
+            return error_result(ERR_UNKNOWN_SONDE_TYPE)
+
+        raise ValueError("Unknown radiosonde type.")
+
+    output = SONDE_TYPES[_sonde_type]['decode'](frame, **sonde_type_args(_sonde_type, kwargs))
+
+    if output is not None:
+        output['sonde_type'] = _sonde_type
+
+    return output
+
+
+def new_decoder(sonde_type, **kwargs):
+    """
+    Create a stateful decoder object (e.g. RS41) for a radiosonde type. Any keyword arguments are passed to the class.
+    """
+
+    if sonde_type not in SONDE_TYPES:
+        raise ValueError(f"Unsupported sonde type: {sonde_type}")
+
+    return SONDE_TYPES[sonde_type]['decoder'](**kwargs)
+
+
+if __name__ == "__main__":
+    from .utils.benchmark import BENCHMARK_TEMPLATES
+
+    _rs41 = BENCHMARK_TEMPLATES['RS41-SG']
+    _lms6_403 = BENCHMARK_TEMPLATES['LMS6_403']
+    _corrupted = bytearray(_rs41[:64])
+    _corrupted[6] ^= 0x01
+
+    _tests = [
+        [_rs41, 'RS41'],
+        [_lms6_403, 'LMS6_403'],
+        # Truncated frames, and a corrupted header
+        [_rs41[:16], None],
+        [_lms6_403[:34], None],
+        [bytes(_corrupted), None],
+        [b"", None],
+    ]
+
+    for (_frame, _expected) in _tests:
+        _type = detect_type(_frame)
+        print(f"{_frame[:8].hex()}... ({len(_frame)} bytes): {_type}")
+        assert(_type == _expected)
+
+        if _expected is not None:
+            assert(decode_any(_frame)['sonde_type'] == _expected)
+        else:
+            assert(decode_any(_frame, strict=False)['errors'] == [(ERR_UNKNOWN_SONDE_TYPE, None)])
+
+    # Options for one sonde type can be used with a mixed stream of frames.
+    from .registry import SondeRegistry
+
+    _registry = SondeRegistry()
+    for (_frame, _expected) in [[_rs41, 'RS41'], [_lms6_403, 'LMS6_403']]:
+        assert(decode_any(_frame, ecc=True, strict=False)['sonde_type'] == _expected)
+        assert(_registry.add_any_frame(_frame, ecc=True, strict=False)['ok'])
+
+    try:
+        decode_any(_rs41, ecc_enabled=True)
+        raise AssertionError("Unknown argument was accepted.")
+    except TypeError:
+        pass
+
+    print("All tests passed!")
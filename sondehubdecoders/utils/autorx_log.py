@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+#
+#   auto_rx Format Log Writer
+#
+#   Formats decoded frames (dictionaries or records) as lines of CSV, matching the log files
+#   written by radiosonde_auto_rx. Each sonde type has a table of columns, which is compiled once
+#   into a single format string, so formatting a line is one lookup per block and one str.format call.
+#   Fields which are missing from a frame (e.g. a frame without a GPS block, or before the subframe
+#   data has been received) are written using the same sentinel values auto_rx uses.
+#
+import logging
+
+
+def autorx_timestamp(timestamp):
+    """ Format a datetime as per auto_rx, e.g. 2021-11-12T22:53:38.000Z """
+    return f"{timestamp:%Y-%m-%dT%H:%M:%S}.{timestamp.microsecond//1000:03d}Z"
+
+
+def autorx_frequency(frequency_khz):
+    return frequency_khz / 1000.0
+
+
+# Log columns for each sonde type.
+# Each column is: [column name, path to the value within the decoded frame, format spec, missing value, conversion function (optional)]
+# Values from outside the decoder (e.g. receiver information) are converted to the type their format spec requires.
+AUTORX_LOG_COLUMNS = {
+    'RS41': [
+        ['timestamp',   ('blocks', 'GPS Fix Information', 'timestamp_dt'),  '',     '1970-01-01T00:00:00.000Z', autorx_timestamp],
+        ['serial',      ('blocks', 'Status', 'serial'),                     '',     'Unknown'],
+        ['frame',       ('blocks', 'Status', 'frame_count'),                'd',    -1],
+        ['lat',         ('blocks', 'GPS Position', 'latitude'),             '.5f',  0.0],
+        ['lon',         ('blocks', 'GPS Position', 'longitude'),            '.5f',  0.0],
+        ['alt',         ('blocks', 'GPS Position', 'altitude'),             '.1f',  0.0],
+        ['vel_v',       ('blocks', 'GPS Position', 'ascent_rate'),          '.1f',  -1.0],
+        ['vel_h',       ('blocks', 'GPS Position', 'ground_speed'),         '.1f',  -1.0],
+        ['heading',     ('blocks', 'GPS Position', 'heading'),              '.1f',  -1.0],
+        ['temp',        ('blocks', 'Measurements', 'temperature'),          '.1f',  -273.0],
+        ['humidity',    ('blocks', 'Measurements', 'humidity'),             '.1f',  -1.0],
+        ['pressure',    ('blocks', 'Measurements', 'pressure'),             '.1f',  -1.0],
+        ['type',        ('subframe', 'subtype'),                            '',     'RS41'],
+        ['freq_mhz',    ('subframe', 'tx_frequency_khz'),                   '.3f',  0.0, autorx_frequency],
+        # Receiver information is not part of the frame.
+        ['snr',         ('receiver', 'snr'),                                '.1f',  -99.0],
+        ['f_error_hz',  ('receiver', 'f_error_hz'),                         'd',    0,      int],
+        ['sats',        ('blocks', 'GPS Position', 'numSV'),                'd',    -1],
+        ['batt_v',      ('blocks', 'Status', 'battery'),                    '.1f',  -1.0],
+        ['burst_timer', ('subframe', 'burstkill_timer'),                    'd',    -1],
+        ['aux_data',    ('aux',),                                           '',     '-1'],
+    ],
+    # The LMS6_403 decoder does not yet provide a date, so these logs contain the raw sensor channels
+    # (for calibration work) rather than the auto_rx log columns.
+    'LMS6_403': [
+        ['frame',       ('frame_count',),                                   'd',    -1],
+        ['iTOW',        ('iTOW',),                                          '',     -1],
+        ['alt',         ('altitude',),                                      '',     0.0],
+        ['chan1',       ('sensor_chan1',),                                  '',     -1],
+        ['chan2',       ('sensor_chan2',),                                  '',     -1],
+        ['chan3',       ('sensor_chan3',),                                  '',     -1],
+        ['chan4',       ('sensor_chan4',),                                  '',     -1],
+        ['chan13',      ('sensor_chan13',),                                 '',     -1],
+        ['temp',        ('temperature',),                                   '.1f',  -273.0],
+    ],
+}
+
+# Number of lines to collect before writing them out.
+AUTORX_LOG_BATCH_SIZE = 1000
+
+
+def _resolve(frame, path):
+    """ Follow a path of keys into a decoded frame, returning None if any part of it is not present """
+
+    _value = frame
+    try:
+        for _key in path:
+            # Compact RS41 records hold a reference to the subframe object, rather than its field dictionary.
+            if hasattr(_value, 'subframe_fields'):
+                _value = _value.subframe_fields
+
+            _value = _value[_key]
+    except (KeyError, TypeError):
+        return None
+
+    if hasattr(_value, 'subframe_fields'):
+        _value = _value.subframe_fields
+
+    return _value
+
+
+class AutoRxLogFormat(object):
+    """
+    A compiled log line format, for one sonde type.
+    """
+
+    def __init__(self, columns):
+        """
+        Args:
+        columns (list): Column definitions, in the same format as AUTORX_LOG_COLUMNS
+        """
+
+        self.header = ",".join(_column[0] for _column in columns)
+        self._format = ",".join(
+            "{%d:%s}" % (_i, _column[2]) for (_i, _column) in enumerate(columns)
+        ).format
+
+        # Group the columns by the dictionary they are read from, so each block is only looked up once per line.
+        _groups = {}
+        for (_i, _column) in enumerate(columns):
+            _path = _column[1]
+            _convert = _column[4] if len(_column) > 4 else None
+            _groups.setdefault(_path[:-1], []).append((_i, _path[-1], _convert))
+
+        self._groups = list(_groups.items())
+        self._missing = [_column[3] for _column in columns]
+
+
+    def format(self, frame):
+        """ Format a decoded frame as a log line """
+
+        _values = list(self._missing)
+
+        for (_path, _fields) in self._groups:
+            _source = _resolve(frame, _path)
+            if _source is None:
+                continue
+
+            for (_i, _key, _convert) in _fields:
+                try:
+                    _value = _source[_key]
+                except (KeyError, TypeError):
+                    continue
+
+                if _value is None:
+                    continue
+
+                _values[_i] = _convert(_value) if _convert else _value
+
+        return self._format(*_values)
+
+
+# Compiled formats for each sonde type.
+AUTORX_LOG_FORMATS = {_type: AutoRxLogFormat(_columns) for (_type, _columns) in AUTORX_LOG_COLUMNS.items()}
+
+
+def format_log_line(frame, sonde_type='RS41'):
+    """ Format a decoded frame as a line of an auto_rx log (without a trailing newline) """
+    return AUTORX_LOG_FORMATS[sonde_type].format(frame)
+
+
+class AutoRxLogWriter(object):
+    """
+    Write decoded frames to an auto_rx format log file. Lines are collected and written out in batches.
+    Can be used as a context manager, which closes the log on exit.
+    """
+
+    def __init__(self, output, sonde_type='RS41', header=True, batch_size=AUTORX_LOG_BATCH_SIZE):
+        """
+        Args:
+        output (str, file): Filename to write to, or an open (text-mode) file object.
+        sonde_type (str): Radiosonde type (RS41, LMS6_403)
+        header (bool): Write a header line at the start of the log.
+        batch_size (int): Number of lines to collect before writing them out.
+        """
+
+        if sonde_type not in AUTORX_LOG_FORMATS:
+            raise ValueError(f"Unsupported sonde type: {sonde_type}")
+
+        if isinstance(output, str):
+            self.file = open(output, 'w')
+            self._close_file = True
+        else:
+            self.file = output
+            self._close_file = False
+
+        self.log_format = AUTORX_LOG_FORMATS[sonde_type]
+        self.batch_size = batch_size
+        self.lines = []
+        self.lines_written = 0
+
+        if header:
+            self.lines.append(self.log_format.header)
+
+
+    def add_frame(self, frame):
+        """ Add a decoded frame to the log. Frames which failed to decode (None) are skipped. """
+
+        if frame is None:
+            return
+
+        try:
+            self.lines.append(self.log_format.format(frame))
+        except Exception as e:
+            logging.error(f"Could not format log line: {str(e)}")
+            return
+
+        if len(self.lines) >= self.batch_size:
+            self.flush()
+
+
+    def add_frames(self, frames):
+        """ Add many decoded frames to the log """
+
+        for _frame in frames:
+            self.add_frame(_frame)
+
+
+    def flush(self):
+        """ Write out all collected lines """
+
+        if self.lines:
+            self.file.write("\n".join(self.lines) + "\n")
+            self.lines_written += len(self.lines)
+            self.lines = []
+
+        self.file.flush()
+
+
+    def close(self):
+        self.flush()
+
+        if self._close_file:
+            self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    import datetime
+    import io
+
+    # Check formatting of a complete frame, and a frame with missing blocks.
+    _frame = {
+        'blocks': {
+            'Status': {'serial': 'S4610487', 'frame_count': 313, 'battery': 2.9},
+            'GPS Fix Information': {'timestamp_dt': datetime.datetime(2021, 11, 12, 22, 53, 38)},
+            'GPS Position': {'latitude': -34.952451, 'longitude': 138.520453, 'altitude': 10.53, 'ascent_rate': -0.3,
+                'ground_speed': 0.3, 'heading': 180.91, 'numSV': 6},
+            'Measurements': {},
+        },
+        'subframe': {'subtype': 'RS41-SG', 'tx_frequency_khz': 401500},
+        'receiver': {'snr': 13.5, 'f_error_hz': 937},
+    }
+    _missing = {'blocks': {'Status': {'serial': 'S4610487', 'frame_count': 314, 'battery': 2.9}}}
+    _lms6_403_frame = {
+        'frame_count': 4200, 'iTOW': 372103000, 'altitude': 1253.2, 'sensor_chan1': 2104.5, 'sensor_chan2': 1.5,
+        'sensor_chan3': 30559.75, 'sensor_chan4': 0.0, 'sensor_chan13': 12.25, 'temperature': 14.06,
+    }
+
+    _tests = [
+        ['RS41', _frame, "2021-11-12T22:53:38.000Z,S4610487,313,-34.95245,138.52045,10.5,-0.3,0.3,180.9,-273.0,-1.0,-1.0,RS41-SG,401.500,13.5,937,6,2.9,-1,-1"],
+        ['RS41', _missing, "1970-01-01T00:00:00.000Z,S4610487,314,0.00000,0.00000,0.0,-1.0,-1.0,-1.0,-273.0,-1.0,-1.0,RS41,0.000,-99.0,0,-1,2.9,-1,-1"],
+        # Receivers may report the frequency error as a float.
+        ['RS41', dict(_frame, receiver={'snr': 13.5, 'f_error_hz': -937.6}),
+            "2021-11-12T22:53:38.000Z,S4610487,313,-34.95245,138.52045,10.5,-0.3,0.3,180.9,-273.0,-1.0,-1.0,RS41-SG,401.500,13.5,-937,6,2.9,-1,-1"],
+        ['LMS6_403', _lms6_403_frame, "4200,372103000,1253.2,2104.5,1.5,30559.75,0.0,12.25,14.1"],
+        # A frame received before the calibration data, so without a temperature.
+        ['LMS6_403', {'frame_count': 4201}, "4201,-1,0.0,-1,-1,-1,-1,-1,-273.0"],
+    ]
+
+    for (_sonde_type, _test, _expected) in _tests:
+        _line = format_log_line(_test, _sonde_type)
+        print(f"{_line} - {'PASS' if _line == _expected else 'FAIL'}")
+        assert _line == _expected
+
+    # Lines are written out in batches (including the header), and skipped frames don't produce lines.
+    _output = io.StringIO()
+    with AutoRxLogWriter(_output, sonde_type='RS41', batch_size=4) as _writer:
+        _writer.add_frames([_frame, None, _missing])
+        assert _output.getvalue() == "" and _writer.lines_written == 0
+
+        # A frame which can't be formatted is logged and skipped.
+        _writer.add_frame({'blocks': {'Status': {'frame_count': 'bad'}}})
+        _writer.add_frame(_missing)
+        assert _writer.lines_written == 4
+
+    assert _output.getvalue().split("\n") == [AUTORX_LOG_FORMATS['RS41'].header, _tests[0][2], _tests[1][2], _tests[1][2], ""]
+
+    _output = io.StringIO()
+    with AutoRxLogWriter(_output, sonde_type='LMS6_403', header=False, batch_size=1) as _writer:
+        _writer.add_frame(_lms6_403_frame)
+        assert _output.getvalue() == _tests[3][2] + "\n"
+
+    print("All tests passed!")
@@ -0,0 +1,620 @@
+#!/usr/bin/env python
+#
+#   Decoder Benchmarks
+#
+#   Measures decode throughput (frames per second) and the time spent in each stage of decoding
+#   (error correction, CRC checks, block walking, struct unpacking, post-processing, subframe handling, etc) for each
+#   sonde type, over generated corpora of clean, corrupted and encrypted frames.
+#
+#   The time taken to import each of the main modules in a fresh interpreter is also measured, as this is paid by
+#   every command line invocation and worker process.
+#
+#   Results can be saved as JSON, and later runs compared against a saved baseline, e.g.:
+#   $ python -m sondehubdecoders.utils.benchmark -o baseline.json
+#   (upgrade)
+#   $ python -m sondehubdecoders.utils.benchmark -c baseline.json
+#
+import codecs
+import json
+import logging
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import time
+from .checksums import check_packet_crc, check_span_crcs, get_crc_func
+from ..RS41 import RS41
+from ..RS41.decoder import decode as rs41_decode
+from ..RS41.decoder import index_blocks, RS41_BLOCK_START_POS
+from ..RS41.ecc import check_ecc, correct_frame, rs41_codewords, RS41_RS_CODE, RS41_RS_NSYM, RS41_RS_PARITY_POS
+from ..RS41.postprocess import rs41_process_gps_info, rs41_process_gps_position, rs41_process_measurements
+from ..RS41.subframe import RS41Subframe, RS41_SUBFRAME_SEGMENT_LEN
+from ..LMS6_403 import LMS6_403
+from ..LMS6_403.decoder import decode as lms6_403_decode
+from ..LMS6_403.decoder import LMS6_403_COMPILED_DECODER, LMS6_403_FRAME_LEN
+from ..LMS6_403.postprocess import lms6_403_process_measurements
+
+
+# Benchmark results format version. Increment if the layout of the results changes.
+BENCHMARK_VERSION = 1
+
+# Template frames, which the corpora are generated from.
+BENCHMARK_TEMPLATES = {
+    'RS41-SG': codecs.decode("8635f44093df1a60cc726b2da8bfd2e25a3c0c722eed2ba358668c0a1012e146f66da43f6da6af407b03788afc655cee0a7355b3e21d67fe0f7928990553343631303438371e0000000000200000560003320444008089440000000000003c422ae9731d687a2a2ed402c8090296f402d06808a2510779590896c502c8090296f4020000000000000000000000000000005d6d7c1e8708d98fba1e0fb30b8011881cd40df818cf1eab0c8a0e91068e018313d792177d59c7fa3901ff91c6cc0bd06b00b817911f000000d4b7360073a8005da1c60179a50026fb660652da00269f3e119e56ff0aaec413a21801ec005b1bcb91ffea37eb0b9ad6003aada5136e53ff0977f41a51a4004200000090400084f57b156a2ea1e8db4aa91479b557eaf4ff1600fdff0a050ec4e676110000000000000000000000000000000000ecc7", "hex"),
+    'RS41-SGM-encrypted': codecs.decode("8635f44093df1a60b078a0b1fdf4a364753dbfabeec1ea6fcf2d63a703cc95f46393de2b92bceef71c3a637c0a75a8137a081e28c374be730f7928e11c52303331303233321a000003000315000091000732324e6f91015f020700050bae012822000057da80a718eef5c8defbf6a97a7d42bad293c0594e6df47164eddf17668e5bb12903a1727a5fc819ed067fb475ce0405cb78a32de680de17479815fbca810716ad21e9c6ce065862e16df0bc64eed37ae889a9fe058e1047b9cf61042d5d0c5f311f6775fadee126efbac35832325c9fbcd3e172953c87a9bddc02481ed91b119857828b7490445d03253611b302b454ff3fe5bc6e37ffeab3c34a6d61b770f99445305f2871152c26d1fd478c762c0000000000000000000000000000000000000000000000000000000000000000000000000000000000000000789a", "hex"),
+    'LMS6_403': codecs.decode("24540000007c4a9e0b191c544602ffe6e1e21dbbb4b3c01fec8f00b251b4009e2600253000141800380d291f842ca8ac1cf96f990f281f7aef59ea1cf533d1122a1f7bca3cdc1cf0ae041d291f8b960f811cfe1391172b1f827527611ceefa7c18201f91fc8f681ce9bf5005251f8ce3f25f1cfb582b0a281f929a06631cec937a1b241f9670fffa1ceba30010008400000000000000008a2a800000000000000000060080000000000000000003c172000000033e1b09dd7f0000000000001be4730fc1a003c19503c18a03c19603c194000000001b000000006f9a07e43e", "hex"),
+}
+
+# Corpus types available for each sonde type.
+BENCHMARK_CORPORA = {
+    'RS41': ['clean', 'corrupted', 'encrypted'],
+    'LMS6_403': ['clean', 'corrupted'],
+}
+
+# LMS6_403 calibration values sent in the generated frames (refer LMS6_403/postprocess.py), 4 per frame, at byte 212.
+BENCHMARK_LMS6_403_CAL = [
+    37292, 14726, 1697, 13846, 28307, 13209, 53398, 8226, 9984, 21534, 1729, 8371, 9966, 14726,
+    1697, 13846, 28305, 13209, 53398, 190, 6, 1000, 30, 0, 27, 0, 0, 20727
+]
+BENCHMARK_LMS6_403_CAL_POS = 212
+
+# Number of bytes to overwrite in each frame of a corrupted corpus.
+BENCHMARK_CORRUPT_BYTES = 4
+
+# Default number of frames in each corpus, and number of times each stage is run (the fastest run is used).
+BENCHMARK_FRAMES = 2000
+BENCHMARK_REPEAT = 3
+
+# Modules timed by the import benchmark, as stage name -> module.
+BENCHMARK_IMPORT_MODULES = {
+    'package': 'sondehubdecoders',
+    'rs41': 'sondehubdecoders.RS41',
+    'lms6_403': 'sondehubdecoders.LMS6_403',
+    'sonde_types': 'sondehubdecoders.sonde_types',
+    'registry': 'sondehubdecoders.registry',
+    'framer': 'sondehubdecoders.framer',
+    'read_rs_raw': 'sondehubdecoders.utils.read_rs_raw',
+    'server': 'sondehubdecoders.server',
+}
+
+# Script run in a fresh interpreter to time an import. The time is the only thing it should print.
+BENCHMARK_IMPORT_SCRIPT = "import time\n_start = time.perf_counter()\nimport {module}\nprint(time.perf_counter() - _start)"
+
+# Directory containing the sondehubdecoders package, added to the path of the fresh interpreters.
+BENCHMARK_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A stage which has become this much slower than the baseline is reported as a regression.
+BENCHMARK_REGRESSION_THRESHOLD = 0.1
+
+
+def make_rs41_subframe_data(max_subframe=50):
+    """ Generate a RS41 subframe containing plausible calibration and metadata values """
+
+    _data = bytearray((max_subframe + 1) * RS41_SUBFRAME_SEGMENT_LEN)
+
+    # 401.5 MHz
+    _data[0x002] = 0x80
+    _data[0x003] = 37
+    struct.pack_into('<H', _data, 0x015, 20215)
+    struct.pack_into('<ff', _data, 0x03D, 750.0, 1100.0)
+    struct.pack_into('<fff', _data, 0x04D, -243.91079711914062, 0.18765400350093842, 8.199999683711212e-06)
+    struct.pack_into('<fff', _data, 0x059, 1.2429190874099731, -0.16472387313842773, 0.008384902961552143)
+    struct.pack_into('<fff', _data, 0x125, -243.91079711914062, 0.18765400350093842, 8.199999683711212e-06)
+    struct.pack_into('<fff', _data, 0x131, 1.2928862571716309, -0.03315814957022667, 0.0050709364004433155)
+    _data[0x218:0x222] = b'RS41-SG\x00\x00\x00'
+    _data[0x222:0x22C] = b'RSM412\x00\x00\x00\x00'
+    _data[0x22C:0x236] = b'S4431040\x00\x00'
+    _data[0x243:0x24D] = b'00000000\x00\x00'
+    struct.pack_into('<H', _data, 0x316, 30600)
+
+    return bytes(_data)
+
+
+def _fix_rs41_crcs(frame):
+    """ Re-calculate the CRC of every block in a RS41 frame (a bytearray), in place """
+
+    _idx = RS41_BLOCK_START_POS
+    while _idx + 4 <= len(frame):
+        _len = frame[_idx + 1]
+        if _idx + 4 + _len > len(frame):
+            break
+        struct.pack_into('<H', frame, _idx + 2 + _len, get_crc_func('CRC16_CCITT')(bytes(frame[_idx + 2:_idx + 2 + _len])))
+        _idx += 4 + _len
+
+
+def _fix_rs41_ecc(frame):
+    """ Re-calculate the Reed-Solomon parity data of a RS41 frame (a bytearray), in place """
+
+    for (_i, _codeword) in enumerate(rs41_codewords(frame)):
+        _parity = RS41_RS_PARITY_POS + _i * RS41_RS_NSYM
+        frame[_parity:_parity + RS41_RS_NSYM] = RS41_RS_CODE.encode(_codeword[RS41_RS_NSYM:])[:RS41_RS_NSYM]
+
+
+def _corrupt(frames, start, seed):
+    """ Overwrite a few random bytes (after the first 'start' bytes) of each frame """
+
+    _random = random.Random(seed)
+    output = []
+
+    for _frame in frames:
+        _frame = bytearray(_frame)
+        for _i in range(BENCHMARK_CORRUPT_BYTES):
+            _frame[_random.randrange(start, len(_frame))] = _random.randrange(256)
+        output.append(bytes(_frame))
+
+    return output
+
+
+def make_rs41_corpus(num_frames=BENCHMARK_FRAMES, kind='clean', seed=0):
+    """
+    Generate a corpus of RS41 frames, as a single flight from one radiosonde.
+
+    Args:
+    num_frames (int): Number of frames to generate.
+    kind (str): 'clean' (valid RS41-SG frames, with a complete set of subframe data), 'corrupted' (as per clean,
+        with a few random bytes overwritten in each frame) or 'encrypted' (RS41-SGM frames with encrypted data blocks)
+    seed (int): Random seed for corrupted frames.
+    """
+
+    if kind not in BENCHMARK_CORPORA['RS41']:
+        raise ValueError(f"Unknown RS41 corpus type: {kind}")
+
+    _template = BENCHMARK_TEMPLATES['RS41-SGM-encrypted' if kind == 'encrypted' else 'RS41-SG']
+    # Status block data: frame count at 0, max subframe number at 22, subframe segment number at 23, subframe data at 24
+    _status = RS41_BLOCK_START_POS + 2
+    _max_subframe = _template[_status + 22]
+    _subframe = make_rs41_subframe_data(_max_subframe)
+    _blocks = index_blocks(_template)
+
+    output = []
+    for _i in range(num_frames):
+        _frame = bytearray(_template)
+        _frame_count = 1000 + _i
+        _segment = _frame_count % (_max_subframe + 1)
+
+        struct.pack_into('<H', _frame, _status, _frame_count)
+        _frame[_status + 23] = _segment
+        _frame[_status + 24:_status + 40] = _subframe[_segment * RS41_SUBFRAME_SEGMENT_LEN:(_segment + 1) * RS41_SUBFRAME_SEGMENT_LEN]
+
+        # Advance the GPS time of week (ms) by a second per frame.
+        if 'GPS Fix Information' in _blocks:
+            _gps_info = _blocks['GPS Fix Information'][1]
+            struct.pack_into('<I', _frame, _gps_info + 2, struct.unpack_from('<I', _template, _gps_info + 2)[0] + _i * 1000)
+
+        _fix_rs41_crcs(_frame)
+        _fix_rs41_ecc(_frame)
+        output.append(bytes(_frame))
+
+    if kind == 'corrupted':
+        output = _corrupt(output, RS41_BLOCK_START_POS, seed)
+
+    return output
+
+
+def make_lms6_403_corpus(num_frames=BENCHMARK_FRAMES, kind='clean', seed=0):
+    """
+    Generate a corpus of LMS6_403 frames, as a single flight from one radiosonde.
+
+    Args:
+    num_frames (int): Number of frames to generate.
+    kind (str): 'clean' or 'corrupted' (a few random bytes overwritten in each frame)
+    seed (int): Random seed for corrupted frames.
+    """
+
+    if kind not in BENCHMARK_CORPORA['LMS6_403']:
+        raise ValueError(f"Unknown LMS6_403 corpus type: {kind}")
+
+    _template = BENCHMARK_TEMPLATES['LMS6_403']
+
+    output = []
+    for _i in range(num_frames):
+        _frame = bytearray(_template[:LMS6_403_FRAME_LEN])
+        _frame_count = _i % 65536
+        _cal_base = (_frame_count % 7) * 4
+        struct.pack_into('>H', _frame, 8, _frame_count)
+        struct.pack_into('>4H', _frame, BENCHMARK_LMS6_403_CAL_POS, *BENCHMARK_LMS6_403_CAL[_cal_base:_cal_base + 4])
+        struct.pack_into('>H', _frame, LMS6_403_FRAME_LEN - 2, get_crc_func('CRC16_LMS6_403')(bytes(_frame[:-2])))
+        output.append(bytes(_frame))
+
+    if kind == 'corrupted':
+        output = _corrupt(output, 4, seed)
+
+    return output
+
+
+def _rs41_block_spans(frame):
+    """ Find the (data start, data length) of every block in a RS41 frame, including blocks which fail their CRC """
+
+    output = []
+    _idx = RS41_BLOCK_START_POS
+    while _idx + 2 <= len(frame):
+        output.append((_idx + 2, frame[_idx + 1]))
+        _idx += 4 + frame[_idx + 1]
+
+    return output
+
+
+def _rs41_stages(frames):
+    """ Prepare the per-stage benchmarks for a RS41 corpus, as a dictionary of stage name -> (function, number of items) """
+
+    # Pre-compute the inputs to each stage, so each stage is timed on its own.
+    _indexes = [index_blocks(_frame) for _frame in frames]
+    _spans = [_rs41_block_spans(_frame) for _frame in frames]
+    _unpack = [
+        (_frame[_start:_start + _len], _decoder)
+        for (_frame, _index) in zip(frames, _indexes)
+        for (_decoder, _start, _len) in _index.values() if _decoder.struct is not None
+    ]
+    _unpacked = {}
+    for (_data, _decoder) in _unpack:
+        _unpacked.setdefault(_decoder.block_name, []).append(dict(zip(_decoder.fields, _decoder.struct.unpack(_data))))
+    _segments = [(_block['subframe_count'], _block['subframe_data']) for _block in _unpacked.get('Status', [])]
+
+    _max_subframe = max((_block['max_subframe'] for _block in _unpacked.get('Status', [])), default=50)
+    _subframe = RS41Subframe(max_subframe=_max_subframe)
+    for (_count, _data) in _segments:
+        _subframe.add_segment(_count, _data)
+
+    def _ecc_check():
+        for _frame in frames:
+            check_ecc(_frame)
+
+    def _ecc_correct():
+        for _frame in frames:
+            correct_frame(_frame)
+
+    def _crc():
+        for (_frame, _frame_spans) in zip(frames, _spans):
+            check_span_crcs(_frame, _frame_spans)
+
+    def _block_index():
+        for _frame in frames:
+            index_blocks(_frame)
+
+    def _struct_unpack():
+        for (_data, _decoder) in _unpack:
+            _decoder.struct.unpack(_data)
+
+    def _gps_postprocess():
+        # The post-processing functions work in-place, so each run works on copies of the blocks.
+        for _block in _unpacked.get('GPS Position', []):
+            rs41_process_gps_position(dict(_block))
+        for _block in _unpacked.get('GPS Fix Information', []):
+            rs41_process_gps_info(dict(_block))
+
+    def _subframe_update():
+        _new_subframe = RS41Subframe(max_subframe=_max_subframe)
+        for (_count, _data) in _segments:
+            _new_subframe.add_segment(_count, _data)
+
+    def _ptu():
+        for _block in _unpacked.get('Measurements', []):
+            rs41_process_measurements(dict(_block), subframe=_subframe)
+
+    def _decode():
+        for _frame in frames:
+            try:
+                rs41_decode(_frame)
+            except Exception:
+                pass
+
+    def _add_frame():
+        _decoder = RS41()
+        for _frame in frames:
+            _decoder.add_frame(_frame)
+
+    _gps_blocks = len(_unpacked.get('GPS Position', [])) + len(_unpacked.get('GPS Fix Information', []))
+
+    return {
+        'ecc_check': (_ecc_check, len(frames)),
+        'ecc_correct': (_ecc_correct, len(frames)),
+        'crc': (_crc, len(frames)),
+        'block_index': (_block_index, len(frames)),
+        'struct_unpack': (_struct_unpack, len(_unpack)),
+        'gps_postprocess': (_gps_postprocess, _gps_blocks),
+        'subframe_update': (_subframe_update, len(_segments)),
+        'ptu': (_ptu, len(_unpacked.get('Measurements', []))),
+        'decode': (_decode, len(frames)),
+        'add_frame': (_add_frame, len(frames)),
+    }
+
+
+def _lms6_403_stages(frames):
+    """ Prepare the per-stage benchmarks for a LMS6_403 corpus, as a dictionary of stage name -> (function, number of items) """
+
+    _valid = [_frame for _frame in frames if check_packet_crc(_frame, checksum="LMS6_403", big_endian=True)]
+    _unpacked = [LMS6_403_COMPILED_DECODER.decode(_frame) for _frame in _valid]
+
+    # Collect a full set of calibration data.
+    _session = LMS6_403()
+    for _frame in _valid[:(LMS6_403.LMS6_403_TOTAL_CAL // LMS6_403.LMS6_403_CAL_PER_FRAME)]:
+        _session.add_frame(_frame)
+    _cal_data = _session.cal_data
+
+    def _crc():
+        for _frame in frames:
+            check_packet_crc(_frame, checksum="LMS6_403", big_endian=True)
+
+    def _struct_unpack():
+        for _frame in _valid:
+            LMS6_403_COMPILED_DECODER.struct.unpack(_frame)
+
+    def _ptu():
+        for _block in _unpacked:
+            lms6_403_process_measurements(dict(_block), _cal_data)
+
+    def _decode():
+        for _frame in frames:
+            try:
+                lms6_403_decode(_frame)
+            except Exception:
+                pass
+
+    def _add_frame():
+        _decoder = LMS6_403()
+        for _frame in frames:
+            _decoder.add_frame(_frame)
+
+    return {
+        'crc': (_crc, len(frames)),
+        'struct_unpack': (_struct_unpack, len(_valid)),
+        'ptu': (_ptu, len(_unpacked) if _cal_data and (None not in _cal_data) else 0),
+        'decode': (_decode, len(frames)),
+        'add_frame': (_add_frame, len(frames)),
+    }
+
+
+# Corpus generator and stage preparation functions for each sonde type.
+BENCHMARK_SONDE_TYPES = {
+    'RS41': (make_rs41_corpus, _rs41_stages),
+    'LMS6_403': (make_lms6_403_corpus, _lms6_403_stages),
+}
+
+
+def time_stage(func, repeat=BENCHMARK_REPEAT):
+    """ Run a benchmark function a number of times, returning the fastest run time in seconds """
+
+    _best = None
+    for _i in range(repeat):
+        _start = time.perf_counter()
+        func()
+        _elapsed = time.perf_counter() - _start
+
+        if (_best is None) or (_elapsed < _best):
+            _best = _elapsed
+
+    return _best
+
+
+def time_import(module, repeat=BENCHMARK_REPEAT):
+    """
+    Import a module in a fresh Python interpreter a number of times, returning the fastest import time in seconds.
+    This does not include the startup time of the interpreter itself.
+
+    Raises a RuntimeError if the import fails, or if the module writes to stdout when imported.
+    """
+
+    _env = dict(os.environ)
+    _env['PYTHONPATH'] = os.pathsep.join([BENCHMARK_PACKAGE_ROOT] + ([_env['PYTHONPATH']] if _env.get('PYTHONPATH') else []))
+
+    _best = None
+    for _i in range(repeat):
+        _result = subprocess.run(
+            [sys.executable, '-c', BENCHMARK_IMPORT_SCRIPT.format(module=module)],
+            env=_env, capture_output=True, text=True
+        )
+
+        if _result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed: {_result.stderr.strip()}")
+
+        _lines = _result.stdout.splitlines()
+        if len(_lines) != 1:
+            raise RuntimeError(f"Importing {module} wrote to stdout: {_lines[:-1]}")
+
+        _elapsed = float(_lines[0])
+        if (_best is None) or (_elapsed < _best):
+            _best = _elapsed
+
+    return _best
+
+
+def _stage_result(items, seconds):
+    """ Build the result entry for a stage """
+
+    return {
+        'items': items,
+        'seconds': seconds,
+        'us_per_item': seconds / items * 1e6,
+        'items_per_sec': items / seconds if seconds > 0 else None,
+    }
+
+
+def run_import_benchmarks(repeat=BENCHMARK_REPEAT, stages=None):
+    """
+    Time importing each of BENCHMARK_IMPORT_MODULES in a fresh interpreter.
+
+    Returns a dictionary of stage name -> result, in the same format as the per-stage decode results.
+    """
+
+    output = {}
+    for (_stage, _module) in BENCHMARK_IMPORT_MODULES.items():
+        if (stages is not None) and (_stage not in stages):
+            continue
+
+        output[_stage] = _stage_result(1, time_import(_module, repeat))
+
+    return output
+
+
+def run_benchmarks(sonde_types=None, num_frames=BENCHMARK_FRAMES, repeat=BENCHMARK_REPEAT, stages=None, imports=True):
+    """
+    Run the benchmarks for the selected sonde types, over each of their corpora.
+
+    Args:
+    sonde_types (list): Sonde types to benchmark. Defaults to all supported types.
+    num_frames (int): Number of frames in each corpus.
+    repeat (int): Number of times to run each stage. The fastest run is reported.
+    stages (list): Optional list of stage names to run. Defaults to all stages.
+    imports (bool): If set, also run the import benchmarks (refer run_import_benchmarks).
+
+    Returns a dictionary of results, suitable for saving as JSON:
+    {'version', 'python', 'platform', 'timestamp', 'frames', 'repeat', 'results': {sonde type: {corpus: {stage: {...}}}}}
+    Each stage result contains the number of items processed (frames or blocks), the total time in seconds,
+    the time per item in microseconds, and the items processed per second.
+    Import benchmark results are under results['import']['fresh'], with one item per import.
+    """
+
+    if sonde_types is None:
+        sonde_types = list(BENCHMARK_SONDE_TYPES.keys())
+
+    output = {
+        'version': BENCHMARK_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'frames': num_frames,
+        'repeat': repeat,
+        'results': {},
+    }
+
+    # Corrupted frames produce a lot of error log messages, which we don't want to see (or time).
+    _log_disable = logging.root.manager.disable
+    logging.disable(logging.CRITICAL)
+
+    try:
+        for _sonde_type in sonde_types:
+            (_make_corpus, _prepare_stages) = BENCHMARK_SONDE_TYPES[_sonde_type]
+            output['results'][_sonde_type] = {}
+
+            for _corpus in BENCHMARK_CORPORA[_sonde_type]:
+                _frames = _make_corpus(num_frames, _corpus)
+                _results = {}
+
+                for (_stage, (_func, _items)) in _prepare_stages(_frames).items():
+                    if (stages is not None) and (_stage not in stages):
+                        continue
+
+                    if _items == 0:
+                        # Nothing for this stage to do with this corpus (e.g. measurements in encrypted frames)
+                        continue
+
+                    _results[_stage] = _stage_result(_items, time_stage(_func, repeat))
+
+                output['results'][_sonde_type][_corpus] = _results
+
+    finally:
+        logging.disable(_log_disable)
+
+    if imports:
+        _results = run_import_benchmarks(repeat=repeat, stages=stages)
+        if _results:
+            output['results']['import'] = {'fresh': _results}
+
+    return output
+
+
+def compare_results(results, baseline, threshold=BENCHMARK_REGRESSION_THRESHOLD):
+    """
+    Compare benchmark results against a baseline.
+
+    Returns a list of (sonde type, corpus, stage, baseline us per item, current us per item, change), where
+    change is the fractional change in time per item (e.g. 0.2 = 20% slower), and a list of the entries
+    which are regressions (slower by more than threshold).
+    """
+
+    if baseline.get('version') != BENCHMARK_VERSION:
+        raise ValueError(f"Unsupported baseline version {baseline.get('version')}")
+
+    output = []
+    for (_sonde_type, _corpora) in results['results'].items():
+        for (_corpus, _stages) in _corpora.items():
+            for (_stage, _result) in _stages.items():
+                try:
+                    _baseline = baseline['results'][_sonde_type][_corpus][_stage]['us_per_item']
+                except KeyError:
+                    continue
+
+                _change = (_result['us_per_item'] - _baseline) / _baseline
+                output.append((_sonde_type, _corpus, _stage, _baseline, _result['us_per_item'], _change))
+
+    return (output, [_entry for _entry in output if _entry[5] > threshold])
+
+
+def format_results(results):
+    """ Format benchmark results as a table """
+
+    _lines = [f"{'Type':<10} {'Corpus':<10} {'Stage':<16} {'Items':>8} {'us/item':>10} {'items/s':>12}"]
+
+    for (_sonde_type, _corpora) in results['results'].items():
+        for (_corpus, _stages) in _corpora.items():
+            for (_stage, _result) in _stages.items():
+                _lines.append(
+                    f"{_sonde_type:<10} {_corpus:<10} {_stage:<16} {_result['items']:>8} {_result['us_per_item']:>10.2f} {_result['items_per_sec']:>12.0f}"
+                )
+
+    return "\n".join(_lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # Command line arguments.
+    parser = argparse.ArgumentParser(description="Benchmark decoding performance over generated corpora.")
+    parser.add_argument(
+        "-t", "--type", help="Radiosonde type to benchmark (RS41, LMS6_403). Can be given multiple times. Default: all types",
+        action="append", choices=list(BENCHMARK_SONDE_TYPES.keys()), default=None
+    )
+    parser.add_argument(
+        "-n", "--frames", help=f"Number of frames in each corpus (default: {BENCHMARK_FRAMES})", type=int, default=BENCHMARK_FRAMES
+    )
+    parser.add_argument(
+        "-r", "--repeat", help=f"Number of times to run each stage (default: {BENCHMARK_REPEAT})", type=int, default=BENCHMARK_REPEAT
+    )
+    parser.add_argument(
+        "-s", "--stage", help="Only run this stage. Can be given multiple times.", action="append", default=None
+    )
+    parser.add_argument(
+        "--no-imports", help="Don't run the import time benchmarks", action="store_true", default=False
+    )
+    parser.add_argument(
+        "-o", "--output", help="Save results to this JSON file (e.g. as a baseline)", default=None
+    )
+    parser.add_argument(
+        "-c", "--compare", help="Compare results against a baseline JSON file. Exits with status 1 if any stage has regressed.", default=None
+    )
+    parser.add_argument(
+        "--threshold", help=f"Regression threshold, as a fraction (default: {BENCHMARK_REGRESSION_THRESHOLD})",
+        type=float, default=BENCHMARK_REGRESSION_THRESHOLD
+    )
+    args = parser.parse_args()
+
+    # Setup Logging
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s: %(message)s", level=logging.INFO
+    )
+
+    _results = run_benchmarks(sonde_types=args.type, num_frames=args.frames, repeat=args.repeat, stages=args.stage, imports=not args.no_imports)
+
+    print(format_results(_results))
+
+    if args.output:
+        with open(args.output, 'w') as _f:
+            json.dump(_results, _f, indent=2)
+        logging.info(f"Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as _f:
+            _baseline = json.load(_f)
+
+        (_changes, _regressions) = compare_results(_results, _baseline, threshold=args.threshold)
+
+        print(f"\nCompared against {args.compare} ({_baseline.get('timestamp')}, Python {_baseline.get('python')}):")
+        for (_sonde_type, _corpus, _stage, _old, _new, _change) in _changes:
+            _flag = "  REGRESSION" if _change > args.threshold else ""
+            print(f"{_sonde_type:<10} {_corpus:<10} {_stage:<16} {_old:>10.2f} -> {_new:>10.2f} us/item ({_change*100:+.1f}%){_flag}")
+
+        if _regressions:
+            logging.error(f"{len(_regressions)} stage(s) slower than the baseline by more than {args.threshold*100:.0f}%.")
+            sys.exit(1)
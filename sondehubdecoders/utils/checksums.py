@@ -2,9 +2,7 @@
 #   Common Checksum Functions
 #
 
-import crcmod
 import logging
-import struct
 
 
 # TODO - Convert to python
@@ -31,61 +29,194 @@ import struct
 #     return rem;
 # }
 
-def check_packet_crc(data:bytes, checksum:str='crc16', big_endian=False):
+# CRC Functions
+# crcmod generates a table-driven CRC function for each algorithm. Generating these (and importing crcmod)
+# is expensive compared to actually running them, so each one is built on first use, and re-used.
+
+# CRC function parameters, as arguments to crcmod.mkCrcFun.
+CRC_FUNCTION_PARAMS = {
+    # CRC16-CCITT (crcmod's 'crc-ccitt-false')
+    'CRC16_CCITT': {'poly': 0x11021, 'initCrc': 0xFFFF, 'rev': False, 'xorOut': 0x0000},
+    # LMS6_403 uses a CRC16-CCITT, but with an initial value of 0.
+    'CRC16_LMS6_403': {'poly': 0x11021, 'initCrc': 0x0000, 'rev': False, 'xorOut': 0x0000},
+}
+
+# CRC functions which have been built so far.
+_CRC_FUNCTIONS = {}
+
+# Checksum types, as [CRC function name, checksum length, checksum byte order]
+# A byte order of None means the byte order is selected by the caller (big_endian argument).
+CRC_TYPES = {
+    'crc16':        ['CRC16_CCITT', 2, None],
+    'CRC16':        ['CRC16_CCITT', 2, None],
+    'crc16-ccitt':  ['CRC16_CCITT', 2, None],
+    'CRC16-CCITT':  ['CRC16_CCITT', 2, None],
+    'LMS6_403':     ['CRC16_LMS6_403', 2, 'big'],
+}
+
+
+def get_crc_func(name):
+    """
+    Get a CRC function (refer CRC_FUNCTION_PARAMS), which accepts bytes and returns the CRC as an integer.
+    """
+
+    try:
+        return _CRC_FUNCTIONS[name]
+    except KeyError:
+        pass
+
+    if name not in CRC_FUNCTION_PARAMS:
+        raise ValueError(f"Checksum - Unknown CRC function {name}.")
+
+    import crcmod
+
+    _CRC_FUNCTIONS[name] = crcmod.mkCrcFun(**CRC_FUNCTION_PARAMS[name])
+    return _CRC_FUNCTIONS[name]
+
+
+def __getattr__(name):
+    # The CRC functions were previously built at import time, as CRC16_CCITT_FUNC and CRC16_LMS6_403_FUNC.
+    if name.endswith('_FUNC') and name[:-5] in CRC_FUNCTION_PARAMS:
+        return get_crc_func(name[:-5])
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_crc_type(checksum:str='crc16', big_endian=False):
+    """
+    Look up a checksum type, returning a tuple of (CRC function, checksum length, byte order)
+    """
+    try:
+        (_crc_name, _crc_len, _byteorder) = CRC_TYPES[checksum]
+    except KeyError:
+        raise ValueError(f"Checksum - Unknown Checksym type {checksum}.")
+
+    _crc_func = get_crc_func(_crc_name)
+
+    if _byteorder is None:
+        _byteorder = 'big' if big_endian else 'little'
+
+    return (_crc_func, _crc_len, _byteorder)
+
+
+def check_packet_crc(data:bytes, checksum:str='crc16', big_endian=False, quiet=False):
     """ 
     Attempt to validate a packets checksum, which is assumed to be present
-    in the last few bytes of the packet.
+    in the last few bytes of the packet. If quiet is set, failures are not logged.
 
-    Support CRC types: CRC16-CCITT
+    Support CRC types: CRC16-CCITT, LMS6_403 (CRC16-CCITT with an initial value of 0)
 
     TODO: Remove crcmod dependency.
 
     """
 
-    if (checksum == 'crc16') or (checksum == 'CRC16') or (checksum == 'crc16-ccitt') or (checksum == 'CRC16-CCITT'):
-        # Check we have enough data for a sane CRC16.
-        if len(data) < 3:
-            raise ValueError(f"Checksum - Not enough data for CRC16!")
+    (_crc_func, _crc_len, _byteorder) = get_crc_type(checksum, big_endian)
 
-        # Decode the last 2 bytes as a uint16
-        if big_endian:
-            _packet_checksum = struct.unpack('>H', data[-2:])[0]
-        else:
-            _packet_checksum = struct.unpack('<H', data[-2:])[0]
+    # Check we have enough data for a sane CRC16.
+    if len(data) < _crc_len + 1:
+        raise ValueError(f"Checksum - Not enough data for CRC16!")
 
-        # Calculate a CRC over the rest of the data
-        _crc16 = crcmod.predefined.mkCrcFun('crc-ccitt-false')
-        _calculated_crc = _crc16(data[:-2])
+    # Decode the last 2 bytes as a uint16, and calculate a CRC over the rest of the data
+    _packet_checksum = int.from_bytes(data[-_crc_len:], _byteorder)
+    _calculated_crc = _crc_func(data[:-_crc_len])
 
-        if _calculated_crc == _packet_checksum:
-            return True
-        else:
+    if _calculated_crc == _packet_checksum:
+        return True
+    else:
+        if not quiet:
             logging.debug(f"Calculated: {hex(_calculated_crc)}, Packet: {hex(_packet_checksum)}")
-            return False
+        return False
 
-    elif checksum == "LMS6_403":
-        # LMS6_403 uses a CRC16-CCITT, but with an initial value of 0.
-        	
-        # Check we have enough data for a sane CRC16.
-        if len(data) < 3:
-            raise ValueError(f"Checksum - Not enough data for CRC16!")
 
-        # Decode the last 2 bytes as a uint16
-        _packet_checksum = struct.unpack('>H', data[-2:])[0]
+def check_span_crcs(data:bytes, spans, checksum:str='crc16', big_endian=False):
+    """
+    Validate the checksums of many spans of a single buffer in one call.
 
-        # Calculate a CRC over the rest of the data
-        _crc16 = crcmod.mkCrcFun(0x11021, initCrc=0x0000, rev=False)
-        _calculated_crc = _crc16(data[:-2])
+    Each span is an (offset, length) pair describing a block of data within the buffer,
+    with the checksum assumed to immediately follow the block.
+    Spans where the checksum would run off the end of the buffer are reported as failures.
 
-        if _calculated_crc == _packet_checksum:
-            return True
-        else:
-            logging.debug(f"Calculated: {hex(_calculated_crc)}, Packet: {hex(_packet_checksum)}")
-            return False
+    Returns a list of booleans, one per span.
+    """
 
-    else:
-        raise ValueError(f"Checksum - Unknown Checksym type {checksum}.")
+    (_crc_func, _crc_len, _byteorder) = get_crc_type(checksum, big_endian)
+
+    # Use a memoryview so we don't copy each block out of the buffer.
+    _data = memoryview(data)
+    _data_len = len(data)
+
+    output = []
+    for (_offset, _length) in spans:
+        _crc_pos = _offset + _length
+        if (_length < 1) or (_crc_pos + _crc_len > _data_len):
+            output.append(False)
+            continue
 
+        _packet_checksum = int.from_bytes(_data[_crc_pos:_crc_pos+_crc_len], _byteorder)
+        output.append(_crc_func(_data[_offset:_crc_pos]) == _packet_checksum)
+
+    return output
+
+
+def check_packet_crcs(packets, checksum:str='crc16', big_endian=False):
+    """
+    Validate the checksums of many packets (e.g. a batch of frames) in one call.
+    As with check_packet_crc, the checksum is assumed to be in the last few bytes of each packet.
+    Packets too short to contain a checksum are reported as failures.
+
+    Returns a list of booleans, one per packet.
+    """
+
+    (_crc_func, _crc_len, _byteorder) = get_crc_type(checksum, big_endian)
+
+    output = []
+    for _packet in packets:
+        if len(_packet) < _crc_len + 1:
+            output.append(False)
+            continue
+
+        _data = memoryview(_packet)
+        output.append(_crc_func(_data[:-_crc_len]) == int.from_bytes(_data[-_crc_len:], _byteorder))
+
+    return output
+
+
+def crc16_table(poly=0x1021):
+    """
+    Generate a (MSB-first) CRC16 lookup table for the supplied polynomial, as a list of 256 ints.
+    """
+
+    _table = []
+    for _byte in range(256):
+        _rem = _byte << 8
+        for _bit in range(8):
+            if _rem & 0x8000:
+                _rem = (_rem << 1) ^ poly
+            else:
+                _rem = (_rem << 1)
+            _rem &= 0xFFFF
+        _table.append(_rem)
+
+    return _table
+
+
+def crc16_ccitt_many(data, init=0xFFFF):
+    """
+    Calculate the CRC16-CCITT of each row of a 2-D uint8 NumPy array in one vectorized pass.
+    An init value of 0xFFFF gives the same result as the 'crc16' checksum type, and 0x0000 the 'LMS6_403' type.
+
+    Returns a uint16 array with one CRC per row. Requires NumPy.
+    """
+    import numpy as np
+
+    _table = np.array(crc16_table(0x1021), dtype=np.uint16)
+    _crc = np.full(data.shape[0], init, dtype=np.uint16)
+
+    # Work through the data one column at a time, updating the CRC for every row at once.
+    for _col in range(data.shape[1]):
+        _crc = (_crc << 8) ^ _table[(_crc >> 8) ^ data[:, _col]]
+
+    return _crc
 
 
 if __name__ == "__main__":
@@ -113,4 +244,11 @@ if __name__ == "__main__":
         print(f"Packet: {_input}. CRC OK: {_decoded}")
         assert(_decoded == _output)
 
+    # Batch checks should agree with the single-packet checks.
+    _batch = check_packet_crcs([_test[1] for _test in tests])
+    assert(_batch == [_test[2] for _test in tests])
+
+    _spans = check_span_crcs(tests[2][1], [(0, len(tests[2][1])-2), (1, len(tests[2][1])-3)])
+    assert(_spans == [True, False])
+
     print("All tests passed!")
\ No newline at end of file
@@ -39,4 +39,41 @@ def lms6_24bit(data):
             _val = _numerator / _denominator
             return _val
         except:
-            return 0
\ No newline at end of file
+            return 0
+
+#
+#   Array Converters
+#   These operate on columns of NumPy structured arrays (e.g. a '3s' field extracted from many frames),
+#   for use in batch decoding. Converters which need NumPy functions (not just array methods) import it themselves,
+#   as NumPy is not required for single-frame decoding.
+#
+
+def uint24_le_array(data):
+    """
+    Decode an array of 24-bit little-endian unsigned integers, provided as a NumPy 'S3' or 'V3' array.
+    """
+    _bytes = data.view('u1').reshape(-1, 3).astype('u4')
+    return _bytes[:,0] | (_bytes[:,1] << 8) | (_bytes[:,2] << 16)
+
+def int24_be_array(data):
+    """
+    Decode an array of 24-bit big-endian signed integers, provided as a NumPy 'S3' or 'V3' array.
+    """
+    _bytes = data.view('u1').reshape(-1, 3).astype('i4')
+    _val = (_bytes[:,0] << 16) | (_bytes[:,1] << 8) | _bytes[:,2]
+    # Sign-extend
+    return _val - ((_val & 0x800000) << 1)
+
+def lms6_24bit_array(data):
+    """
+    Decode an array of values in the LMS6 7/17-bit format, provided as a NumPy 'S3' or 'V3' array.
+    As with lms6_24bit, values with a zero denominator are decoded as 0.
+    """
+    import numpy as np
+
+    _bytes = data.view('u1').reshape(-1, 3).astype('u4')
+    _val = (_bytes[:,0] << 16) | (_bytes[:,1] << 8) | _bytes[:,2]
+    _numerator = (_val & 0x1FFFF).astype(np.float64)
+    _denominator = (_val >> 17).astype(np.float64)
+
+    return np.divide(_numerator, _denominator, out=np.zeros(len(_val)), where=_denominator != 0)
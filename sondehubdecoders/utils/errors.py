@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#
+#   Decode Error Codes
+#
+#   When decoding with strict=False, decoders report problems as data rather than by raising
+#   exceptions or logging. The result dictionary then contains:
+#   - 'ok': True if the frame was decoded (frame-level checks passed, and any stateful processing succeeded).
+#       Individual blocks may still have failed - refer 'block_status'.
+#   - 'errors': A list of (error code, location) tuples, where location is a block name, an unknown
+#       block type (int), the exception type name (for ERR_PROCESSING), or None for frame-level errors.
+#   - 'block_status': Block name -> DECODE_OK or an error code, for every block found in the frame.
+#
+#   Error codes are plain strings, so they can be counted, logged or serialised as-is.
+#
+
+DECODE_OK = 'ok'
+
+# Frame-level errors. The frame could not be decoded at all.
+ERR_UNKNOWN_SONDE_TYPE = 'unknown_sonde_type'
+ERR_FRAME_TOO_SHORT = 'frame_too_short'
+ERR_HEADER_MISMATCH = 'header_mismatch'
+ERR_UNKNOWN_FRAME_TYPE = 'unknown_frame_type'
+# The serial number could not be extracted from the frame, so it could not be routed to a session (refer registry).
+ERR_NO_SERIAL = 'no_serial'
+
+# Block-level errors. The rest of the frame may still be usable.
+ERR_CRC = 'crc_failure'
+ERR_UNKNOWN_BLOCK = 'unknown_block'
+ERR_BLOCK_LENGTH = 'unexpected_block_length'
+ERR_BLOCK_DECODE = 'block_decode_error'
+# Errors in the frame could not be corrected using its error correction data (e.g. Reed-Solomon parity).
+ERR_ECC_UNCORRECTABLE = 'ecc_uncorrectable'
+
+# Stateful decoder errors.
+ERR_MISSING_STATUS = 'missing_status'
+ERR_SERIAL_MISMATCH = 'serial_mismatch'
+ERR_PROCESSING = 'processing_error'
+
+
+def error_result(code, location=None):
+    """ Produce a (strict=False) result for a frame which could not be decoded """
+
+    return {
+        'ok': False,
+        'errors': [(code, location)],
+        'block_status': {},
+    }
+
+
+def block_errors(block_status):
+    """ List the (error code, block) tuples for any blocks which failed to decode """
+
+    return [(_status, _block) for (_block, _status) in block_status.items() if _status != DECODE_OK]
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+#
+#   Columnar Flight Export
+#
+#   Collects decoded frames into typed column buffers (one per field), and writes them out in bulk
+#   to a columnar file format - Parquet (if pyarrow is available), or a NumPy .npz archive.
+#   This is much faster to load for analysis than parsing per-frame text output.
+#
+import logging
+from array import array
+
+
+# Column definitions for each sonde type.
+# Column name -> [path to the value within the decoded frame, column type]
+# Column types: 'd' - float (missing values are NaN), 'q' - integer (missing values are -1), 's' - string (missing values are '')
+EXPORT_COLUMNS = {
+    'RS41': {
+        # Common fields
+        'serial':               [('common', 'serial'), 's'],
+        'frame':                [('common', 'frame'), 'q'],
+        'datetime':             [('common', 'datetime'), 's'],
+        'batt':                 [('common', 'batt'), 'd'],
+        # GPS
+        'lat':                  [('common', 'lat'), 'd'],
+        'lon':                  [('common', 'lon'), 'd'],
+        'alt':                  [('common', 'alt'), 'd'],
+        'vel_v':                [('common', 'vel_v'), 'd'],
+        'vel_h':                [('common', 'vel_h'), 'd'],
+        'heading':              [('common', 'heading'), 'd'],
+        'sats':                 [('common', 'sats'), 'q'],
+        'wind_u':               [('blocks', 'GPS Position', 'wind_u'), 'd'],
+        'wind_v':               [('blocks', 'GPS Position', 'wind_v'), 'd'],
+        'pDOP':                 [('blocks', 'GPS Position', 'pDOP'), 'd'],
+        'sAcc':                 [('blocks', 'GPS Position', 'sAcc'), 'd'],
+        'gps_week':             [('blocks', 'GPS Fix Information', 'week'), 'q'],
+        'gps_itow':             [('blocks', 'GPS Fix Information', 'iTOW'), 'd'],
+        # PTU
+        'temp':                 [('blocks', 'Measurements', 'temperature'), 'd'],
+        'temp_meas_main':       [('blocks', 'Measurements', 'temp_meas_main'), 'q'],
+        'temp_meas_ref1':       [('blocks', 'Measurements', 'temp_meas_ref1'), 'q'],
+        'temp_meas_ref2':       [('blocks', 'Measurements', 'temp_meas_ref2'), 'q'],
+        'humidity_main':        [('blocks', 'Measurements', 'humidity_main'), 'q'],
+        'humidity_ref1':        [('blocks', 'Measurements', 'humidity_ref1'), 'q'],
+        'humidity_ref2':        [('blocks', 'Measurements', 'humidity_ref2'), 'q'],
+        'humidity_temp_main':   [('blocks', 'Measurements', 'humidity_temp_main'), 'q'],
+        'pressure_main':        [('blocks', 'Measurements', 'pressure_main'), 'q'],
+        'pressure_temp':        [('blocks', 'Measurements', 'pressure_temp'), 'd'],
+        'ref_area_temp':        [('blocks', 'Status', 'ref_area_temp'), 'q'],
+        # Subframe metadata
+        'subtype':              [('subframe', 'subtype'), 's'],
+        'firmware_version':     [('subframe', 'firmware_version'), 'q'],
+        'burst_timer':          [('subframe', 'burstkill_timer'), 'q'],
+        'tx_frequency_khz':     [('subframe', 'tx_frequency_khz'), 'q'],
+        'subframe_count':       [('blocks', 'Status', 'subframe_count'), 'q'],
+    },
+    'LMS6_403': {
+        'serial':               [('serial',), 'q'],
+        'frame':                [('frame_count',), 'q'],
+        'gps_itow':             [('iTOW',), 'q'],
+        'lat':                  [('latitude',), 'd'],
+        'lon':                  [('longitude',), 'd'],
+        'alt':                  [('altitude',), 'd'],
+        'vel_v':                [('up_down_vel_mms',), 'd'],
+        'vel_east':             [('east_west_vel_mms',), 'd'],
+        'vel_north':            [('north_south_vel_mms',), 'd'],
+        'temp':                 [('temperature',), 'd'],
+        'sensor_chan1':         [('sensor_chan1',), 'd'],
+        'sensor_chan2':         [('sensor_chan2',), 'd'],
+        'sensor_chan3':         [('sensor_chan3',), 'd'],
+        'sensor_chan4':         [('sensor_chan4',), 'd'],
+        'sensor_chan13':        [('sensor_chan13',), 'd'],
+    },
+}
+
+# Values used for missing fields, for each column type.
+EXPORT_MISSING_VALUES = {
+    'd': float('nan'),
+    'q': -1,
+    's': '',
+}
+
+
+def _extract(frame, path):
+    """ Extract a value from a decoded frame (dictionary or record), returning None if it is not present """
+
+    _value = frame
+    try:
+        for _key in path:
+            # Compact RS41 records hold a reference to the subframe object, rather than its field dictionary.
+            if hasattr(_value, 'subframe_fields'):
+                _value = _value.subframe_fields
+
+            _value = _value[_key]
+    except (KeyError, TypeError):
+        return None
+
+    return _value
+
+
+class ColumnarExporter(object):
+    """
+    Collects decoded frames into typed column buffers, for writing out in bulk.
+    """
+
+    def __init__(self, sonde_type='RS41', columns=None):
+        """
+        Args:
+        sonde_type (str): Radiosonde type (RS41, LMS6_403)
+        columns (dict): Optional column definitions, in the same format as EXPORT_COLUMNS. Defaults to EXPORT_COLUMNS[sonde_type]
+        """
+
+        if columns is None:
+            if sonde_type not in EXPORT_COLUMNS:
+                raise ValueError(f"Unsupported sonde type: {sonde_type}")
+            columns = EXPORT_COLUMNS[sonde_type]
+
+        self.sonde_type = sonde_type
+        self.column_info = columns
+
+        # Numeric columns are stored in compact array.array buffers, strings in lists.
+        self.buffers = {
+            _name: ([] if _type == 's' else array(_type)) for (_name, (_path, _type)) in columns.items()
+        }
+        self.num_frames = 0
+
+
+    def add_frame(self, frame):
+        """ Add a decoded frame (dictionary or record). Frames which failed to decode (None) are skipped. """
+
+        if frame is None:
+            return
+
+        # Extract all the values first, so a bad value can't leave the columns with different lengths.
+        _row = []
+        for (_name, (_path, _type)) in self.column_info.items():
+            _value = _extract(frame, _path)
+
+            if _value is None:
+                _value = EXPORT_MISSING_VALUES[_type]
+            elif _type == 'q':
+                _value = int(_value)
+            elif _type == 'd':
+                _value = float(_value)
+            elif _type == 's':
+                _value = str(_value)
+
+            _row.append((_name, _value))
+
+        for (_name, _value) in _row:
+            self.buffers[_name].append(_value)
+
+        self.num_frames += 1
+
+
+    def __len__(self):
+        return self.num_frames
+
+
+    def columns(self):
+        """ Return the collected data as a dictionary of NumPy arrays (numeric columns are not copied) """
+        # NumPy is only needed for export, so we only import it here.
+        import numpy as np
+
+        output = {}
+        for (_name, (_path, _type)) in self.column_info.items():
+            if _type == 's':
+                output[_name] = np.array(self.buffers[_name], dtype=str)
+            else:
+                output[_name] = np.frombuffer(self.buffers[_name], dtype=('f8' if _type == 'd' else 'i8'))
+
+        return output
+
+
+    def write_npz(self, filename):
+        """ Write the collected data to a (compressed) NumPy .npz archive, with one array per column """
+        import numpy as np
+
+        np.savez_compressed(filename, **self.columns())
+
+
+    def write_parquet(self, filename):
+        """ Write the collected data to a Parquet file. Requires pyarrow. """
+        import pyarrow
+        import pyarrow.parquet
+
+        pyarrow.parquet.write_table(pyarrow.table(self.columns()), filename)
+
+
+    def write(self, filename, file_format=None):
+        """
+        Write the collected data to a file. Returns the filename written to.
+
+        Args:
+        filename (str): File to write to.
+        file_format (str): 'parquet' or 'npz'. If not provided, this is determined from the file extension,
+            falling back to npz if the file extension is .parquet but pyarrow is not available.
+        """
+
+        if file_format is None:
+            if filename.endswith('.parquet'):
+                try:
+                    import pyarrow
+                    file_format = 'parquet'
+                except ImportError:
+                    logging.warning("pyarrow not available, writing NumPy .npz file instead.")
+                    file_format = 'npz'
+                    filename = filename[:-len('.parquet')] + '.npz'
+            else:
+                file_format = 'npz'
+
+        if file_format == 'parquet':
+            self.write_parquet(filename)
+        elif file_format == 'npz':
+            # NumPy adds the .npz extension if it is not already present.
+            if not filename.endswith('.npz'):
+                filename += '.npz'
+            self.write_npz(filename)
+        else:
+            raise ValueError(f"Unsupported export format: {file_format}")
+
+        logging.info(f"Wrote {self.num_frames} frames to {filename}")
+
+        return filename
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import numpy as np
+    from .benchmark import make_rs41_corpus, make_lms6_403_corpus
+    from ..sonde_types import new_decoder
+
+    # Setup Logging
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s: %(message)s", level=logging.INFO
+    )
+
+    def read_columns(filename):
+        """ Read the columns back from a file written by ColumnarExporter.write """
+        if filename.endswith('.parquet'):
+            import pyarrow.parquet
+            return {_name: np.array(_values) for (_name, _values) in pyarrow.parquet.read_table(filename).to_pydict().items()}
+
+        with np.load(filename) as _data:
+            return {_name: _data[_name] for _name in _data.files}
+
+    _corpora = {
+        'RS41': make_rs41_corpus(100),
+        'LMS6_403': make_lms6_403_corpus(100),
+    }
+
+    with tempfile.TemporaryDirectory() as _dir:
+        for (_sonde_type, _frames) in _corpora.items():
+            # A flight, and an empty export.
+            for _num_frames in [len(_frames), 0]:
+                _decoder = new_decoder(_sonde_type)
+                _exporter = ColumnarExporter(_sonde_type)
+                for _frame in _frames[:_num_frames]:
+                    _exporter.add_frame(_decoder.add_frame(_frame))
+
+                _expected = _exporter.columns()
+                assert len(_exporter) == _num_frames
+
+                # Parquet (or the .npz fallback, if pyarrow is not available), then .npz explicitly.
+                for _extension in ['.parquet', '.npz']:
+                    _filename = _exporter.write(os.path.join(_dir, f"{_sonde_type}_{_num_frames}{_extension}"))
+                    _columns = read_columns(_filename)
+
+                    assert list(_columns.keys()) == list(_expected.keys())
+                    for (_name, _values) in _expected.items():
+                        assert len(_columns[_name]) == _num_frames, (_filename, _name)
+                        if _values.dtype.kind == 'f':
+                            assert np.array_equal(_columns[_name], _values, equal_nan=True), (_filename, _name)
+                        else:
+                            assert np.array_equal(_columns[_name].astype(_values.dtype), _values), (_filename, _name)
+
+                    print(f"{_sonde_type}: {_num_frames} frames, {os.path.basename(_filename)} - PASS")
+
+        # The filename returned includes the extension added by NumPy.
+        assert os.path.exists(_exporter.write(os.path.join(_dir, "flight.dat"), file_format='npz'))
+
+    print("All tests passed!")
@@ -1,8 +1,11 @@
 #
 #   Position Coordinate Conversions
 #
-import datetime
+#   The _array functions accept NumPy arrays, for batch decoding. NumPy is imported within each of them,
+#   so that it is only required if they are used.
+#
 from math import atan2, sqrt, sin, cos, pi, degrees
+from .gnss_time import gps_to_utc
 
 
 # WGS84 constants
@@ -22,13 +25,16 @@ def ecef_to_wgs84(ecef_x_m, ecef_y_m, ecef_z_m):
 
     p = sqrt( ecef_x_m * ecef_x_m + ecef_y_m * ecef_y_m)
     t = atan2( ecef_z_m * WGS84_EARTH_a , p * WGS84_EARTH_b)
+    sin_t = sin(t)
+    cos_t = cos(t)
 
     phi = atan2( 
-        ecef_z_m + WGS84_EARTH_ee2 * WGS84_EARTH_b * sin(t)*sin(t)*sin(t),
-        p - WGS84_EARTH_e2 * WGS84_EARTH_a * cos(t)*cos(t)*cos(t)
+        ecef_z_m + WGS84_EARTH_ee2 * WGS84_EARTH_b * sin_t*sin_t*sin_t,
+        p - WGS84_EARTH_e2 * WGS84_EARTH_a * cos_t*cos_t*cos_t
     )
+    sin_phi = sin(phi)
 
-    R = WGS84_EARTH_a / sqrt( 1 - WGS84_EARTH_e2*sin(phi)*sin(phi))
+    R = WGS84_EARTH_a / sqrt( 1 - WGS84_EARTH_e2*sin_phi*sin_phi)
 
     alt = p / cos(phi) - R
     lat = phi * 180/pi
@@ -46,10 +52,15 @@ def ecef_velocity(lat, lon, ecef_vel_x, ecef_vel_y, ecef_vel_z):
     phi = lat * pi/180.0
     lam = lon * pi/180.0
 
+    sin_phi = sin(phi)
+    cos_phi = cos(phi)
+    sin_lam = sin(lam)
+    cos_lam = cos(lam)
+
     # Calculate out N/S, E/W, U/D speed vectors
-    vN = -1.0*ecef_vel_x*sin(phi)*cos(lam)  - ecef_vel_y*sin(phi)*sin(lam) + ecef_vel_z*cos(phi)
-    vE = -1.0*ecef_vel_x*sin(lam)           + ecef_vel_y*cos(lam)
-    vU = ecef_vel_x*cos(phi)*cos(lam)       + ecef_vel_y*cos(phi)*sin(lam) + ecef_vel_z*sin(phi)
+    vN = -1.0*ecef_vel_x*sin_phi*cos_lam  - ecef_vel_y*sin_phi*sin_lam + ecef_vel_z*cos_phi
+    vE = -1.0*ecef_vel_x*sin_lam          + ecef_vel_y*cos_lam
+    vU = ecef_vel_x*cos_phi*cos_lam       + ecef_vel_y*cos_phi*sin_lam + ecef_vel_z*sin_phi
 
     # Ground speed and Ascent Rate
     ground_speed = sqrt(vN*vN + vE*vE)
@@ -67,12 +78,122 @@ def ecef_velocity(lat, lon, ecef_vel_x, ecef_vel_y, ecef_vel_z):
     return (ground_speed, ascent_rate, wind_u, wind_v, heading)
 
 
-def gps_weeksecondstoutc(gpsweek, gpsseconds, leapseconds=0):
-    """ Convert time in GPS time (GPS Week, seconds-of-week) to a UTC timestamp """
-    epoch = datetime.datetime.strptime("1980-01-06 00:00:00","%Y-%m-%d %H:%M:%S")
-    elapsed = datetime.timedelta(days=(gpsweek*7),seconds=(gpsseconds))
-    timestamp = epoch + elapsed - datetime.timedelta(seconds=leapseconds)
-    return timestamp
+#
+#   Array versions of the above, for converting many positions at once (e.g. a whole flight).
+#   These accept NumPy arrays (or anything NumPy can convert to an array), and return NumPy arrays.
+#
+
+def ecef_to_wgs84_array(ecef_x_m, ecef_y_m, ecef_z_m):
+    """
+    Convert arrays of ECEF coordinates (m) to lat/lon/alt arrays in a WGS84 datum.
+    Array version of ecef_to_wgs84.
+    """
+    (lat, lon, alt, _sin_phi, _cos_phi, _sin_lam, _cos_lam) = _ecef_to_wgs84_array(ecef_x_m, ecef_y_m, ecef_z_m)
+
+    return (lat, lon, alt)
+
+
+def _ecef_to_wgs84_array(ecef_x_m, ecef_y_m, ecef_z_m):
+    """
+    Convert arrays of ECEF coordinates (m) to lat/lon/alt, also returning the sin/cos of the latitude
+    and longitude, so they can be re-used for velocity calculations.
+    """
+    import numpy as np
+
+    x = np.asarray(ecef_x_m, dtype=np.float64)
+    y = np.asarray(ecef_y_m, dtype=np.float64)
+    z = np.asarray(ecef_z_m, dtype=np.float64)
+
+    p = np.sqrt(x*x + y*y)
+    t = np.arctan2(z * WGS84_EARTH_a, p * WGS84_EARTH_b)
+    sin_t = np.sin(t)
+    cos_t = np.cos(t)
+
+    phi = np.arctan2(
+        z + WGS84_EARTH_ee2 * WGS84_EARTH_b * sin_t*sin_t*sin_t,
+        p - WGS84_EARTH_e2 * WGS84_EARTH_a * cos_t*cos_t*cos_t
+    )
+    sin_phi = np.sin(phi)
+    cos_phi = np.cos(phi)
+
+    # The sin/cos of the longitude can be calculated directly from the x/y coordinates.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sin_lam = np.where(p > 0, y / p, 0.0)
+        cos_lam = np.where(p > 0, x / p, 1.0)
+
+    R = WGS84_EARTH_a / np.sqrt(1 - WGS84_EARTH_e2*sin_phi*sin_phi)
+
+    alt = p / cos_phi - R
+    lat = np.degrees(phi)
+    lon = np.degrees(np.arctan2(y, x))
+
+    return (lat, lon, alt, sin_phi, cos_phi, sin_lam, cos_lam)
+
+
+def _enu_velocity_array(sin_phi, cos_phi, sin_lam, cos_lam, ecef_vel_x, ecef_vel_y, ecef_vel_z):
+    """
+    Convert arrays of ECEF velocities (m/s) to ground speed, ascent rate, u/v wind and heading,
+    given pre-calculated sin/cos of the latitude and longitude.
+    """
+    import numpy as np
+
+    vx = np.asarray(ecef_vel_x, dtype=np.float64)
+    vy = np.asarray(ecef_vel_y, dtype=np.float64)
+    vz = np.asarray(ecef_vel_z, dtype=np.float64)
+
+    # Calculate out N/S, E/W, U/D speed vectors
+    vN = -1.0*vx*sin_phi*cos_lam  - vy*sin_phi*sin_lam + vz*cos_phi
+    vE = -1.0*vx*sin_lam          + vy*cos_lam
+    vU = vx*cos_phi*cos_lam       + vy*cos_phi*sin_lam + vz*sin_phi
+
+    # Ground speed and Ascent Rate
+    ground_speed = np.sqrt(vN*vN + vE*vE)
+    ascent_rate = vU
+
+    # Heading of travel
+    heading = np.mod(np.degrees(np.arctan2(vE, vN)), 360.0)
+
+    return (ground_speed, ascent_rate, vE, vN, heading)
+
+
+def ecef_velocity_array(lat, lon, ecef_vel_x, ecef_vel_y, ecef_vel_z):
+    """
+    Convert arrays of ECEF Velocities (m/s) to Horizontal / Vertical speeds, and direction of travel.
+    Array version of ecef_velocity. Requires lat/lon arrays (processed using ecef_to_wgs84_array) as an input.
+    """
+    import numpy as np
+
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+
+    return _enu_velocity_array(np.sin(phi), np.cos(phi), np.sin(lam), np.cos(lam), ecef_vel_x, ecef_vel_y, ecef_vel_z)
+
+
+def ecef_to_wgs84_velocity_array(ecef_x_m, ecef_y_m, ecef_z_m, ecef_vel_x, ecef_vel_y, ecef_vel_z):
+    """
+    Convert arrays of ECEF coordinates (m) and velocities (m/s) to WGS84 lat/lon/alt, and
+    horizontal / vertical speeds and direction of travel, in one pass.
+    This is equivalent to ecef_to_wgs84_array followed by ecef_velocity_array, but re-uses
+    the trigonometric terms between the two.
+
+    Returns a tuple of arrays: (lat, lon, alt, ground_speed, ascent_rate, wind_u, wind_v, heading)
+    """
+
+    (lat, lon, alt, sin_phi, cos_phi, sin_lam, cos_lam) = _ecef_to_wgs84_array(ecef_x_m, ecef_y_m, ecef_z_m)
+
+    (ground_speed, ascent_rate, wind_u, wind_v, heading) = _enu_velocity_array(
+        sin_phi, cos_phi, sin_lam, cos_lam, ecef_vel_x, ecef_vel_y, ecef_vel_z
+    )
+
+    return (lat, lon, alt, ground_speed, ascent_rate, wind_u, wind_v, heading)
+
+
+def gps_weeksecondstoutc(gpsweek, gpsseconds, leapseconds=None):
+    """
+    Convert time in GPS time (GPS Week, seconds-of-week) to a UTC timestamp
+    If leapseconds is not provided, it is looked up from the leap second table in gnss_time.
+    """
+    return gps_to_utc(gpsweek, gpsseconds, leapseconds=leapseconds)
 
 
 if __name__ == "__main__":
@@ -95,3 +216,27 @@ if __name__ == "__main__":
             _test_results += "FAIL"
         
         print(_test_results)
+
+    # Array versions should produce the same results as the scalar versions.
+    try:
+        import numpy as np
+
+        _x = np.array([_test[0] for _test in tests])
+        _y = np.array([_test[1] for _test in tests])
+        _z = np.array([_test[2] for _test in tests])
+        _vel = np.array([[-0.12, 0.22, -0.03]]*len(tests))
+
+        (lat, lon, alt, ground_speed, ascent_rate, wind_u, wind_v, heading) = ecef_to_wgs84_velocity_array(
+            _x, _y, _z, _vel[:,0], _vel[:,1], _vel[:,2]
+        )
+
+        for _i in range(len(tests)):
+            _scalar = ecef_to_wgs84(_x[_i], _y[_i], _z[_i])
+            _scalar_vel = ecef_velocity(_scalar[0], _scalar[1], _vel[_i,0], _vel[_i,1], _vel[_i,2])
+            assert np.allclose(_scalar, (lat[_i], lon[_i], alt[_i]))
+            assert np.allclose(_scalar_vel, (ground_speed[_i], ascent_rate[_i], wind_u[_i], wind_v[_i], heading[_i]))
+
+        print("Array conversions: PASS")
+
+    except ImportError:
+        print("NumPy not available, skipping array conversion tests.")
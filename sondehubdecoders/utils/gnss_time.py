@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+#
+#   GPS Time Conversions
+#
+#   Conversion of GPS time (GPS week, seconds-of-week) to UTC, using a built-in leap-second table.
+#   A vectorized version is provided for batch decoding, which produces NumPy datetime64 arrays. As NumPy is an
+#   optional dependency, it is imported by the functions that use it, rather than here.
+#
+import datetime
+from bisect import bisect_right
+
+
+# GPS Epoch (1980-01-06 00:00:00 UTC)
+GPS_EPOCH = datetime.datetime(1980, 1, 6)
+
+# Leap seconds (GPS - UTC), as a list of [UTC date the offset came into effect, offset in seconds]
+# Refer https://www.ietf.org/timezones/data/leap-seconds.list
+# This needs to be updated if/when a new leap second is announced.
+GPS_LEAP_SECONDS = [
+    [datetime.datetime(1981, 7, 1), 1],
+    [datetime.datetime(1982, 7, 1), 2],
+    [datetime.datetime(1983, 7, 1), 3],
+    [datetime.datetime(1985, 7, 1), 4],
+    [datetime.datetime(1988, 1, 1), 5],
+    [datetime.datetime(1990, 1, 1), 6],
+    [datetime.datetime(1991, 1, 1), 7],
+    [datetime.datetime(1992, 7, 1), 8],
+    [datetime.datetime(1993, 7, 1), 9],
+    [datetime.datetime(1994, 7, 1), 10],
+    [datetime.datetime(1996, 1, 1), 11],
+    [datetime.datetime(1997, 7, 1), 12],
+    [datetime.datetime(1999, 1, 1), 13],
+    [datetime.datetime(2006, 1, 1), 14],
+    [datetime.datetime(2009, 1, 1), 15],
+    [datetime.datetime(2012, 7, 1), 16],
+    [datetime.datetime(2015, 7, 1), 17],
+    [datetime.datetime(2017, 1, 1), 18],
+]
+
+GPS_SECONDS_PER_WEEK = 7*86400
+
+# Times (in GPS seconds since the GPS epoch) at which each leap second offset comes into effect.
+GPS_LEAP_SECOND_THRESHOLDS = [
+    (_utc - GPS_EPOCH).total_seconds() + _offset for (_utc, _offset) in GPS_LEAP_SECONDS
+]
+GPS_LEAP_SECOND_OFFSETS = [0] + [_offset for (_utc, _offset) in GPS_LEAP_SECONDS]
+
+# Pre-built timedeltas for each leap second offset.
+GPS_LEAP_SECOND_TIMEDELTAS = [datetime.timedelta(seconds=_offset) for _offset in GPS_LEAP_SECOND_OFFSETS]
+
+
+def gps_leap_seconds(gpsweek, gpsseconds):
+    """ Look up the GPS - UTC offset (leap seconds) applicable at a given GPS time """
+
+    return GPS_LEAP_SECOND_OFFSETS[bisect_right(GPS_LEAP_SECOND_THRESHOLDS, gpsweek*GPS_SECONDS_PER_WEEK + gpsseconds)]
+
+
+def gps_to_utc(gpsweek, gpsseconds, leapseconds=None):
+    """
+    Convert time in GPS time (GPS Week, seconds-of-week) to a UTC timestamp (naive datetime).
+
+    Args:
+    gpsweek (int): GPS Week number (unwrapped)
+    gpsseconds (float): Seconds within the GPS week.
+    leapseconds (int): GPS - UTC offset to apply. If None, this is looked up from the leap second table.
+    """
+
+    if leapseconds is None:
+        _leap = GPS_LEAP_SECOND_TIMEDELTAS[bisect_right(GPS_LEAP_SECOND_THRESHOLDS, gpsweek*GPS_SECONDS_PER_WEEK + gpsseconds)]
+    else:
+        _leap = datetime.timedelta(seconds=leapseconds)
+
+    return GPS_EPOCH + datetime.timedelta(days=(gpsweek*7), seconds=gpsseconds) - _leap
+
+
+def gps_to_utc_array(gpsweek, gpsseconds, leapseconds=None):
+    """
+    Vectorized version of gps_to_utc, accepting NumPy arrays of GPS week and seconds-of-week.
+    Returns a NumPy datetime64[us] array, with NaT where the seconds-of-week are not finite (e.g. NaN for missing data).
+    """
+    import numpy as np
+
+    _gps_seconds = np.asarray(gpsweek, dtype=np.int64)*GPS_SECONDS_PER_WEEK + np.asarray(gpsseconds, dtype=np.float64)
+
+    if leapseconds is None:
+        _leap = np.asarray(GPS_LEAP_SECOND_OFFSETS)[np.searchsorted(GPS_LEAP_SECOND_THRESHOLDS, _gps_seconds, side='right')]
+    else:
+        _leap = leapseconds
+
+    # Mask out non-finite values before converting to integer microseconds, as they have no integer equivalent.
+    _elapsed = _gps_seconds - _leap
+    _valid = np.isfinite(_elapsed)
+    _elapsed_us = np.round(np.where(_valid, _elapsed, 0)*1e6).astype(np.int64)
+
+    return np.where(_valid, np.datetime64(GPS_EPOCH, 'us') + _elapsed_us.astype('timedelta64[us]'), np.datetime64('NaT', 'us'))
+
+
+def utc_isoformat_array(timestamps):
+    """
+    Format a NumPy datetime64 array as ISO-8601 strings, in the same format as datetime.isoformat()
+    (i.e. the fractional seconds are omitted when they are zero).
+    """
+    import numpy as np
+
+    _timestamps = np.asarray(timestamps).astype('datetime64[us]')
+    _whole_seconds = (_timestamps.astype(np.int64) % 1000000) == 0
+
+    return np.where(
+        _whole_seconds,
+        np.datetime_as_string(_timestamps, unit='s'),
+        np.datetime_as_string(_timestamps, unit='us'),
+    )
+
+
+if __name__ == "__main__":
+
+    tests = [
+        # GPS week, seconds-of-week, expected UTC
+        [0, 0, datetime.datetime(1980, 1, 6)],
+        [2000, 0, datetime.datetime(2018, 5, 5, 23, 59, 42)],
+        [2210, 522693.001, datetime.datetime(2022, 5, 21, 1, 11, 15, 1000)],
+        # Either side of the 2017-01-01 leap second
+        [1930, 16.5, datetime.datetime(2016, 12, 31, 23, 59, 59, 500000)],
+        [1930, 19, datetime.datetime(2017, 1, 1, 0, 0, 1)],
+    ]
+
+    for (_week, _seconds, _expected) in tests:
+        _result = gps_to_utc(_week, _seconds)
+        print(f"In: ({_week}, {_seconds})  Out: {_result.isoformat()}, Expected: {_expected.isoformat()}  - {'PASS' if _result == _expected else 'FAIL'}")
+
+    try:
+        import numpy as np
+
+        _weeks = np.array([_test[0] for _test in tests])
+        _seconds = np.array([_test[1] for _test in tests])
+        _results = gps_to_utc_array(_weeks, _seconds)
+        _strings = utc_isoformat_array(_results)
+
+        for _i, _test in enumerate(tests):
+            assert _results[_i] == np.datetime64(_test[2], 'us')
+            assert _strings[_i] == _test[2].isoformat()
+
+        # Missing seconds-of-week should give NaT, rather than an arbitrary timestamp.
+        _results = gps_to_utc_array(_weeks[:2], np.array([np.nan, _seconds[1]]))
+        assert np.isnat(_results[0]) and _results[1] == np.datetime64(tests[1][2], 'us')
+
+        print("Array conversions: PASS")
+
+    except ImportError:
+        print("NumPy not available, skipping array conversion tests.")
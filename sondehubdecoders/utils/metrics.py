@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+#
+#   Decoder Metrics
+#
+#   Counters and latency histograms for the decoders and stateful decoder classes, which can be
+#   exported in the Prometheus text exposition format.
+#
+#   Metrics are optional - a DecoderMetrics object is passed to the decoders (e.g. decode(frame, metrics=_metrics),
+#   RS41(metrics=_metrics), SondeRegistry(metrics=_metrics)), and when none is provided, the only cost
+#   in the decoders is a check for None.
+#
+import threading
+from bisect import bisect_left
+
+
+# Prefix for all exported metric names.
+METRIC_PREFIX = "sondehubdecoders_"
+
+# Latency histogram buckets (seconds) for decoding stages.
+METRIC_STAGE_BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 1e-2)
+
+# Histogram buckets (seconds) for the time taken to receive a complete set of RS41 subframe data.
+# A complete subframe takes (max_subframe + 1) frames, i.e. 51 seconds with no frame loss.
+METRIC_SUBFRAME_BUCKETS = (51, 60, 75, 90, 120, 180, 300, 600, 1800)
+
+# Known metrics, as name -> [type, description, histogram buckets]
+METRICS = {
+    'frames_total':                 ['counter', "Frames passed to decode(), by sonde type and result (ok, invalid, error)"],
+    'block_crc_failures_total':     ['counter', "Blocks which failed their CRC check, by sonde type and block"],
+    'unknown_blocks_total':         ['counter', "Blocks of an unknown type, by sonde type and block type"],
+    'block_length_errors_total':    ['counter', "Blocks with an unexpected length, by sonde type and block"],
+    'block_decode_errors_total':    ['counter', "Blocks which raised an error while being decoded, by sonde type and block"],
+    'ecc_frames_total':             ['counter', "Frames checked using their error correction data, by sonde type and result (clean, corrected, uncorrectable)"],
+    'add_frame_errors_total':       ['counter', "Errors caught while processing a frame in a stateful decoder, by sonde type and error"],
+    'stage_seconds':                ['histogram', "Time spent in each decoding stage, by sonde type and stage", METRIC_STAGE_BUCKETS],
+    'subframe_complete_seconds':    ['histogram', "Time from the first frame of a radiosonde until its subframe data was complete", METRIC_SUBFRAME_BUCKETS],
+}
+
+
+def _format_labels(labels):
+    """ Format a label tuple ((name, value), ...) in Prometheus style, e.g. {sonde_type="RS41",stage="decode"} """
+
+    if not labels:
+        return ""
+
+    _labels = []
+    for (_name, _value) in labels:
+        _value = str(_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        _labels.append(f'{_name}="{_value}"')
+
+    return "{" + ",".join(_labels) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class DecoderMetrics(object):
+    """
+    Thread-safe store of counters and histograms, keyed by metric name and labels.
+    """
+
+    def __init__(self, metrics=METRICS):
+        """
+        Args:
+        metrics (dict): Metric definitions, in the same format as METRICS.
+        """
+
+        self.metrics = metrics
+
+        # (name, labels) -> count
+        self.counters = {}
+        # (name, labels) -> [bucket counts (non-cumulative, with a final +Inf bucket), sum, count]
+        self.histograms = {}
+
+        self.lock = threading.Lock()
+
+
+    def inc(self, name, value=1, **labels):
+        """ Increment a counter """
+
+        _key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            self.counters[_key] = self.counters.get(_key, 0) + value
+
+
+    def observe(self, name, value, **labels):
+        """ Add an observation (e.g. a duration in seconds) to a histogram """
+
+        _key = (name, tuple(sorted(labels.items())))
+        _buckets = self.metrics[name][2]
+
+        with self.lock:
+            _histogram = self.histograms.get(_key)
+
+            if _histogram is None:
+                _histogram = [[0] * (len(_buckets) + 1), 0.0, 0]
+                self.histograms[_key] = _histogram
+
+            # Buckets are upper bounds (inclusive)
+            _histogram[0][bisect_left(_buckets, value)] += 1
+            _histogram[1] += value
+            _histogram[2] += 1
+
+
+    def get(self, name, **labels):
+        """ Get the value of a counter (or the number of observations in a histogram), returning 0 if it has not been set """
+
+        _key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            if _key in self.histograms:
+                return self.histograms[_key][2]
+
+            return self.counters.get(_key, 0)
+
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+
+    def to_prometheus(self):
+        """ Export all metrics in the Prometheus text exposition format """
+
+        with self.lock:
+            _counters = dict(self.counters)
+            _histograms = {_key: ([*_value[0]], _value[1], _value[2]) for (_key, _value) in self.histograms.items()}
+
+        _lines = []
+
+        for (_name, _info) in self.metrics.items():
+            _full_name = METRIC_PREFIX + _name
+
+            if _info[0] == 'counter':
+                _samples = sorted((_labels, _value) for ((_metric, _labels), _value) in _counters.items() if _metric == _name)
+            else:
+                _samples = sorted((_labels, _value) for ((_metric, _labels), _value) in _histograms.items() if _metric == _name)
+
+            if not _samples:
+                continue
+
+            _lines.append(f"# HELP {_full_name} {_info[1]}")
+            _lines.append(f"# TYPE {_full_name} {_info[0]}")
+
+            for (_labels, _value) in _samples:
+                if _info[0] == 'counter':
+                    _lines.append(f"{_full_name}{_format_labels(_labels)} {_format_value(_value)}")
+                    continue
+
+                (_bucket_counts, _sum, _count) = _value
+                _cumulative = 0
+                for (_bound, _bucket_count) in zip((*_info[2], float('inf')), _bucket_counts):
+                    _cumulative += _bucket_count
+                    _lines.append(f"{_full_name}_bucket{_format_labels(_labels + (('le', _format_value(_bound)),))} {_cumulative}")
+
+                _lines.append(f"{_full_name}_sum{_format_labels(_labels)} {_format_value(_sum)}")
+                _lines.append(f"{_full_name}_count{_format_labels(_labels)} {_count}")
+
+        return "\n".join(_lines) + "\n" if _lines else ""
+
+
+if __name__ == "__main__":
+    _metrics = DecoderMetrics()
+
+    _metrics.inc('frames_total', sonde_type='RS41', result='ok')
+    _metrics.inc('frames_total', sonde_type='RS41', result='ok')
+    _metrics.inc('block_crc_failures_total', sonde_type='RS41', block='GPS Position')
+    _metrics.observe('stage_seconds', 3e-5, sonde_type='RS41', stage='decode')
+    _metrics.observe('stage_seconds', 1.0, sonde_type='RS41', stage='decode')
+
+    assert(_metrics.get('frames_total', sonde_type='RS41', result='ok') == 2)
+    assert(_metrics.get('frames_total', sonde_type='RS41', result='invalid') == 0)
+    assert(_metrics.get('stage_seconds', sonde_type='RS41', stage='decode') == 2)
+
+    _text = _metrics.to_prometheus()
+    print(_text)
+
+    assert('sondehubdecoders_frames_total{result="ok",sonde_type="RS41"} 2' in _text)
+    assert('sondehubdecoders_stage_seconds_bucket{sonde_type="RS41",stage="decode",le="5e-05"} 1' in _text)
+    assert('sondehubdecoders_stage_seconds_bucket{sonde_type="RS41",stage="decode",le="+Inf"} 2' in _text)
+    assert('sondehubdecoders_stage_seconds_count{sonde_type="RS41",stage="decode"} 2' in _text)
+
+    print("All tests passed!")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+#
+#   Parallel Multi-File Decoding
+#
+#   Decodes raw data files (e.g. a season of station archives) across a pool of worker processes.
+#   Frames are read in the main process, and sharded between workers by radiosonde serial number, so
+#   that the stateful decoder for each radiosonde only ever lives in one worker. Each frame is tagged
+#   with a sequence number, and the output lines from all the workers are merged back into input order.
+#
+import json
+import logging
+import os
+import queue
+import threading
+import zlib
+from ..registry import SondeRegistry, SONDE_REGISTRY_TYPES
+from .autorx_log import AUTORX_LOG_FORMATS, format_log_line
+from .read_rs_raw import iter_raw_rs41, iter_raw_lms6_403
+
+
+# Per-sonde-type raw file readers.
+PARALLEL_SONDE_TYPES = {
+    'RS41': {
+        'reader': iter_raw_rs41,
+    },
+    'LMS6_403': {
+        'reader': iter_raw_lms6_403,
+    },
+}
+
+# Number of frames sent to (and results returned from) a worker at a time.
+PARALLEL_BATCH_SIZE = 256
+
+# Maximum number of frames read before any partial batches are sent to the workers. Output lines are merged back into
+# input order, so a partial batch held back by the reader also holds back the output of every later frame.
+PARALLEL_FLUSH_FRAMES = 4096
+
+# Maximum number of batches queued up for each worker.
+PARALLEL_QUEUE_LEN = 16
+
+# How often (in seconds) to check that the workers are still running, while waiting on a queue.
+PARALLEL_POLL_INTERVAL = 1.0
+
+
+def expand_inputs(paths):
+    """
+    Expand a list of files and/or directories into a sorted list of files.
+    Directories are searched recursively, skipping hidden files.
+    """
+
+    output = []
+
+    for _path in paths:
+        if os.path.isdir(_path):
+            _files = []
+            for (_dir, _subdirs, _filenames) in os.walk(_path):
+                _subdirs[:] = [_d for _d in _subdirs if not _d.startswith('.')]
+                _files.extend(os.path.join(_dir, _f) for _f in _filenames if not _f.startswith('.'))
+            output.extend(sorted(_files))
+        else:
+            output.append(_path)
+
+    return output
+
+
+def shard_for_serial(serial, num_shards):
+    """ Select a shard (worker) for a serial number. This must be stable across processes, so we can't use hash() """
+
+    return zlib.crc32(str(serial).encode()) % num_shards
+
+
+def frame_to_json(frame):
+    """
+    Convert a decoded frame into a dictionary suitable for JSON output.
+    Where a frame has SondeHub 'common' fields, those are used (plus the temperature, if available).
+    Otherwise, all the scalar fields of the frame are used.
+    """
+
+    if 'blocks' in frame:
+        output = dict(frame['common'])
+
+        if ('Measurements' in frame['blocks']) and ('temperature' in frame['blocks']['Measurements']):
+            output['temp'] = frame['blocks']['Measurements']['temperature']
+
+        return output
+
+    output = {_key: _value for (_key, _value) in frame.items() if isinstance(_value, (int, float, str))}
+    output.update(frame.get('common', {}))
+
+    return output
+
+
+def format_frame(sonde_type, frame, output_format):
+    """ Format a decoded frame as a line of output (CSV or NDJSON), or None if it could not be formatted. """
+
+    if frame is None:
+        return None
+
+    try:
+        if output_format == 'csv':
+            return format_log_line(frame, sonde_type)
+        else:
+            return json.dumps(frame_to_json(frame))
+
+    except Exception as e:
+        logging.debug(f"Could not format frame: {str(e)}")
+        return None
+
+
+def decode_shard(sonde_type, output_format, input_queue, output_queue):
+    """
+    Worker process. Reads batches of (sequence number, serial, frame) from input_queue, decodes them using
+    a stateful decoder per serial number, and writes batches of (sequence number, output line) to output_queue.
+    A batch of None indicates the end of the input.
+    """
+
+    # We see every frame from a given serial, so sessions never need to be expired.
+    _registry = SondeRegistry(ttl=float('inf'), max_sessions=float('inf'))
+
+    while True:
+        _batch = input_queue.get()
+
+        if _batch is None:
+            break
+
+        _results = []
+        for (_seq, _serial, _raw) in _batch:
+            _session = _registry.get_session(sonde_type, _serial, create=True)
+            _results.append((_seq, format_frame(sonde_type, _session.add_frame(_raw), output_format)))
+
+        output_queue.put(_results)
+
+    output_queue.put(None)
+
+
+def _put(output_queue, item, stop):
+    """ Put an item on a bounded queue, waiting for space until stop is set. Returns False if stopped. """
+
+    while not stop.is_set():
+        try:
+            output_queue.put(item, timeout=PARALLEL_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def _flush_batches(batches, input_queues, stop):
+    """ Send any partial batches to their workers, emptying them. Returns False if stopped. """
+
+    for (_shard, _batch) in enumerate(batches):
+        if _batch:
+            if not _put(input_queues[_shard], _batch, stop):
+                return False
+            batches[_shard] = []
+
+    return True
+
+
+def _feed_workers(sonde_type, filenames, input_queues, output_queue, stop):
+    """
+    Read frames from each file in turn, and send them to the worker for their serial number.
+    Frames without a valid serial number are reported directly to the output queue.
+    Partial batches are sent at the end of each file, and every PARALLEL_FLUSH_FRAMES frames, so that
+    a radiosonde with few frames doesn't hold back the output.
+    Stops early if stop (a threading.Event) is set, e.g. because a worker has died.
+    """
+
+    _peek_serial = SONDE_REGISTRY_TYPES[sonde_type]['peek_serial']
+    _batches = [[] for _q in input_queues]
+    _rejected = []
+    _seq = 0
+
+    for _filename in filenames:
+        logging.info(f"Reading {_filename}")
+
+        try:
+            for _raw in PARALLEL_SONDE_TYPES[sonde_type]['reader'](_filename):
+                _serial = _peek_serial(_raw)
+
+                if _serial is None:
+                    _rejected.append((_seq, None))
+                else:
+                    _shard = shard_for_serial(_serial, len(input_queues))
+                    _batches[_shard].append((_seq, _serial, _raw))
+
+                    if len(_batches[_shard]) >= PARALLEL_BATCH_SIZE:
+                        if not _put(input_queues[_shard], _batches[_shard], stop):
+                            return
+                        _batches[_shard] = []
+
+                _seq += 1
+
+                if (_seq % PARALLEL_FLUSH_FRAMES) == 0:
+                    output_queue.put(_rejected)
+                    _rejected = []
+
+                    if not _flush_batches(_batches, input_queues, stop):
+                        return
+
+                elif len(_rejected) >= PARALLEL_BATCH_SIZE:
+                    output_queue.put(_rejected)
+                    _rejected = []
+
+        except Exception as e:
+            logging.exception(f"Error reading {_filename}", exc_info=e)
+
+        output_queue.put(_rejected)
+        _rejected = []
+
+        if not _flush_batches(_batches, input_queues, stop):
+            return
+
+    # Indicate we have finished reporting rejected frames.
+    output_queue.put(None)
+
+    for _queue in input_queues:
+        if not _put(_queue, None, stop):
+            return
+
+
+def decode_files(filenames, sonde_type='RS41', output_format='csv', jobs=None):
+    """
+    Decode frames from many raw data files across a pool of worker processes.
+
+    Args:
+    filenames (list): Files (and/or directories) to read. Frames are numbered in the order the files are given.
+    sonde_type (str): Radiosonde type (RS41, LMS6_403)
+    output_format (str): 'csv' (auto_rx log format) or 'ndjson' (one JSON object per line)
+    jobs (int): Number of worker processes. Defaults to the number of CPUs.
+
+    Yields output lines, in the same order as the frames appear in the input files.
+    Frames which could not be decoded are skipped.
+
+    Raises a RuntimeError if a worker process exits before it has finished (e.g. if it crashes, or is killed).
+    """
+    # multiprocessing is only needed here (and is slow to import), so we only import it when decoding files.
+    import multiprocessing
+
+    if sonde_type not in PARALLEL_SONDE_TYPES:
+        raise ValueError(f"Unsupported sonde type: {sonde_type}")
+
+    if output_format not in ('csv', 'ndjson'):
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    _filenames = expand_inputs(filenames)
+    _jobs = jobs if jobs else os.cpu_count()
+
+    _output_queue = multiprocessing.Queue()
+    _input_queues = [multiprocessing.Queue(PARALLEL_QUEUE_LEN) for _i in range(_jobs)]
+
+    _workers = [
+        multiprocessing.Process(target=decode_shard, args=(sonde_type, output_format, _input_queue, _output_queue), daemon=True)
+        for _input_queue in _input_queues
+    ]
+
+    for _worker in _workers:
+        _worker.start()
+
+    # Feed the workers from a thread, so we can merge their output as it arrives.
+    _stop = threading.Event()
+    _feeder = threading.Thread(target=_feed_workers, args=(sonde_type, _filenames, _input_queues, _output_queue, _stop), daemon=True)
+    _feeder.start()
+
+    # Merge results back into sequence order. Each worker returns results in sequence order,
+    # so we only need to hold on to results until all earlier frames have been returned.
+    _pending = {}
+    _next_seq = 0
+    # The workers and the feeder thread each send None once they have finished.
+    _producers_running = len(_workers) + 1
+
+    try:
+        while _producers_running:
+            try:
+                _results = _output_queue.get(timeout=PARALLEL_POLL_INTERVAL)
+            except queue.Empty:
+                # A worker which exits normally sends None first, so any other exit means its results will never arrive.
+                for _worker in _workers:
+                    if _worker.exitcode not in (None, 0):
+                        raise RuntimeError(f"Worker process {_worker.pid} exited unexpectedly (exit code {_worker.exitcode}).")
+                continue
+
+            if _results is None:
+                _producers_running -= 1
+                continue
+
+            _pending.update(_results)
+
+            while _next_seq in _pending:
+                _line = _pending.pop(_next_seq)
+                _next_seq += 1
+
+                if _line is not None:
+                    yield _line
+
+    finally:
+        _stop.set()
+        _feeder.join(timeout=1)
+        for _worker in _workers:
+            if _worker.is_alive():
+                _worker.terminate()
+            _worker.join()
+
+        # If we stopped early, data may be left in the queues with nothing to read it, which would otherwise
+        # block this process from exiting.
+        for _queue in _input_queues + [_output_queue]:
+            _queue.cancel_join_thread()
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    # Command line arguments.
+    parser = argparse.ArgumentParser(description="Decode many raw data files in parallel.")
+    parser.add_argument(
+        "inputs", nargs="+", help="Files and/or directories to decode.",
+    )
+    parser.add_argument(
+        "-t", "--type", help="Radiosonde type (RS41, LMS6_403)", default="RS41"
+    )
+    parser.add_argument(
+        "-j", "--jobs", help="Number of worker processes (default: number of CPUs)", type=int, default=None
+    )
+    parser.add_argument(
+        "--format", help="Output format (csv, ndjson)", choices=["csv", "ndjson"], default="csv"
+    )
+    parser.add_argument(
+        "-o", "--output", help="Output file (default: stdout)", default=None
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Enable debug output.", action="store_true"
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        _log_level = logging.DEBUG
+    else:
+        _log_level = logging.INFO
+
+    # Setup Logging
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s: %(message)s", level=_log_level
+    )
+
+    _output = open(args.output, 'w') if args.output else sys.stdout
+
+    try:
+        if args.format == 'csv':
+            _output.write(AUTORX_LOG_FORMATS[args.type].header + "\n")
+
+        for _line in decode_files(args.inputs, sonde_type=args.type, output_format=args.format, jobs=args.jobs):
+            _output.write(_line + "\n")
+    finally:
+        if args.output:
+            _output.close()
@@ -3,63 +3,218 @@
 #   Helper script to read and process raw hex output from a RS decoder.
 #
 import codecs
+import gzip
 import logging
+import lzma
+import time
 
 
-def read_raw_rs41(filename):
+# Magic bytes used to detect compressed files.
+RAW_FILE_COMPRESSION = {
+    b"\x1f\x8b": gzip.open,
+    b"\xfd7zXZ\x00": lzma.open,
+}
+
+# Size of each read from the file, in characters.
+RAW_FILE_CHUNK_SIZE = 1024*1024
+
+
+def raw_file_compression(filename):
     """
-    Attempt to read a file containing lines of hexadecimal data, suffixed with CRC information (e.g. [OK] or [NO])
-    
-    Returns a list of bytes.
+    Detect whether a file is compressed (by its magic bytes), returning the function used to open it,
+    or None if the file is not compressed.
     """
 
-    # Read in entire file contents
-    _f = open(filename, 'r')
-    _data = _f.read()
-    _f.close()
+    with open(filename, 'rb') as _f:
+        _magic = _f.read(6)
 
-    output = []
+    for (_prefix, _open_func) in RAW_FILE_COMPRESSION.items():
+        if _magic.startswith(_prefix):
+            return _open_func
 
-    # Work through each line
-    for _line in _data.split('\n'):
+    return None
 
-        if '[OK]' in _line:
-            _hex = _line.split(' ')[0]
-            _bytes = codecs.decode(_hex, 'hex')
 
-            output.append(_bytes)
+def open_raw_file(filename):
+    """
+    Open a raw data file for reading as text, transparently decompressing gzip or xz compressed files.
+    """
 
-    return output
+    _open_func = raw_file_compression(filename)
 
+    if _open_func is not None:
+        return _open_func(filename, 'rt')
 
-def read_raw_lms6_403(filename):
+    return open(filename, 'r')
+
+
+def iter_lines(filename, follow=False, poll_interval=0.5, follow_timeout=None, chunk_size=RAW_FILE_CHUNK_SIZE):
     """
-    Attempt to read a file containing lines of hexadecimal data, suffixed with CRC information (e.g. [OK] or [NO])
-    
-    Returns a list of bytes.
+    Read lines from a (possibly compressed) file, in chunks, without reading the entire file into memory.
+
+    Args:
+    filename (str): File to read.
+    follow (bool): If set, once the end of the file is reached, wait for more data to be written to the file
+        (e.g. a raw log file which is being written by auto_rx), rather than stopping. Only complete lines are returned.
+    poll_interval (float): Time to wait between checks for new data, in follow mode.
+    follow_timeout (float): In follow mode, stop once no new data has been written for this many seconds. If None, continue forever.
+    chunk_size (int): Number of characters to read at a time.
     """
 
-    # Read in entire file contents
-    _f = open(filename, 'r')
-    _data = _f.read()
-    _f.close()
+    if follow and (raw_file_compression(filename) is not None):
+        raise ValueError("Follow mode is not supported for compressed files.")
+
+    _f = open_raw_file(filename)
+
+    try:
+        _partial = ''
+        _last_data_time = time.time()
+
+        while True:
+            _chunk = _f.read(chunk_size)
+
+            if _chunk:
+                _last_data_time = time.time()
+                _lines = (_partial + _chunk).split('\n')
+                # The last entry is either empty, or an incomplete line.
+                _partial = _lines.pop()
+
+                for _line in _lines:
+                    yield _line
+
+            elif follow:
+                if (follow_timeout is not None) and (time.time() - _last_data_time > follow_timeout):
+                    break
+
+                time.sleep(poll_interval)
+
+            else:
+                break
+
+        if _partial and not follow:
+            yield _partial
+
+    finally:
+        _f.close()
 
-    output = []
 
-    # Work through each line
-    for _line in _data.split('\n'):
+def parse_rs41_line(line):
+    """ Parse a line of RS41 raw data, returning the frame as bytes, or None if the line does not contain a valid frame. """
 
-        if '[OK]' in _line:
-            _hex = _line.split('  [OK]')[0]
-            _hex = _hex.replace(' ','')
-            try:
-                _bytes = codecs.decode(_hex, 'hex')
-            except:
-                continue
+    if '[OK]' in line:
+        _hex = line.split(' ')[0]
+        return codecs.decode(_hex, 'hex')
 
-            output.append(_bytes)
+    return None
 
-    return output
+
+def parse_lms6_403_line(line):
+    """ Parse a line of LMS6_403 raw data, returning the frame as bytes, or None if the line does not contain a valid frame. """
+
+    if '[OK]' in line:
+        _hex = line.split('  [OK]')[0]
+        _hex = _hex.replace(' ','')
+        try:
+            return codecs.decode(_hex, 'hex')
+        except:
+            return None
+
+    return None
+
+
+def parse_raw_line(line):
+    """ Parse a line of raw data of any sonde type, returning the frame as bytes, or None if the line does not contain a valid frame. """
+
+    if '[OK]' in line:
+        _hex = line.split('[OK]')[0].replace(' ', '')
+        try:
+            return codecs.decode(_hex, 'hex')
+        except ValueError:
+            return None
+
+    return None
+
+
+def iter_raw_rs41(filename, **kwargs):
+    """
+    Read a file containing lines of hexadecimal data, suffixed with CRC information (e.g. [OK] or [NO]),
+    yielding each frame (with an [OK] CRC) as bytes.
+    Any additional keyword arguments (e.g. follow=True) are passed to iter_lines.
+    """
+
+    for _line in iter_lines(filename, **kwargs):
+        _frame = parse_rs41_line(_line)
+
+        if _frame is not None:
+            yield _frame
+
+
+def iter_raw_lms6_403(filename, **kwargs):
+    """
+    Read a file containing lines of hexadecimal data, suffixed with CRC information (e.g. [OK] or [NO]),
+    yielding each frame (with an [OK] CRC) as bytes.
+    Any additional keyword arguments (e.g. follow=True) are passed to iter_lines.
+    """
+
+    for _line in iter_lines(filename, **kwargs):
+        _frame = parse_lms6_403_line(_line)
+
+        if _frame is not None:
+            yield _frame
+
+
+def iter_raw_any(filename, **kwargs):
+    """
+    Read a file containing lines of hexadecimal data (of any sonde type, refer sonde_types.detect_type), suffixed with
+    CRC information (e.g. [OK] or [NO]), yielding each frame (with an [OK] CRC) as bytes.
+    Any additional keyword arguments (e.g. follow=True) are passed to iter_lines.
+    """
+
+    for _line in iter_lines(filename, **kwargs):
+        _frame = parse_raw_line(_line)
+
+        if _frame is not None:
+            yield _frame
+
+
+def iter_raw_binary(filename, sonde_type='RS41', **kwargs):
+    """
+    Read a file containing a raw binary byte stream (e.g. demodulator output), yielding each frame found by the
+    frame synchroniser as bytes. Any additional keyword arguments (e.g. scrambled=True) are passed to framer.iter_frames.
+    """
+    from ..framer import iter_frames
+
+    with open(filename, 'rb') as _f:
+        for _frame in iter_frames(_f, sonde_type=sonde_type, **kwargs):
+            yield _frame
+
+
+# Functions to read frames from a raw data file, for each sonde type.
+RAW_FILE_ITERATORS = {
+    'RS41': iter_raw_rs41,
+    'LMS6_403': iter_raw_lms6_403,
+    'auto': iter_raw_any,
+}
+
+
+def read_raw_rs41(filename):
+    """
+    Attempt to read a file containing lines of hexadecimal data, suffixed with CRC information (e.g. [OK] or [NO])
+    
+    Returns a list of bytes. Use iter_raw_rs41 to avoid holding all frames in memory.
+    """
+
+    return list(iter_raw_rs41(filename))
+
+
+def read_raw_lms6_403(filename):
+    """
+    Attempt to read a file containing lines of hexadecimal data, suffixed with CRC information (e.g. [OK] or [NO])
+    
+    Returns a list of bytes. Use iter_raw_lms6_403 to avoid holding all frames in memory.
+    """
+
+    return list(iter_raw_lms6_403(filename))
 
 
 
@@ -67,12 +222,7 @@ if __name__ == "__main__":
     import argparse
     import pprint
     import sys
-    from ..RS41.decoder import decode as rs41_decode
-    from ..RS41.decoder import to_autorx_log as rs41_log
-    from ..RS41 import RS41
-    from ..LMS6_403.decoder import decode as lms6_403_decode
-    from ..LMS6_403.decoder import to_autorx_log as lms6_403_log
-    from ..LMS6_403 import LMS6_403
+    from ..sonde_types import SONDE_TYPES, new_decoder
 
     # Command line arguments.
     parser = argparse.ArgumentParser()
@@ -80,7 +230,7 @@ if __name__ == "__main__":
         "filename", help="Filename to Open",
     )
     parser.add_argument(
-        "-t", "--type", help="Radiosonde type (RS41, LMS6_403, DFM, etc...)", default="RS41"
+        "-t", "--type", help="Radiosonde type (RS41, LMS6_403, DFM, etc...), or auto to detect the type of each frame.", default="RS41"
     )
     parser.add_argument(
         "-v", "--verbose", help="Enable debug output.", action="store_true"
@@ -88,6 +238,21 @@ if __name__ == "__main__":
     parser.add_argument(
         "-c", "--csv", help="Output as CSV", action="store_true", default=False
     )
+    parser.add_argument(
+        "-f", "--follow", help="Keep reading as new data is written to the file (e.g. a live auto_rx raw log).", action="store_true", default=False
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write decoded data to a columnar file (.parquet if pyarrow is available, otherwise .npz). Refer utils.export", default=None
+    )
+    parser.add_argument(
+        "-b", "--binary", help="Input is a raw binary byte stream (e.g. demodulator output), rather than hex lines. Frames are found using the frame synchroniser. Use - to read from stdin. Refer framer.py", action="store_true", default=False
+    )
+    parser.add_argument(
+        "--scrambled", help="With --binary, the frames in the stream are scrambled (as transmitted).", action="store_true", default=False
+    )
+    parser.add_argument(
+        "-j", "--jobs", help="Decode using this many worker processes. The filename may also be a directory. Refer utils.parallel", type=int, default=None
+    )
     args = parser.parse_args()
 
     if args.verbose:
@@ -100,42 +265,63 @@ if __name__ == "__main__":
         format="%(asctime)s %(levelname)s: %(message)s", level=_log_level
     )
 
-    
-    if args.type == "RS41":
-        decode_func = rs41_decode
-        log_func = rs41_log
-        frames = read_raw_rs41(args.filename)
-    # Other types here
-    elif args.type == "LMS6_403":
-        log_func = lms6_403_log
-        decode_func = lms6_403_decode
-        frames = read_raw_lms6_403(args.filename)
-    else:
+    if args.type == "auto" and (args.output or args.csv or args.jobs or args.binary):
+        logging.critical("Automatic sonde type detection is only supported for hex input, with the default output format.")
+        sys.exit(1)
+
+    if args.type != "auto" and args.type not in SONDE_TYPES:
         logging.critical("Unknown Radiosonde Type!")
         sys.exit(1)
 
-    # Read file
+    if args.jobs:
+        if args.output or args.follow or args.binary:
+            parser.error("--jobs cannot be combined with --output, --follow or --binary.")
 
-    
-    #print(frames)
-    #pprint.pprint(decode(_hex))
+        # Parallel decoding, with output as CSV, or one JSON object per line.
+        from .autorx_log import AUTORX_LOG_FORMATS
+        from .parallel import decode_files
+
+        if args.csv:
+            print(AUTORX_LOG_FORMATS[args.type].header)
 
-    _rs41 = RS41()
+        for _line in decode_files([args.filename], sonde_type=args.type, output_format='csv' if args.csv else 'ndjson', jobs=args.jobs):
+            print(_line)
 
-    _lms6_403 = LMS6_403()
+        sys.exit(0)
+
+    if args.binary:
+        if args.filename == '-':
+            from ..framer import iter_frames
+            frames = iter_frames(sys.stdin.buffer, sonde_type=args.type, scrambled=args.scrambled)
+        else:
+            frames = iter_raw_binary(args.filename, sonde_type=args.type, scrambled=args.scrambled)
+    else:
+        frames = RAW_FILE_ITERATORS[args.type](args.filename, follow=args.follow)
+
+    if args.type == "auto":
+        # Frames may be from many radiosondes, of any type, so route each one to a decoder for its sonde.
+        from ..registry import SondeRegistry
+        _registry = SondeRegistry()
+        _add_frame = _registry.add_any_frame
+    else:
+        _add_frame = new_decoder(args.type).add_frame
+
+    if args.output:
+        from .export import ColumnarExporter
+        _exporter = ColumnarExporter(args.type)
+    elif args.csv:
+        from .autorx_log import AutoRxLogWriter
+        # When following a live file, write out each line as it arrives.
+        _log_writer = AutoRxLogWriter(sys.stdout, sonde_type=args.type, batch_size=1 if args.follow else 1000)
 
     for _raw_frame in frames:
         try:
-            if args.type == "RS41":
-                _frame = _rs41.add_frame(_raw_frame)
-                #_frame = decode_func(_raw_frame)
-            elif args.type == "LMS6_403":
-                #_frame = _raw_frame
-                _frame = _lms6_403.add_frame(_raw_frame)
-                #_frame = decode_func(_raw_frame)
-
-            if args.csv:
-                print(log_func(_frame))
+            _frame = _add_frame(_raw_frame)
+
+            if args.output:
+                _exporter.add_frame(_frame)
+            elif args.csv:
+                _log_writer.add_frame(_frame)
             else:
                 pprint.pprint(_frame)
 
@@ -143,3 +329,7 @@ if __name__ == "__main__":
             logging.exception("Issue parsing frame", exc_info=e)
             continue
 
+    if args.output:
+        _exporter.write(args.output)
+    elif args.csv:
+        _log_writer.close()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#
+#   Compact Record Types
+#
+#   Decoded frames are normally returned as (nested) dictionaries, which are convenient but take up
+#   a lot of memory when many frames are kept around (e.g. the recent history of many radiosondes).
+#   Records store the same data using __slots__, and can be converted back into the dictionary
+#   format using to_dict().
+#
+
+class Record(object):
+    """
+    Base class for slotted record types.
+
+    Subclasses list their stored fields in __slots__. Slots starting with an underscore are
+    treated as internal storage, and are not included in to_dict(). Any additional computed
+    fields (i.e. properties) that should be included in to_dict() are listed in _properties.
+    Fields which have not been set are omitted from to_dict().
+    """
+
+    __slots__ = ()
+    _properties = ()
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Create a record from a dictionary, ignoring any keys which do not have a slot """
+
+        _record = cls()
+        for _field in cls.__slots__:
+            if _field in data:
+                setattr(_record, _field, data[_field])
+
+        return _record
+
+
+    def to_dict(self):
+        """ Convert this record into a dictionary """
+
+        output = {}
+        for _field in self.__slots__:
+            if _field.startswith('_'):
+                continue
+
+            try:
+                _value = getattr(self, _field)
+            except AttributeError:
+                # Field not set.
+                continue
+
+            if isinstance(_value, Record):
+                _value = _value.to_dict()
+
+            output[_field] = _value
+
+        for _field in self._properties:
+            output[_field] = getattr(self, _field)
+
+        return output
+
+
+    def __getitem__(self, field):
+        """ Allow dictionary-style access to fields, to ease migration from the dictionary output. """
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field)
+
+
+    def __contains__(self, field):
+        return ((field in self.__slots__) and not field.startswith('_') and hasattr(self, field)) or (field in self._properties)
+
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
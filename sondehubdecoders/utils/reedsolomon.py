@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+#
+#   Reed-Solomon Error Correction
+#
+#   Syndrome checking and error correction for Reed-Solomon codes over GF(2^8).
+#
+#   Codewords are handled as sequences of bytes, where byte i is the coefficient of x^i, so the
+#   parity symbols come first and the message follows. Shortened codes (e.g. RS41 regular frames)
+#   are supported by providing a codeword shorter than n - the missing high-order symbols are zero.
+#
+#   Checking a codeword is the common case (most frames are received without errors), so syndromes
+#   are calculated using a precomputed table of the contribution of each possible byte value at each
+#   position, with all of the syndromes packed into one integer. A clean codeword costs one table
+#   lookup and one XOR per byte. Only codewords with non-zero syndromes go through the (much slower)
+#   Berlekamp-Massey / Chien search / Forney correction process.
+#
+
+# GF(2^8) primitive polynomial, x^8 + x^4 + x^3 + x^2 + 1
+GF_POLY = 0x11D
+
+# Multiplicative order of the field
+GF_ORDER = 255
+
+
+def _gf_tables(poly=GF_POLY):
+    """ Build the exponent (doubled, to avoid a modulo when multiplying) and logarithm tables for GF(2^8) """
+
+    _exp = [0] * (2 * GF_ORDER)
+    _log = [0] * 256
+
+    _x = 1
+    for _i in range(GF_ORDER):
+        _exp[_i] = _x
+        _log[_x] = _i
+        _x <<= 1
+        if _x & 0x100:
+            _x ^= poly
+
+    for _i in range(GF_ORDER, 2 * GF_ORDER):
+        _exp[_i] = _exp[_i - GF_ORDER]
+
+    return (_exp, _log)
+
+
+(GF_EXP, GF_LOG) = _gf_tables()
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def gf_div(a, b):
+    if b == 0:
+        raise ZeroDivisionError("GF(2^8) division by zero")
+    if a == 0:
+        return 0
+    return GF_EXP[(GF_LOG[a] - GF_LOG[b]) % GF_ORDER]
+
+
+def gf_poly_eval(poly, x):
+    """ Evaluate a polynomial (list of coefficients, lowest order first) at x """
+
+    _y = 0
+    for _coeff in reversed(poly):
+        _y = gf_mul(_y, x) ^ _coeff
+    return _y
+
+
+class ReedSolomonCode(object):
+    """
+    A Reed-Solomon code over GF(2^8), with nsym parity symbols, and generator polynomial roots
+    alpha^fcr ... alpha^(fcr + nsym - 1).
+    """
+
+    def __init__(self, nsym, fcr=0, n=GF_ORDER):
+        """
+        Args:
+        nsym (int): Number of parity symbols. Up to nsym/2 symbol errors can be corrected.
+        fcr (int): First consecutive root of the generator polynomial.
+        n (int): Codeword length (at most 255).
+        """
+
+        self.nsym = nsym
+        self.fcr = fcr
+        self.n = n
+
+        # Built on first use, as they take some time to generate, and are not needed if no codewords are checked.
+        self._syndrome_table = None
+        self._syndrome_array = None
+
+
+    @property
+    def syndrome_table(self):
+        """
+        Table of [position][byte value] -> the contribution of that byte to each syndrome, with syndrome j
+        in bits 8j to 8j+7 of an integer. As the syndromes are linear, the syndromes of a codeword are the
+        XOR of the contributions of each of its bytes.
+        """
+
+        if self._syndrome_table is None:
+            _table = []
+
+            for _pos in range(self.n):
+                # Contributions of each single-bit byte value (1 << bit == alpha^bit), from which all other values are built.
+                _basis = []
+                for _bit in range(8):
+                    _packed = 0
+                    for _j in range(self.nsym):
+                        _packed |= GF_EXP[((self.fcr + _j) * _pos + _bit) % GF_ORDER] << (8 * _j)
+                    _basis.append(_packed)
+
+                _row = [0] * 256
+                for _value in range(1, 256):
+                    _lowest = _value & -_value
+                    _row[_value] = _row[_value ^ _lowest] ^ _basis[_lowest.bit_length() - 1]
+
+                _table.append(_row)
+
+            self._syndrome_table = _table
+
+        return self._syndrome_table
+
+
+    def packed_syndromes(self, codeword):
+        """ Calculate the syndromes of a codeword, packed into an integer (refer syndrome_table). Zero if the codeword is valid. """
+
+        _syndromes = 0
+        for (_row, _byte) in zip(self.syndrome_table, codeword):
+            _syndromes ^= _row[_byte]
+        return _syndromes
+
+
+    def syndromes(self, codeword):
+        """ Calculate the syndromes of a codeword, as a list of nsym values """
+
+        _packed = self.packed_syndromes(codeword)
+        return [(_packed >> (8 * _j)) & 0xFF for _j in range(self.nsym)]
+
+
+    def check(self, codeword):
+        """ Returns True if the codeword has no detectable errors """
+        return self.packed_syndromes(codeword) == 0
+
+
+    def check_many(self, codewords):
+        """
+        Check many codewords at once. Requires NumPy.
+
+        Args:
+        codewords (np.ndarray): 2-D uint8 array, with one (possibly shortened) codeword per row.
+
+        Returns a boolean array, True for each codeword with no detectable errors.
+        """
+        import numpy as np
+
+        if self._syndrome_array is None:
+            # The packed syndrome table, as 64-bit words (nsym is padded out to a multiple of 8 bytes).
+            _words = (self.nsym + 7) // 8
+            _data = b"".join(
+                _value.to_bytes(_words * 8, 'little') for _row in self.syndrome_table for _value in _row
+            )
+            self._syndrome_array = np.frombuffer(_data, dtype='<u8').reshape(self.n, 256, _words)
+
+        # Work through the codewords one position at a time, updating the syndromes of every codeword at once.
+        _syndromes = np.zeros((codewords.shape[0], self._syndrome_array.shape[2]), dtype=np.uint64)
+        for _pos in range(codewords.shape[1]):
+            _syndromes ^= self._syndrome_array[_pos][codewords[:, _pos]]
+
+        return ~np.any(_syndromes, axis=1)
+
+
+    def correct(self, codeword):
+        """
+        Correct any errors in a codeword, in place.
+
+        Args:
+        codeword (bytearray): Codeword to correct. This may be shorter than n, in which case the missing
+            symbols are taken to be zero, and errors located there cause the correction to fail.
+
+        Returns the number of symbols corrected (0 if the codeword was valid), or -1 if the errors could not be corrected,
+        in which case the codeword is left unchanged.
+        """
+
+        _packed = self.packed_syndromes(codeword)
+        if _packed == 0:
+            return 0
+
+        _syndromes = [(_packed >> (8 * _j)) & 0xFF for _j in range(self.nsym)]
+
+        # Berlekamp-Massey - find the error locator polynomial (lowest order first)
+        _locator = [1]
+        _previous = [1]
+        _num_errors = 0
+        _shift = 1
+        _last_discrepancy = 1
+
+        for _k in range(self.nsym):
+            _discrepancy = _syndromes[_k]
+            for _i in range(1, _num_errors + 1):
+                if _i < len(_locator):
+                    _discrepancy ^= gf_mul(_locator[_i], _syndromes[_k - _i])
+
+            if _discrepancy == 0:
+                _shift += 1
+                continue
+
+            _scale = gf_div(_discrepancy, _last_discrepancy)
+            _update = [0] * _shift + [gf_mul(_scale, _coeff) for _coeff in _previous]
+            _new_locator = [
+                (_locator[_i] if _i < len(_locator) else 0) ^ (_update[_i] if _i < len(_update) else 0)
+                for _i in range(max(len(_locator), len(_update)))
+            ]
+
+            if 2 * _num_errors <= _k:
+                _previous = _locator
+                _num_errors = _k + 1 - _num_errors
+                _last_discrepancy = _discrepancy
+                _shift = 1
+            else:
+                _shift += 1
+
+            _locator = _new_locator
+
+        while len(_locator) > 1 and _locator[-1] == 0:
+            _locator.pop()
+
+        if (_num_errors * 2 > self.nsym) or (len(_locator) - 1 != _num_errors):
+            return -1
+
+        # Chien search - the error positions are the i where locator(alpha^-i) == 0.
+        _positions = [
+            _i for _i in range(len(codeword))
+            if gf_poly_eval(_locator, GF_EXP[(GF_ORDER - _i) % GF_ORDER]) == 0
+        ]
+
+        if len(_positions) != _num_errors:
+            # Not enough roots within the codeword - too many errors, or errors in the (zero) shortened part.
+            return -1
+
+        # Forney - calculate the error values, using the error evaluator polynomial omega = S(x) * locator(x) mod x^nsym
+        _omega = [0] * self.nsym
+        for (_i, _s) in enumerate(_syndromes):
+            if _s == 0:
+                continue
+            for (_j, _l) in enumerate(_locator):
+                if _i + _j >= self.nsym:
+                    break
+                _omega[_i + _j] ^= gf_mul(_s, _l)
+
+        # Formal derivative of the locator polynomial (only the odd powers survive in GF(2^m))
+        _derivative = [_locator[_i] if _i % 2 else 0 for _i in range(1, len(_locator))]
+
+        _corrections = []
+        for _pos in _positions:
+            _x = GF_EXP[_pos]
+            _x_inverse = GF_EXP[(GF_ORDER - _pos) % GF_ORDER]
+            _denominator = gf_poly_eval(_derivative, _x_inverse)
+            if _denominator == 0:
+                return -1
+
+            _magnitude = gf_div(gf_poly_eval(_omega, _x_inverse), _denominator)
+            # Adjust for the first consecutive root of the generator.
+            _magnitude = gf_mul(_magnitude, GF_EXP[(_pos * (1 - self.fcr)) % GF_ORDER])
+            _corrections.append((_pos, _magnitude))
+
+        for (_pos, _magnitude) in _corrections:
+            codeword[_pos] ^= _magnitude
+
+        # Make sure we actually ended up with a valid codeword.
+        if not self.check(codeword):
+            for (_pos, _magnitude) in _corrections:
+                codeword[_pos] ^= _magnitude
+            return -1
+
+        return len(_corrections)
+
+
+    def encode(self, message):
+        """
+        Calculate the parity symbols for a message (bytes of the codeword from position nsym upwards).
+        Returns the complete codeword, as a bytearray.
+        """
+
+        # Generator polynomial, (x - alpha^fcr)(x - alpha^(fcr+1))..., lowest order first
+        _generator = [1]
+        for _j in range(self.nsym):
+            _root = GF_EXP[(self.fcr + _j) % GF_ORDER]
+            _next = [0] * (len(_generator) + 1)
+            for (_i, _coeff) in enumerate(_generator):
+                _next[_i + 1] ^= _coeff
+                _next[_i] ^= gf_mul(_coeff, _root)
+            _generator = _next
+
+        # Parity is the remainder of message(x) * x^nsym divided by the generator, worked from the highest order down.
+        _remainder = [0] * self.nsym
+        for _byte in reversed(message):
+            _feedback = _byte ^ _remainder[-1]
+            _remainder = [0] + _remainder[:-1]
+            if _feedback:
+                for _i in range(self.nsym):
+                    _remainder[_i] ^= gf_mul(_feedback, _generator[_i])
+
+        return bytearray(_remainder) + bytearray(message)
+
+
+if __name__ == "__main__":
+    import random
+
+    _rs = ReedSolomonCode(24)
+    _random = random.Random(1)
+
+    for _len in [255, 156]:
+        for _errors in range(0, 14):
+            _message = bytes(_random.randrange(256) for _i in range(_len - 24))
+            _codeword = _rs.encode(_message)
+            assert(_rs.check(_codeword))
+
+            _received = bytearray(_codeword)
+            for _pos in _random.sample(range(_len), _errors):
+                _received[_pos] ^= _random.randrange(1, 256)
+
+            _result = _rs.correct(_received)
+            print(f"Length {_len}, {_errors} errors: corrected {_result}")
+
+            if _errors <= 12:
+                assert(_result == _errors)
+                assert(_received == _codeword)
+            else:
+                # Beyond the correction capability, correction must either fail or produce a valid codeword.
+                assert(_result == -1 or _rs.check(_received))
+
+    print("All tests passed!")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+#
+#   Frame Schema Compiler
+#
+#   The decoders describe their frames/blocks using declarative tables (e.g. RS41_BLOCK_DECODERS),
+#   with each entry containing:
+#   - block_name: Name of the block, as used in the output dictionary.
+#   - expected_len: Expected length of the block in bytes, or -1 for variable length blocks.
+#   - struct: struct format string used to unpack the block.
+#   - fields: List of field names, in the order they appear in the struct format string.
+#   - field_decoders: Dictionary of field name -> conversion function.
+#   - block_post_process: Function which is run over the block dictionary once it has been decoded.
+#
+#   Interpreting these tables on every frame is slow, so we compile them once (at import time) into
+#   decoder objects which hold a pre-parsed struct.Struct, and only the field conversions that apply.
+#   The same tables can also be turned into NumPy structured dtypes, for batch decoding.
+#
+import re
+import struct
+
+
+# Mapping of struct format characters to NumPy dtype codes.
+STRUCT_NUMPY_TYPES = {
+    'B': 'u1',
+    'b': 'i1',
+    'H': 'u2',
+    'h': 'i2',
+    'I': 'u4',
+    'i': 'i4',
+    'Q': 'u8',
+    'q': 'i8',
+    'f': 'f4',
+    'd': 'f8',
+    's': 'S',
+}
+
+# Mapping of struct byte order characters to NumPy byte order characters.
+STRUCT_NUMPY_BYTEORDER = {
+    '<': '<',
+    '>': '>',
+    '!': '>',
+    '=': '=',
+}
+
+
+def struct_to_dtype(fmt, fields):
+    """
+    Convert a struct format string (with standard sizes, i.e. starting with <, >, ! or =) and list of field names
+    into an equivalent NumPy structured dtype.
+
+    As with decoding into a dictionary, if a field name is repeated only the last instance is used.
+    """
+    import numpy as np
+
+    if (len(fmt) == 0) or (fmt[0] not in STRUCT_NUMPY_BYTEORDER):
+        raise ValueError(f"Struct format {fmt} must specify a byte order.")
+
+    _byteorder = STRUCT_NUMPY_BYTEORDER[fmt[0]]
+
+    _columns = {}
+    _offset = 0
+    _field_idx = 0
+
+    for (_count, _code) in re.findall(r'(\d*)([a-zA-Z?])', fmt[1:]):
+        _count = int(_count) if _count else 1
+
+        if _code == 'x':
+            # Pad bytes
+            _offset += _count
+            continue
+
+        if _code not in STRUCT_NUMPY_TYPES:
+            raise ValueError(f"Unsupported struct format character {_code}")
+
+        if _code == 's':
+            # Strings are a single field of _count bytes.
+            _columns[fields[_field_idx]] = (f"S{_count}", _offset)
+            _field_idx += 1
+            _offset += _count
+        else:
+            _dtype = np.dtype(_byteorder + STRUCT_NUMPY_TYPES[_code])
+            for _i in range(_count):
+                _columns[fields[_field_idx]] = (_dtype, _offset)
+                _field_idx += 1
+                _offset += _dtype.itemsize
+
+    return np.dtype({
+        'names': list(_columns.keys()),
+        'formats': [_columns[_name][0] for _name in _columns],
+        'offsets': [_columns[_name][1] for _name in _columns],
+        'itemsize': _offset,
+    })
+
+
+class CompiledBlockDecoder(object):
+    """
+    Pre-compiled decoder for a single block (or frame) type.
+    """
+
+    def __init__(self, block_decoder):
+        """
+        Compile a block decoder table entry.
+
+        Args:
+        block_decoder (dict): Block decoder information, as described at the top of this file.
+        """
+
+        self.block_name = block_decoder["block_name"]
+        self.expected_len = block_decoder["expected_len"]
+        self.block_post_process = block_decoder["block_post_process"]
+        self.fields = tuple(block_decoder["fields"])
+        self._dtype = None
+
+        if self.expected_len == -1:
+            # Variable length block, which we just pass through as raw bytes.
+            self.struct = None
+            self.converters = ()
+            return
+
+        self.struct = struct.Struct(block_decoder["struct"])
+
+        if self.struct.size != self.expected_len:
+            raise ValueError(
+                f"Block {self.block_name} struct length ({self.struct.size}) does not match expected length ({self.expected_len})"
+            )
+
+        if len(self.fields) != len(self.struct.unpack(bytes(self.struct.size))):
+            raise ValueError(f"Block {self.block_name} field list does not match struct format")
+
+        # Work out which field positions need a conversion applied.
+        # If a field name is repeated, only the last instance ends up in the block dictionary, so that is
+        # the one we convert. Conversions for fields that aren't in the field list are dropped.
+        _field_positions = {}
+        for _i, _field in enumerate(self.fields):
+            _field_positions[_field] = _i
+
+        _converters = []
+        for _field in _field_positions:
+            if _field in block_decoder["field_decoders"]:
+                _converters.append((_field_positions[_field], block_decoder["field_decoders"][_field]))
+
+        self.converters = tuple(_converters)
+
+
+    @property
+    def dtype(self):
+        """
+        NumPy structured dtype equivalent to this block's struct format, for batch decoding.
+        This is built on first use, so that NumPy is only required if batch decoding is used.
+        """
+        if (self._dtype is None) and (self.struct is not None):
+            self._dtype = struct_to_dtype(self.struct.format, self.fields)
+
+        return self._dtype
+
+
+    def decode(self, data, **kwargs):
+        """
+        Decode a block, provided as bytes, into a dictionary.
+        Any additional keyword arguments are passed on to the block post-processing function.
+        """
+
+        if self.struct is None:
+            _block_dict = {'raw': data}
+
+        else:
+            _values = list(self.struct.unpack(data))
+            _extra = None
+
+            # Post-process any individual fields that require it
+            # These are usually simple unit or type conversions.
+            for (_i, _func) in self.converters:
+                _temp = _func(_values[_i])
+
+                if type(_temp) == dict:
+                    # If the field processor returned a dictionary, add those keys into our block dict.
+                    if _extra is None:
+                        _extra = {}
+                    _extra.update(_temp)
+                else:
+                    # Otherwise, we got a single value.
+                    _values[_i] = _temp
+
+            _block_dict = dict(zip(self.fields, _values))
+
+            if _extra:
+                _block_dict.update(_extra)
+
+        # Apply any further post-processing to the block.
+        # This may include converting coordinates to a more user-friendly format, or calculating
+        # sensor values.
+        if self.block_post_process:
+            _block_dict = self.block_post_process(_block_dict, **kwargs)
+
+        return _block_dict
+
+
+def compile_block_decoders(block_decoders):
+    """
+    Compile a dictionary of block decoders (keyed by block type) into a dictionary of CompiledBlockDecoder objects.
+    """
+
+    return {_type: CompiledBlockDecoder(_decoder) for (_type, _decoder) in block_decoders.items()}